@@ -7,38 +7,58 @@ Provides ML-powered predictions, forecasting, and NLP capabilities
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import time
+import threading
 import json
+import atexit
 import os
-from typing import Dict, List, Any, Optional
+import importlib.util
+import multiprocessing
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 
-# ML Libraries
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-import pickle
+from model_registry import ModelRegistry, FAILED, current_rss_bytes
+from model_store import ModelStore, LiveModel, DEFAULT_MODEL_DIR
+from merchant_cache import CategorizationCache, categorization_key
+from micro_batcher import MicroBatcher
+from keyword_matcher import KeywordMatcher, DEFAULT_KEYWORDS_PATH
+from spending_aggregates import AggregateStore
+from columnar_patterns import analyze_columns, iter_transaction_columns, PatternAccumulator, DEFAULT_CHUNK_SIZE
+from transaction_stream import TransactionStream, PayloadTooLarge, InvalidTransaction, NDJSON_MIMETYPES
+from forecast_cache import (ForecastCache, ForecastFit, DailyExpenseAccumulator, daily_expense_series,
+                            series_fingerprint)
+from fast_forecast import forecast_batch
+from forecast_pool import ForecastPool, TIMEOUT, available_cpus
+from bounded_executor import BoundedExecutor, ExecutorBusy
+from metrics import Metrics, SlowCallProfiler
+from nlp_backends import load_pipeline, DEFAULT_ONNX_DIR
+from merchant_embeddings import MerchantIndex, load_encoder, DEFAULT_EMBEDDING_MODEL, DEFAULT_SEEDS_PATH
+from cohort_store import CohortStore, cohort_id
+from tip_cache import TipCache, TokenBucket, tip_key
+from profile_buckets import bucket_range, INCOME_BUCKETS, SAVINGS_RATE_BUCKETS
 
-# Time Series Forecasting
-try:
+# Heavy libraries (Prophet, transformers/torch, spaCy) are imported lazily by
+# these loaders the first time a capability is used, see ModelRegistry
+def _load_prophet():
+    """Time Series Forecasting"""
     from prophet import Prophet
-except ImportError:
-    Prophet = None
-    print("Prophet not available, using simple forecasting")
+    return Prophet
 
-# NLP Libraries
-try:
-    from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-    import torch
-except ImportError:
-    print("Transformers not available, using rule-based NLP")
+def _load_sentiment_pipeline():
+    """Hugging Face model for sentiment/classification"""
+    return load_pipeline("sentiment-analysis", SENTIMENT_MODEL, NLP_BACKEND, NLP_THREADS, ONNX_DIR)
 
-try:
+def _load_category_pipeline():
+    """Text classification for merchant categorization"""
+    return load_pipeline("zero-shot-classification", CATEGORY_MODEL, NLP_BACKEND, NLP_THREADS, ONNX_DIR)
+
+def _load_spacy():
+    """spaCy English model: python -m spacy download en_core_web_sm"""
     import spacy
-    # Load English model: python -m spacy download en_core_web_sm
-    nlp = spacy.load("en_core_web_sm")
-except ImportError:
-    nlp = None
-    print("spaCy not available, using basic text processing")
+    return spacy.load("en_core_web_sm")
+
+def _module_available(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
 
 # OpenAI for LLM-based tips
 try:
@@ -49,117 +69,294 @@ except ImportError:
     openai = None
     print("OpenAI not available, using static tips")
 
+# Savings model feature order and the defaults used when a field is missing
+SAVINGS_FEATURES = [
+    ('income', 25000),
+    ('rent', 8000),
+    ('emi', 3000),
+    ('age', 30),
+    ('family_size', 3),
+    ('location_tier', 2),
+]
+
+# Labels for zero-shot merchant categorization
+MERCHANT_CATEGORIES = ["Essential", "Discretionary", "Debt", "Income"]
+
+# Merchant categorization engine: "zero_shot" (MNLI pipeline) or "embedding" (nearest
+# neighbours in a sentence-embedding index of category prototypes and labeled merchants).
+# AI_EMBEDDING_MODEL=hashing selects a dependency-free character n-gram encoder, and
+# merchants added at runtime are appended to AI_EMBEDDING_EXEMPLARS_PATH when it is set
+CATEGORY_ENGINES = {"zero_shot": "category_pipeline", "embedding": "merchant_index"}
+DEFAULT_CATEGORY_ENGINE = os.getenv("AI_CATEGORY_ENGINE", "zero_shot")
+EMBEDDING_MODEL = os.getenv("AI_EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+EMBEDDING_EXEMPLARS_PATH = os.getenv("AI_EMBEDDING_EXEMPLARS_PATH") or None
+
+# Zero-shot micro-batching: concurrent single requests within the wait window share one pass
+CATEGORY_BATCH_SIZE = int(os.getenv("AI_CATEGORY_BATCH_SIZE", "16"))
+CATEGORY_BATCH_WAIT_MS = float(os.getenv("AI_CATEGORY_BATCH_WAIT_MS", "5"))
+
+# Spending-pattern engine: "columnar" (typed NumPy arrays) or "pandas" (DataFrame)
+PATTERN_ENGINE = os.getenv("AI_PATTERN_ENGINE", "columnar")
+PATTERN_CHUNK_SIZE = int(os.getenv("AI_PATTERN_CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE)))
+
+# Cohort analytics: transactions recorded with a user profile go into a Parquet store in
+# AI_COHORT_DIR, and pattern analysis ranks a user among households with the same location
+# tier, family size band and income band over the last AI_COHORT_WINDOW_MONTHS months.
+# Cohorts under AI_COHORT_MIN_USERS users are compared with all users; AI_COHORTS=0 turns
+# the comparison off and brings back the fixed thresholds
+COHORTS_ENABLED = os.getenv("AI_COHORTS", "1") == "1"
+COHORT_DIR = os.getenv("AI_COHORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cohort_store"))
+COHORT_WINDOW_MONTHS = int(os.getenv("AI_COHORT_WINDOW_MONTHS", "6"))
+COHORT_MIN_USERS = int(os.getenv("AI_COHORT_MIN_USERS", "20"))
+COHORT_REFRESH_S = float(os.getenv("AI_COHORT_REFRESH_S", "300"))
+COHORT_FLUSH_ROWS = int(os.getenv("AI_COHORT_FLUSH_ROWS", "250000"))
+COHORT_HIGH_PERCENTILE = 75  # cohort percentile from which a metric is called out as high
+
+# NLP inference backend: "pytorch" (fp32), "torch_int8" (dynamic int8 quantization) or
+# "onnx" (ONNX Runtime on an export made by nlp_backends.py export). Falls back to pytorch
+# when the backend cannot load. AI_NLP_THREADS sets intra-op threads (0 = one per core;
+# gunicorn_conf.py divides the cores between workers)
+NLP_BACKEND = os.getenv("AI_NLP_BACKEND", "pytorch")
+NLP_THREADS = int(os.getenv("AI_NLP_THREADS", "0"))
+ONNX_DIR = os.getenv("AI_ONNX_DIR", DEFAULT_ONNX_DIR)
+CATEGORY_MODEL = os.getenv("AI_CATEGORY_MODEL", "facebook/bart-large-mnli")
+SENTIMENT_MODEL = os.getenv("AI_SENTIMENT_MODEL", "cardiffnlp/twitter-roberta-base-sentiment-latest")
+
+# Prophet fits slower than this fall back to the simple forecast (the fit still
+# completes in the background and is cached for the next request)
+FORECAST_FIT_TIMEOUT_S = float(os.getenv("AI_FORECAST_FIT_TIMEOUT_S", "10"))
+FORECAST_FIT_WORKERS = int(os.getenv("AI_FORECAST_FIT_WORKERS", "2"))
+# Fits running or queued at once; past this, cache misses get the simple forecast right away
+FORECAST_FIT_MAX_PENDING = int(os.getenv("AI_FORECAST_FIT_MAX_PENDING", str(4 * FORECAST_FIT_WORKERS)))
+
+# Batch goal forecasts run in a process pool: AI_FORECAST_PROCESSES workers (0 = one per
+# available core), each job falls back to the simple forecast after AI_FORECAST_JOB_TIMEOUT_S
+FORECAST_PROCESSES = int(os.getenv("AI_FORECAST_PROCESSES", "0"))
+FORECAST_JOB_TIMEOUT_S = float(os.getenv("AI_FORECAST_JOB_TIMEOUT_S", "30"))
+FORECAST_POOL_START = os.getenv("AI_FORECAST_POOL_START", "spawn")
+
+# Goal forecasting methods; "auto" uses Prophet when installed, else the simple average
+FORECAST_METHODS = ("auto", "prophet", "exponential_smoothing", "simple")
+
+# CPU-heavy endpoints run on AI_CPU_WORKERS threads per process with at most
+# AI_CPU_QUEUE_DEPTH more waiting; beyond that they answer 503
+CPU_WORKERS = int(os.getenv("AI_CPU_WORKERS", "2"))
+CPU_QUEUE_DEPTH = int(os.getenv("AI_CPU_QUEUE_DEPTH", "4"))
+
+# LLM tips: cached per (language, income bucket, savings-rate bucket) for AI_TIPS_TTL_S;
+# upstream calls are limited to AI_TIPS_RATE_PER_MIN (bursts of AI_TIPS_BURST) per process.
+# A request waits at most AI_TIPS_WAIT_S for a missing entry before getting static tips
+TIPS_TTL_S = float(os.getenv("AI_TIPS_TTL_S", "21600"))
+TIPS_WAIT_S = float(os.getenv("AI_TIPS_WAIT_S", "0"))
+TIPS_RATE_PER_MIN = float(os.getenv("AI_TIPS_RATE_PER_MIN", "20"))
+TIPS_BURST = int(os.getenv("AI_TIPS_BURST", "5"))
+TIPS_LLM_TIMEOUT_S = float(os.getenv("AI_TIPS_LLM_TIMEOUT_S", "60"))
+
+TIP_LANGUAGES = {
+    "en": "English",
+    "hi": "Hindi (हिंदी)",
+    "pb": "Punjabi (ਪੰਜਾਬੀ)"
+}
+
+# Request size limits. JSON bodies are parsed whole, so they are capped at AI_JSON_MAX_MB;
+# NDJSON transaction uploads (Content-Type: application/x-ndjson) are parsed in chunks
+# within AI_STREAM_MAX_MEMORY_MB of working memory, up to AI_STREAM_MAX_BODY_MB of body
+JSON_MAX_BYTES = int(float(os.getenv("AI_JSON_MAX_MB", "64")) * 2**20)
+STREAM_MAX_MEMORY_BYTES = int(float(os.getenv("AI_STREAM_MAX_MEMORY_MB", "64")) * 2**20)
+STREAM_MAX_BODY_BYTES = int(float(os.getenv("AI_STREAM_MAX_BODY_MB", "2048")) * 2**20)
+
+# Threads walking the forest for batch savings predictions (-1 = all cores)
+SAVINGS_BATCH_N_JOBS = int(os.getenv("AI_SAVINGS_BATCH_N_JOBS", "-1"))
+
+# Savings model artifacts: published by train_models.py, never trained while serving.
+# The served version is re-checked every AI_MODEL_POLL_S seconds and swapped in live
+MODEL_DIR = os.getenv("AI_MODEL_DIR", DEFAULT_MODEL_DIR)
+MODEL_POLL_S = float(os.getenv("AI_MODEL_POLL_S", "30"))
+
+# Savings engines selectable per request ("model"): the full forest, or the compact tree
+# distilled from it (train_models.py distill), which falls back to the forest if absent
+SAVINGS_ENGINES = {"forest": "savings_predictor", "compact": "savings_compact"}
+DEFAULT_SAVINGS_ENGINE = os.getenv("AI_SAVINGS_MODEL", "forest")
+
+# Stage latencies and fallback counts, scraped from /ai/metrics (AI_METRICS=0 turns them
+# off). With AI_PROFILE_SAMPLE_RATE > 0 that fraction of service calls is run under
+# cProfile and those slower than AI_PROFILE_SLOW_MS are dumped to AI_PROFILE_DIR
+METRICS_ENABLED = os.getenv("AI_METRICS", "1") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("AI_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("AI_PROFILE_SLOW_MS", "500"))
+PROFILE_DIR = os.getenv("AI_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("AI_PROFILE_MAX_FILES", "50"))
+
+metrics = Metrics(
+    namespace="ai",
+    enabled=METRICS_ENABLED,
+    profiler=(SlowCallProfiler(PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS / 1000, PROFILE_MAX_FILES)
+              if METRICS_ENABLED and PROFILE_SAMPLE_RATE > 0 else None)
+)
+metrics.describe("method_seconds", "AIService call latency")
+metrics.describe("method_errors_total", "AIService calls that raised")
+metrics.describe("stage_seconds", "Latency of one stage inside an AIService call")
+metrics.describe("fallbacks_total", "Answers served by a fallback path, by fallback and reason")
+metrics.describe("http_request_seconds", "Flask request latency by endpoint and status")
+
+def _model_label(forest) -> str:
+    """Short model name for responses, e.g. RandomForest, HistGradientBoosting"""
+    return forest.manifest.get("model_type", "RandomForestRegressor").replace("Regressor", "")
+
 class AIService:
     def __init__(self):
         self.models = {}
-        self.scalers = {}
-        self.load_or_train_models()
+        self.model_store = ModelStore(MODEL_DIR)
         
-        # Initialize NLP pipeline for merchant categorization
-        self.init_nlp_models()
+        # Models load on first use; AI_WARMUP_MODELS lists ones to preload
+        self.registry = ModelRegistry()
+        self.registry.register('savings_predictor', lambda: self._load_savings_model('savings_predictor'))
+        self.registry.register('savings_compact', lambda: self._load_savings_model('savings_compact'))
+        self.registry.register('category_pipeline', _load_category_pipeline)
+        self.registry.register('merchant_index', self._load_merchant_index)
+        self.registry.register('cohort_store', self._load_cohort_store)
+        self.registry.register('sentiment_pipeline', _load_sentiment_pipeline)
+        self.registry.register('spacy', _load_spacy)
+        self.registry.register('prophet', _load_prophet)
         
-    def load_or_train_models(self):
-        """Load pre-trained models or train new ones"""
-        try:
-            # Try to load existing models
-            with open('models/savings_predictor.pkl', 'rb') as f:
-                self.models['savings_predictor'] = pickle.load(f)
-            with open('models/scaler.pkl', 'rb') as f:
-                self.scalers['standard'] = pickle.load(f)
-            print("✅ Loaded pre-trained ML models")
-        except FileNotFoundError:
-            # Train new models with sample data
-            self.train_initial_models()
-            print("✅ Trained new ML models")
-    
-    def init_nlp_models(self):
-        """Initialize NLP models for text processing"""
-        try:
-            # Hugging Face model for sentiment/classification
-            self.sentiment_pipeline = pipeline(
-                "sentiment-analysis",
-                model="cardiffnlp/twitter-roberta-base-sentiment-latest"
-            )
-            
-            # Text classification for merchant categorization
-            self.category_pipeline = pipeline(
-                "zero-shot-classification",
-                model="facebook/bart-large-mnli"
-            )
-            print("✅ Loaded NLP models")
-        except Exception as e:
-            print(f"⚠️ NLP models not available: {e}")
-            self.sentiment_pipeline = None
-            self.category_pipeline = None
-    
-    def train_initial_models(self):
-        """Train ML models with synthetic Indian financial data"""
-        # Generate synthetic training data based on Indian spending patterns
-        np.random.seed(42)
-        n_samples = 1000
-        
-        # Features: income, rent, emi, age, family_size, location_tier
-        income = np.random.normal(25000, 10000, n_samples)  # Monthly income in INR
-        rent = np.random.normal(8000, 3000, n_samples)
-        emi = np.random.normal(3000, 2000, n_samples)
-        age = np.random.randint(22, 65, n_samples)
-        family_size = np.random.randint(1, 6, n_samples)
-        location_tier = np.random.randint(1, 4, n_samples)  # 1=Metro, 2=Tier-1, 3=Tier-2
-        
-        # Create feature matrix
-        X = np.column_stack([income, rent, emi, age, family_size, location_tier])
-        
-        # Target: Daily safe savings amount (₹10-₹50)
-        # Formula based on Indian financial behavior
-        daily_savings = np.maximum(10, 
-            np.minimum(50, 
-                (income - rent - emi) * 0.1 / 30 + 
-                np.random.normal(0, 5, n_samples)
-            )
+        # Memo of merchant categorizations, optionally persisted across restarts
+        self.category_cache = CategorizationCache(
+            max_entries=int(os.getenv("AI_CATEGORY_CACHE_SIZE", "50000")),
+            max_bytes=int(float(os.getenv("AI_CATEGORY_CACHE_MB", "32")) * 2**20),
+            snapshot_path=os.getenv("AI_CATEGORY_CACHE_PATH") or None,
+            flush_s=float(os.getenv("AI_CATEGORY_CACHE_FLUSH_S", "1"))
         )
+        atexit.register(self.category_cache.flush)  # changes not written behind yet
         
-        # Train Random Forest model
-        X_train, X_test, y_train, y_test = train_test_split(X, daily_savings, test_size=0.2, random_state=42)
+        # Keyword dictionary for rule-based categorization, compiled once
+        self.keywords_path = os.getenv("AI_MERCHANT_KEYWORDS_PATH", DEFAULT_KEYWORDS_PATH)
+        self.keyword_matcher = KeywordMatcher.from_file(self.keywords_path)
+        
+        # Per-user running spending sums for incremental pattern analysis
+        self.spending_aggregates = AggregateStore(
+            max_users=int(os.getenv("AI_AGGREGATE_MAX_USERS", "100000"))
+        )
         
-        # Scale features
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
+        # Fitted Prophet models per user, reused while the daily series is unchanged
+        self.forecast_cache = ForecastCache(
+            max_users=int(os.getenv("AI_FORECAST_CACHE_USERS", "10000"))
+        )
+        self._forecast_executor = ThreadPoolExecutor(
+            max_workers=FORECAST_FIT_WORKERS, thread_name_prefix="prophet-fit"
+        )
+        # Fits queued or running per (cache_key, series_hash): a repeated request waits
+        # on the same fit instead of queueing another
+        self._fits_in_flight: Dict[Tuple[str, str], Future] = {}
+        self._fits_lock = threading.Lock()
+        self.fits_rejected = 0
         
-        # Train model
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
-        model.fit(X_train_scaled, y_train)
+        self.category_batcher = MicroBatcher(
+            self._zero_shot_batch,
+            max_batch_size=CATEGORY_BATCH_SIZE,
+            max_wait_ms=CATEGORY_BATCH_WAIT_MS,
+            name="category-batcher"
+        )
         
-        # Save models
-        os.makedirs('models', exist_ok=True)
-        with open('models/savings_predictor.pkl', 'wb') as f:
-            pickle.dump(model, f)
-        with open('models/scaler.pkl', 'wb') as f:
-            pickle.dump(scaler, f)
+        # Generated tips, refreshed in the background; OPENAI_API_BASE can point at a
+        # local stub server (benchmarks/stub_llm_server.py) for offline testing
+        self.tip_cache = TipCache(
+            self._llm_tips,
+            ttl_s=TIPS_TTL_S,
+            max_entries=int(os.getenv("AI_TIPS_CACHE_SIZE", "1000")),
+            workers=int(os.getenv("AI_TIPS_REFRESH_WORKERS", "2")),
+            limiter=TokenBucket(rate=TIPS_RATE_PER_MIN / 60.0, capacity=TIPS_BURST)
+        )
         
-        self.models['savings_predictor'] = model
-        self.scalers['standard'] = scaler
+        # Batch goal forecasting across processes; workers start on the first batch
+        self.forecast_pool = ForecastPool(
+            _forecast_job, max_workers=FORECAST_PROCESSES or None, start_method=FORECAST_POOL_START
+        )
         
-        print(f"📊 Model trained with R² score: {model.score(X_test_scaled, y_test):.3f}")
+        # Pool workers load only what their jobs use. Under a pre-fork server the
+        # warm-up has to finish before workers fork (AI_WARMUP_BLOCKING=1) so they
+        # share the loaded models copy-on-write
+        if multiprocessing.parent_process() is None:
+            warmup = [name.strip() for name in os.getenv("AI_WARMUP_MODELS", "").split(",") if name.strip()]
+            self.registry.warm_up(warmup, background=os.getenv("AI_WARMUP_BLOCKING", "0") != "1")
+    
+    @property
+    def category_pipeline(self):
+        return self.registry.get('category_pipeline')
+    
+    @property
+    def sentiment_pipeline(self):
+        return self.registry.get('sentiment_pipeline')
+    
+    @property
+    def merchant_index(self):
+        return self.registry.get('merchant_index')
+    
+    def _load_merchant_index(self):
+        """Registry loader: embedding index seeded from the keyword dictionary and seed merchants"""
+        return MerchantIndex.build(load_encoder(EMBEDDING_MODEL, NLP_THREADS), self.keywords_path,
+                                   os.getenv("AI_EMBEDDING_SEEDS_PATH", DEFAULT_SEEDS_PATH),
+                                   categories=MERCHANT_CATEGORIES, exemplars_path=EMBEDDING_EXEMPLARS_PATH)
+    
+    @property
+    def cohort_store(self):
+        return self.registry.get('cohort_store') if COHORTS_ENABLED else None
+    
+    def _load_cohort_store(self):
+        """Registry loader: cohort store as of its snapshot; tables are built in the background
+
+        Until the first refresh finishes, comparisons fall back to the fixed thresholds.
+        """
+        store = CohortStore(COHORT_DIR, window_months=COHORT_WINDOW_MONTHS, min_users=COHORT_MIN_USERS,
+                            flush_rows=COHORT_FLUSH_ROWS, refresh_s=COHORT_REFRESH_S)
+        atexit.register(store.flush)  # rows still buffered at shutdown
+        return store
     
-    def predict_safe_savings(self, user_data: Dict) -> Dict:
+    def _load_savings_model(self, name: str):
+        """Registry loader: the served version of a savings model in the model store"""
+        live = LiveModel(self.model_store, name, poll_s=MODEL_POLL_S)
+        if live.get() is None:
+            print(f"⚠️ No {name} version in {MODEL_DIR} yet (see train_models.py)")
+        self.models[name] = live
+        return live
+    
+    def _savings_forest(self, engine: Optional[str] = None):
+        """The savings model being served for an engine; raises when none is published"""
+        engine = engine or DEFAULT_SAVINGS_ENGINE
+        if engine == 'compact':
+            live = self.registry.get('savings_compact')
+            compact = live.get() if live is not None else None
+            if compact is not None:
+                return compact
+        live = self.registry.get('savings_predictor')
+        forest = live.get() if live is not None else None
+        if forest is None:
+            raise RuntimeError("savings_predictor not available")
+        return forest
+    
+    @metrics.timed()
+    def predict_safe_savings(self, user_data: Dict, engine: Optional[str] = None) -> Dict:
         """ML-powered safe savings prediction"""
         try:
-            # Extract features
-            features = np.array([[
-                user_data.get('income', 25000),
-                user_data.get('rent', 8000),
-                user_data.get('emi', 3000),
-                user_data.get('age', 30),
-                user_data.get('family_size', 3),
-                user_data.get('location_tier', 2)
-            ]])
+            forest = self._savings_forest(engine)
             
-            # Scale features
-            features_scaled = self.scalers['standard'].transform(features)
+            # Extract features
+            with metrics.stage("savings_features"):
+                features = np.array([[
+                    user_data.get('income', 25000),
+                    user_data.get('rent', 8000),
+                    user_data.get('emi', 3000),
+                    user_data.get('age', 30),
+                    user_data.get('family_size', 3),
+                    user_data.get('location_tier', 2)
+                ]])
             
-            # Predict
-            prediction = self.models['savings_predictor'].predict(features_scaled)[0]
+            # Scale and predict; a single tree is cheapest walked without numpy
+            if forest.manifest["n_trees"] == 1:
+                with metrics.stage("savings_predict_compact"):
+                    prediction = forest.predict_one(features[0])
+            else:
+                with metrics.stage("savings_predict_forest"):
+                    prediction = forest.predict(features)[0]
             
             # Determine confidence based on prediction stability
             confidence = "High" if 20 <= prediction <= 40 else "Medium" if 15 <= prediction <= 45 else "Low"
@@ -168,11 +365,84 @@ class AIService:
                 "amount": max(10, min(50, round(prediction))),
                 "confidence": confidence,
                 "ml_prediction": True,
-                "model_used": "RandomForest"
+                "model_used": _model_label(forest),
+                "model_version": forest.version
             }
         except Exception as e:
             # Fallback to rule-based prediction
+            metrics.fallback("savings_rule_based", e)
+            return self._fallback_savings_prediction(user_data)
+    
+    @metrics.timed()
+    def predict_safe_savings_batch(self, users: List[Dict], engine: Optional[str] = None) -> List[Dict]:
+        """Vectorized safe savings prediction for many users in one pass"""
+        results: List[Optional[Dict]] = [None] * len(users)
+        rows, valid_idx = [], []
+        
+        # Rows with bad input fall back individually instead of failing the batch
+        for i, user_data in enumerate(users):
+            features = self._savings_feature_row(user_data)
+            if features is None:
+                metrics.fallback("savings_rule_based", "invalid_input")
+                results[i] = self._safe_fallback_savings_prediction(user_data)
+            else:
+                rows.append(features)
+                valid_idx.append(i)
+        
+        if not rows:
+            return results
+        
+        try:
+            forest = self._savings_forest(engine)
+            features = np.array(rows, dtype=np.float64)
+            
+            # Vectorized pass over all trees, row chunks spread across cores
+            n_jobs = SAVINGS_BATCH_N_JOBS if SAVINGS_BATCH_N_JOBS > 0 else available_cpus()
+            with metrics.stage("savings_predict_batch"):
+                predictions = forest.predict(features, n_jobs=n_jobs)
+            
+            amounts = np.clip(np.round(predictions), 10, 50).astype(int)
+            confidences = np.select(
+                [(predictions >= 20) & (predictions <= 40),
+                 (predictions >= 15) & (predictions <= 45)],
+                ["High", "Medium"],
+                default="Low"
+            )
+            
+            for i, amount, confidence in zip(valid_idx, amounts.tolist(), confidences.tolist()):
+                results[i] = {
+                    "amount": amount,
+                    "confidence": confidence,
+                    "ml_prediction": True,
+                    "model_used": _model_label(forest),
+                    "model_version": forest.version
+                }
+        except Exception as e:
+            print(f"Batch savings prediction failed: {e}")
+            metrics.fallback("savings_rule_based", e, count=len(valid_idx))
+            for i in valid_idx:
+                results[i] = self._safe_fallback_savings_prediction(users[i])
+        
+        return results
+    
+    def _savings_feature_row(self, user_data: Dict) -> Optional[List[float]]:
+        """Extract a numeric feature row, or None if the input is unusable"""
+        if not isinstance(user_data, dict):
+            return None
+        try:
+            row = [float(user_data.get(name, default)) for name, default in SAVINGS_FEATURES]
+        except (TypeError, ValueError):
+            return None
+        if not np.all(np.isfinite(row)):
+            return None
+        return row
+    
+    def _safe_fallback_savings_prediction(self, user_data: Dict) -> Dict:
+        """Fallback prediction that tolerates malformed user records"""
+        try:
             return self._fallback_savings_prediction(user_data)
+        except Exception:
+            return self._fallback_savings_prediction({})
     
     def _fallback_savings_prediction(self, user_data: Dict) -> Dict:
         """Fallback rule-based prediction"""
@@ -187,67 +457,351 @@ class AIService:
         else:
             return {"amount": 15, "confidence": "Low", "ml_prediction": False}
     
-    def forecast_savings_goal(self, transactions: List[Dict], goal_amount: float) -> Dict:
+    @metrics.timed()
+    def forecast_savings_goal(self, transactions: List[Dict], goal_amount: float,
+                              user_id: Optional[str] = None, include_forecast: bool = False,
+                              forecast_days: int = 365, method: str = "auto") -> Dict:
         """Time series forecasting for goal achievement"""
+        if method == "exponential_smoothing":
+            return self.forecast_savings_goals_batch(
+                [{"transactions": transactions, "goal_amount": goal_amount}]
+            )[0]
+        if method == "simple":
+            return self._simple_goal_forecast(transactions, goal_amount)
+        
+        return self._prophet_goal_forecast(
+            lambda: daily_expense_series(transactions),
+            lambda: self._simple_goal_forecast(transactions, goal_amount),
+            goal_amount, user_id, include_forecast, forecast_days
+        )
+    
+    @metrics.timed()
+    def forecast_savings_goal_stream(self, stream: TransactionStream, goal_amount: float,
+                                     user_id: Optional[str] = None, include_forecast: bool = False,
+                                     forecast_days: int = 365, method: str = "auto") -> Dict:
+        """forecast_savings_goal for NDJSON-streamed transactions, reduced chunk by chunk"""
+        daily = DailyExpenseAccumulator()
+        with metrics.stage("stream_ingest"):
+            for cols in stream.chunks(lambda: daily.nbytes):
+                daily.update(cols)
+        
+        def simple():
+            return self._simple_goal_from_totals(daily.transaction_count, daily.expense_total,
+                                                 daily.expense_count, goal_amount)
+        
+        if method == "simple":
+            return simple()
+        df = daily.series()
+        if method == "exponential_smoothing":
+            if len(df) < 10:  # Need minimum data points
+                metrics.fallback("forecast_simple", "short_series")
+                return simple()
+            try:
+                with metrics.stage("smoothing_fit"):
+                    stats = forecast_batch([df], horizon=30)
+                return self._smoothing_goal_result(stats[0], goal_amount)
+            except Exception as e:
+                print(f"Exponential smoothing forecasting failed: {e}")
+                metrics.fallback("forecast_simple", e)
+                return simple()
+        return self._prophet_goal_forecast(lambda: df, simple, goal_amount, user_id,
+                                           include_forecast, forecast_days)
+    
+    def _prophet_goal_forecast(self, series, simple, goal_amount: float, user_id: Optional[str],
+                               include_forecast: bool, forecast_days: int) -> Dict:
+        """Prophet goal forecast; series() builds the daily frame, simple() is the fallback"""
         try:
+            Prophet = self.registry.get('prophet')
             if not Prophet:
-                return self._simple_goal_forecast(transactions, goal_amount)
+                metrics.fallback("forecast_simple", "unavailable")
+                return simple()
             
-            # Prepare data for Prophet
-            df = pd.DataFrame([
-                {
-                    'ds': pd.to_datetime(t['date']),
-                    'y': abs(t['amount']) if t['amount'] < 0 else 0  # Daily expenses
-                }
-                for t in transactions if t['amount'] < 0
-            ])
+            # Prepare data for Prophet, aggregated by day
+            with metrics.stage("daily_series"):
+                df = series()
             
             if len(df) < 10:  # Need minimum data points
-                return self._simple_goal_forecast(transactions, goal_amount)
+                metrics.fallback("forecast_simple", "short_series")
+                return simple()
             
-            # Aggregate by day
-            df = df.groupby('ds')['y'].sum().reset_index()
+            # Reuse the fitted model while the series is unchanged
+            series_hash = series_fingerprint(df)
+            cache_key = str(user_id) if user_id is not None else f"series:{series_hash}"
+            fit = self.forecast_cache.get(cache_key, series_hash)
+            cache_hit = fit is not None
             
-            # Train Prophet model
-            model = Prophet(
-                yearly_seasonality=True,
-                weekly_seasonality=True,
-                daily_seasonality=False
-            )
-            model.fit(df)
-            
-            # Forecast next 365 days
-            future = model.make_future_dataframe(periods=365)
-            forecast = model.predict(future)
+            if fit is None:
+                future = self._submit_fit(Prophet, df, cache_key, series_hash)
+                if future is None:
+                    metrics.fallback("forecast_simple", "fit_queue_full")
+                    result = simple()
+                    result["fallback_reason"] = "fit_queue_full"
+                    return result
+                try:
+                    fit = future.result(timeout=FORECAST_FIT_TIMEOUT_S)
+                except FutureTimeoutError:
+                    print(f"Prophet fit exceeded {FORECAST_FIT_TIMEOUT_S}s, using simple forecast")
+                    metrics.fallback("forecast_simple", "timeout")
+                    result = simple()
+                    result["fallback_reason"] = "timeout"
+                    return result
             
             # Calculate when goal will be reached
-            daily_avg_expense = df['y'].mean()
+            daily_avg_expense = fit.daily_avg_expense
             monthly_avg_expense = daily_avg_expense * 30
             
             # Estimate monthly savings (simplified)
             estimated_monthly_savings = max(1000, monthly_avg_expense * 0.1)
             months_to_goal = goal_amount / estimated_monthly_savings
             
-            return {
+            result = {
                 "months_to_goal": round(months_to_goal, 1),
-                "confidence": "High" if len(df) > 30 else "Medium",
+                "confidence": "High" if fit.series_len > 30 else "Medium",
                 "method": "Prophet",
                 "daily_avg_expense": round(daily_avg_expense, 2),
-                "estimated_monthly_savings": round(estimated_monthly_savings, 2)
+                "estimated_monthly_savings": round(estimated_monthly_savings, 2),
+                "cache_hit": cache_hit,
+                "warm_start": fit.warm_started,
+                "fit_seconds": fit.fit_seconds
             }
             
+            # The day-by-day forecast is only computed when asked for
+            if include_forecast:
+                result["forecast"] = self._prophet_forecast(fit, forecast_days)
+            
+            return result
+            
         except Exception as e:
             print(f"Prophet forecasting failed: {e}")
-            return self._simple_goal_forecast(transactions, goal_amount)
+            metrics.fallback("forecast_simple", e)
+            return simple()
+    
+    @metrics.timed()
+    def forecast_savings_goals_batch(self, jobs: List[Dict]) -> List[Dict]:
+        """Exponential-smoothing goal forecasts for many users in one vectorized fit"""
+        results: List[Optional[Dict]] = [None] * len(jobs)
+        series, eligible = [], []
+        for i, job in enumerate(jobs):
+            try:
+                with metrics.stage("daily_series"):
+                    df = daily_expense_series(job.get('transactions', []))
+            except Exception as e:
+                # A bad date or missing amount falls back for this job only
+                print(f"Batch job {i} has unreadable transactions, using simple forecast: {e}")
+                metrics.fallback("forecast_simple", e)
+                results[i] = self._invalid_job_forecast(job)
+                continue
+            if len(df) < 10:  # Need minimum data points
+                metrics.fallback("forecast_simple", "short_series")
+                results[i] = self._simple_goal_forecast(job.get('transactions', []), job.get('goal_amount', 50000))
+            else:
+                series.append(df)
+                eligible.append(i)
+        
+        if not eligible:
+            return results
+        
+        try:
+            with metrics.stage("smoothing_fit"):
+                stats = forecast_batch(series, horizon=30)
+        except Exception as e:
+            print(f"Exponential smoothing forecasting failed: {e}")
+            metrics.fallback("forecast_simple", e, count=len(eligible))
+            for i in eligible:
+                results[i] = self._simple_goal_forecast(jobs[i].get('transactions', []),
+                                                        jobs[i].get('goal_amount', 50000))
+            return results
+        
+        for i, stat in zip(eligible, stats):
+            results[i] = self._smoothing_goal_result(stat, jobs[i].get('goal_amount', 50000))
+        return results
+    
+    def forecast_savings_goals_stream(self, jobs: List[Dict]) -> Iterator[Dict]:
+        """Goal forecasts for many users, yielded as each one completes
+        
+        Exponential-smoothing and simple jobs are computed in-process in one vectorized
+        pass; Prophet ("auto"/"prophet") jobs fan out across the process pool.
+        """
+        local = [i for i, job in enumerate(jobs)
+                 if job.get('method', 'auto') in ("exponential_smoothing", "simple")]
+        if local:
+            started = time.perf_counter()
+            smoothing = [i for i in local if jobs[i].get('method') == "exponential_smoothing"]
+            results = dict(zip(smoothing, self.forecast_savings_goals_batch([jobs[i] for i in smoothing])))
+            for i in local:
+                if i not in results:
+                    results[i] = self._simple_job_forecast(i, jobs[i])
+            job_seconds = round((time.perf_counter() - started) / len(local), 4)
+            for i in local:
+                yield self._batch_line(i, jobs[i], results[i], job_seconds)
+        
+        pooled = ((i, job) for i, job in enumerate(jobs)
+                  if job.get('method', 'auto') not in ("exponential_smoothing", "simple"))
+        for i, outcome, error in self.forecast_pool.imap_unordered(pooled, FORECAST_JOB_TIMEOUT_S):
+            if error is None:
+                result, job_seconds = outcome
+            else:
+                result = self._simple_job_forecast(i, jobs[i])
+                result.setdefault("fallback_reason", error)
+                metrics.fallback("forecast_simple", "pool_" + error)
+                job_seconds = FORECAST_JOB_TIMEOUT_S if error == TIMEOUT else None
+            yield self._batch_line(i, jobs[i], result, job_seconds)
+    
+    def _simple_job_forecast(self, index: int, job: Dict) -> Dict:
+        """Simple forecast for one streamed job, without letting a malformed job end the stream"""
+        try:
+            return self._simple_goal_forecast(job.get('transactions', []), job.get('goal_amount', 50000))
+        except Exception as e:
+            print(f"Batch job {index} has unreadable transactions: {e}")
+            metrics.fallback("forecast_simple", e)
+            return self._invalid_job_forecast(job)
+    
+    def _invalid_job_forecast(self, job: Dict) -> Dict:
+        """Simple forecast for a job whose transactions cannot be turned into a series"""
+        goal_amount = job.get('goal_amount', 50000)
+        try:
+            result = self._simple_goal_forecast(job.get('transactions', []), goal_amount)
+        except Exception:
+            # Not even the amounts are readable: the same estimate as for no transactions
+            result = self._simple_goal_from_totals(0, 0.0, 0, goal_amount)
+        result["fallback_reason"] = "invalid_transactions"
+        return result
+    
+    def _batch_line(self, index: int, job: Dict, result: Dict, job_seconds: Optional[float]) -> Dict:
+        """One batch result: job position and user, method and timings first"""
+        line = {
+            "index": index,
+            "user_id": job.get('user_id'),
+            "method": result.get("method"),
+            "fit_seconds": result.get("fit_seconds"),
+            "job_seconds": job_seconds
+        }
+        line.update(result)
+        return line
+    
+    def _smoothing_goal_result(self, stat: Dict, goal_amount: float) -> Dict:
+        """Goal estimate from a 30-day expense forecast and its 80% interval"""
+        def _savings(monthly_expense):
+            # Same 10%-of-expenses estimate as the Prophet path
+            return max(1000, monthly_expense * 0.1)
+        
+        estimated_monthly_savings = _savings(stat["expense_forecast"])
+        savings_low = _savings(stat["expense_lower"])
+        savings_high = _savings(stat["expense_upper"])
+        
+        return {
+            "months_to_goal": round(goal_amount / estimated_monthly_savings, 1),
+            "confidence": "High" if stat["n_days"] > 30 else "Medium",
+            "method": "ExponentialSmoothing",
+            "daily_avg_expense": round(stat["daily_avg_expense"], 2),
+            "estimated_monthly_savings": round(estimated_monthly_savings, 2),
+            "monthly_expense_forecast": round(stat["expense_forecast"], 2),
+            "prediction_interval": {
+                "level": 0.8,
+                "monthly_expense": [round(stat["expense_lower"], 2), round(stat["expense_upper"], 2)],
+                "estimated_monthly_savings": [round(savings_low, 2), round(savings_high, 2)],
+                "months_to_goal": [round(goal_amount / savings_high, 1), round(goal_amount / savings_low, 1)]
+            }
+        }
+    
+    def _submit_fit(self, Prophet, df: pd.DataFrame, cache_key: str, series_hash: str) -> Optional[Future]:
+        """The fit already in flight for this series, or a newly queued one
+        
+        None when FORECAST_FIT_MAX_PENDING fits are already queued or running.
+        """
+        key = (cache_key, series_hash)
+        with self._fits_lock:
+            future = self._fits_in_flight.get(key)
+            if future is not None:
+                return future
+            if len(self._fits_in_flight) >= FORECAST_FIT_MAX_PENDING:
+                self.fits_rejected += 1
+                return None
+            future = self._forecast_executor.submit(self._fit_prophet, Prophet, df, cache_key, series_hash)
+            self._fits_in_flight[key] = future
+        future.add_done_callback(lambda done: self._fit_finished(key, done))
+        return future
+    
+    def _fit_finished(self, key: Tuple[str, str], future: Future):
+        with self._fits_lock:
+            if self._fits_in_flight.get(key) is future:
+                del self._fits_in_flight[key]
+    
+    def fit_stats(self) -> Dict:
+        with self._fits_lock:
+            return {
+                "workers": FORECAST_FIT_WORKERS,
+                "max_pending": FORECAST_FIT_MAX_PENDING,
+                "in_flight": len(self._fits_in_flight),
+                "rejected": self.fits_rejected
+            }
+    
+    def _fit_prophet(self, Prophet, df: pd.DataFrame, cache_key: str, series_hash: str) -> ForecastFit:
+        """Fit (warm-started when only new days were appended) and cache a Prophet model"""
+        init = self.forecast_cache.warm_start_params(cache_key, df)
+        
+        def _new_model():
+            return Prophet(
+                yearly_seasonality=True,
+                weekly_seasonality=True,
+                daily_seasonality=False
+            )
+        
+        started = time.perf_counter()
+        model = _new_model()
+        if init is not None:
+            try:
+                with metrics.stage("prophet_fit_warm"):
+                    model.fit(df, init=init)
+            except Exception as e:
+                print(f"Prophet warm start failed, refitting from scratch: {e}")
+                init = None
+                model = _new_model()
+        if init is None:
+            with metrics.stage("prophet_fit"):
+                model.fit(df)
+        
+        fit = ForecastFit(
+            series_hash=series_hash,
+            series_len=len(df),
+            model=model,
+            daily_avg_expense=float(df['y'].mean()),
+            fit_seconds=round(time.perf_counter() - started, 3),
+            warm_started=init is not None
+        )
+        self.forecast_cache.put(cache_key, fit)
+        return fit
+    
+    def _prophet_forecast(self, fit: ForecastFit, days: int) -> List[Dict]:
+        """Daily expense forecast for the next `days` days (cached per horizon)"""
+        if days not in fit.forecasts:
+            with metrics.stage("prophet_predict"):
+                future = fit.model.make_future_dataframe(periods=days, include_history=False)
+                forecast = fit.model.predict(future)
+            fit.forecasts[days] = [
+                {
+                    "ds": row.ds.strftime("%Y-%m-%d"),
+                    "yhat": round(float(row.yhat), 2),
+                    "yhat_lower": round(float(row.yhat_lower), 2),
+                    "yhat_upper": round(float(row.yhat_upper), 2)
+                }
+                for row in forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].itertuples()
+            ]
+        return fit.forecasts[days]
     
     def _simple_goal_forecast(self, transactions: List[Dict], goal_amount: float) -> Dict:
         """Simple ARIMA-like forecasting"""
-        if not transactions:
-            return {"months_to_goal": 12, "confidence": "Low", "method": "Simple"}
-        
         # Calculate average monthly savings
         expenses = [abs(t['amount']) for t in transactions if t['amount'] < 0]
-        avg_monthly_expense = sum(expenses) / max(1, len(expenses)) * 30
+        return self._simple_goal_from_totals(len(transactions), sum(expenses), len(expenses), goal_amount)
+    
+    def _simple_goal_from_totals(self, transaction_count: int, expense_total: float,
+                                 expense_count: int, goal_amount: float) -> Dict:
+        """_simple_goal_forecast from running totals (expense_total is a positive sum)"""
+        if not transaction_count:
+            return {"months_to_goal": 12, "confidence": "Low", "method": "Simple"}
+        
+        avg_monthly_expense = expense_total / max(1, expense_count) * 30
         
         # Estimate 10% savings rate
         estimated_monthly_savings = avg_monthly_expense * 0.1
@@ -260,79 +814,216 @@ class AIService:
             "estimated_monthly_savings": round(estimated_monthly_savings, 2)
         }
     
-    def categorize_merchant_nlp(self, merchant_name: str, description: str = "") -> Dict:
+    @metrics.timed()
+    def categorize_merchant_nlp(self, merchant_name: str, description: str = "",
+                                engine: Optional[str] = None) -> Dict:
         """NLP-powered merchant categorization"""
+        # Rule-based entries only count as hits once NLP is known to be unavailable,
+        # so they get upgraded when the pipeline comes up
+        engine = engine or DEFAULT_CATEGORY_ENGINE
+        cached = self.cached_categorization(merchant_name, description, engine)
+        if cached is not None:
+            return cached
+        
+        result = self._categorize_uncached(merchant_name, description, engine)
+        self.category_cache.put(categorization_key(engine, merchant_name, description), result)
+        return result
+    
+    def cached_categorization(self, merchant_name: str, description: str = "",
+                              engine: Optional[str] = None) -> Optional[Dict]:
+        """Cached categorization, or None when the model would have to run"""
+        engine = engine or DEFAULT_CATEGORY_ENGINE
+        cache_key = categorization_key(engine, merchant_name, description)
+        return self.category_cache.get(cache_key, min_method=self._min_cached_method(engine))
+    
+    def uses_category_batcher(self, engine: Optional[str] = None) -> bool:
+        """Whether an uncached categorization is run by the zero-shot micro-batcher"""
+        return ((engine or DEFAULT_CATEGORY_ENGINE) == "zero_shot" and CATEGORY_BATCH_SIZE > 1
+                and self.registry.is_ready('category_pipeline'))
+    
+    def _min_cached_method(self, engine: Optional[str]) -> Optional[str]:
+        """Weakest cached method worth serving: model results while the engine can load"""
+        registry_name = CATEGORY_ENGINES[engine or DEFAULT_CATEGORY_ENGINE]
+        return "NLP" if self.registry.state(registry_name) != FAILED else None
+    
+    def _categorize_uncached(self, merchant_name: str, description: str = "",
+                             engine: Optional[str] = None) -> Dict:
+        """Run the categorization model, falling back to rules"""
+        engine = engine or DEFAULT_CATEGORY_ENGINE
         try:
-            if not self.category_pipeline:
-                return self._rule_based_categorization(merchant_name)
-            
-            # Categories for classification
-            categories = ["Essential", "Discretionary", "Debt", "Income"]
-            
             # Combine merchant name and description
             text = f"{merchant_name} {description}".strip()
             
-            # Use zero-shot classification
-            result = self.category_pipeline(text, categories)
+            if engine == "embedding":
+                if not self.merchant_index:
+                    metrics.fallback("categorize_rule_based", "unavailable")
+                    return self._rule_based_categorization(merchant_name)
+                return self._embedding_batch([text])[0]
             
-            # Get the top prediction
-            predicted_category = result['labels'][0]
-            confidence = result['scores'][0]
+            if not self.category_pipeline:
+                metrics.fallback("categorize_rule_based", "unavailable")
+                return self._rule_based_categorization(merchant_name)
             
-            return {
-                "category": predicted_category,
-                "confidence": round(confidence, 3),
-                "method": "NLP",
-                "all_scores": dict(zip(result['labels'], result['scores']))
-            }
+            # Concurrent requests are coalesced into one zero-shot batch
+            if CATEGORY_BATCH_SIZE > 1:
+                return self.category_batcher(text)
+            return self._zero_shot_batch([text])[0]
             
         except Exception as e:
             print(f"NLP categorization failed: {e}")
+            metrics.fallback("categorize_rule_based", e)
             return self._rule_based_categorization(merchant_name)
     
-    def _rule_based_categorization(self, merchant_name: str) -> Dict:
-        """Fallback rule-based categorization"""
-        merchant_lower = merchant_name.lower()
+    def _embedding_batch(self, texts: List[str]) -> List[Dict]:
+        """Nearest-neighbour categorization of several texts in one matrix product"""
+        with metrics.stage("embedding_classify"):
+            return self.merchant_index.classify(texts)
+    
+    def _zero_shot_batch(self, texts: List[str]) -> List[Dict]:
+        """Zero-shot classify several texts in one padded pipeline pass"""
+        with metrics.stage("zero_shot"):
+            results = self.category_pipeline(texts, MERCHANT_CATEGORIES, batch_size=len(texts))
+        if isinstance(results, dict):
+            results = [results]
         
-        # Essential keywords
-        if any(word in merchant_lower for word in ['bazaar', 'kirana', 'grocery', 'medical', 'pharmacy', 'gas', 'petrol', 'electricity', 'water', 'milk', 'dairy']):
-            return {"category": "Essential", "confidence": 0.8, "method": "Rule-based"}
+        return [
+            {
+                "category": result['labels'][0],
+                "confidence": round(result['scores'][0], 3),
+                "method": "NLP",
+                "all_scores": dict(zip(result['labels'], result['scores']))
+            }
+            for result in results
+        ]
+    
+    @metrics.timed()
+    def categorize_merchants_bulk(self, items: List[Dict], engine: Optional[str] = None) -> List[Dict]:
+        """Categorize many merchants at once, batching cache misses through the model"""
+        engine = engine or DEFAULT_CATEGORY_ENGINE
+        results: List[Optional[Dict]] = [None] * len(items)
+        min_method = self._min_cached_method(engine)
+        pending: Dict[str, Dict] = {}
         
-        # Discretionary keywords
-        elif any(word in merchant_lower for word in ['swiggy', 'zomato', 'restaurant', 'movie', 'shopping', 'amazon', 'flipkart', 'myntra', 'entertainment']):
-            return {"category": "Discretionary", "confidence": 0.8, "method": "Rule-based"}
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                item = {'merchant': item}
+            merchant_name = str(item.get('merchant', '') or '')
+            description = str(item.get('description', '') or '')
+            cache_key = categorization_key(engine, merchant_name, description)
+            cached = self.category_cache.get(cache_key, min_method=min_method)
+            if cached is not None:
+                results[i] = cached
+                continue
+            # Repeated merchants in one statement are classified once
+            job = pending.setdefault(cache_key, {
+                "merchant": merchant_name,
+                "text": f"{merchant_name} {description}".strip(),
+                "indices": []
+            })
+            job["indices"].append(i)
         
-        # Debt keywords
-        elif any(word in merchant_lower for word in ['emi', 'loan', 'credit', 'bank', 'lic', 'insurance', 'premium']):
-            return {"category": "Debt", "confidence": 0.8, "method": "Rule-based"}
+        jobs = list(pending.items())
+        pipeline_ready = bool(jobs) and self.registry.get(CATEGORY_ENGINES[engine]) is not None
+        if engine == "embedding":
+            # One query matrix for every miss: the index search is a single matrix product
+            classify, chunk = self._embedding_batch, max(1, len(jobs))
+        else:
+            classify, chunk = self._zero_shot_batch, max(1, CATEGORY_BATCH_SIZE)
+        for start in range(0, len(jobs), chunk):
+            batch = jobs[start:start + chunk]
+            try:
+                if not pipeline_ready:
+                    raise RuntimeError(f"{engine} categorizer not available")
+                batch_results = classify([job["text"] for _, job in batch])
+            except Exception as e:
+                if pipeline_ready:
+                    print(f"NLP categorization failed: {e}")
+                metrics.fallback("categorize_rule_based", e if pipeline_ready else "unavailable",
+                                 count=len(batch))
+                batch_results = [self._rule_based_categorization(job["merchant"]) for _, job in batch]
+            
+            for (cache_key, job), result in zip(batch, batch_results):
+                self.category_cache.put(cache_key, result)
+                for i in job["indices"]:
+                    results[i] = dict(result)
         
-        # Income keywords
-        elif any(word in merchant_lower for word in ['salary', 'freelance', 'payment', 'income', 'credit']):
-            return {"category": "Income", "confidence": 0.8, "method": "Rule-based"}
+        return results
+    
+    @metrics.timed()
+    def add_merchant_exemplars(self, exemplars: List[Dict]) -> Dict:
+        """Add labeled merchants to the embedding index and refresh their cached results"""
+        index = self.merchant_index
+        if index is None:
+            raise RuntimeError("embedding index not available")
+        merchants = [str(e.get('merchant', '') or '') for e in exemplars]
+        categories = [e.get('category') for e in exemplars]
+        changed = index.add(merchants, categories, persist=True)
         
-        else:
-            return {"category": "Essential", "confidence": 0.5, "method": "Rule-based"}
+        # A stale embedding answer for these merchants may be cached; replace it with the
+        # new label (zero-shot entries are another engine's and stay as they are)
+        for merchant, result in zip(merchants, self._embedding_batch(merchants)):
+            self.category_cache.put(categorization_key("embedding", merchant), result)
+        return {"added": len(merchants), "changed": changed, "index": index.stats()}
     
+    def _rule_based_categorization(self, merchant_name: str) -> Dict:
+        """Fallback rule-based categorization"""
+        return self.keyword_matcher.categorize(merchant_name)
+    
+    @metrics.timed()
     def generate_ai_tips(self, language: str = "en", user_context: Dict = None) -> List[Dict]:
         """Generate AI-powered multilingual financial tips"""
-        try:
-            if not openai or not openai.api_key:
-                return self._static_tips(language)
-            
-            # Create context-aware prompt
-            context = ""
-            if user_context:
-                income = user_context.get('income', 25000)
-                savings_rate = user_context.get('savings_rate', 10)
-                context = f"User has monthly income of ₹{income} and saves {savings_rate}% monthly."
-            
-            language_map = {
-                "en": "English",
-                "hi": "Hindi (हिंदी)",
-                "pb": "Punjabi (ਪੰਜਾਬੀ)"
-            }
-            
-            prompt = f"""Generate 5 practical financial tips for micro-investment and savings in {language_map.get(language, 'English')} for low-income users in India. {context}
+        if not openai or not openai.api_key:
+            metrics.fallback("tips_static", "unavailable")
+            return self._static_tips(language)
+        
+        # Served from the tip cache; the LLM is only called by its refresh worker
+        if user_context:
+            key = tip_key(language if language in TIP_LANGUAGES else "en",
+                          user_context.get('income', 25000), user_context.get('savings_rate', 10))
+        else:
+            key = tip_key(language if language in TIP_LANGUAGES else "en")
+        tips = self.tip_cache.get(key, wait_s=TIPS_WAIT_S)
+        if tips is None:
+            metrics.fallback("tips_static", "cache_miss")
+            return self._static_tips(language)
+        return [dict(tip) for tip in tips]
+    
+    def prewarm_tips(self, wait_s: Optional[float] = None):
+        """Tip generation for every language with and without the default context
+        
+        Queued for the refresh workers, or with wait_s generated before returning (keys
+        without a rate-limit token within wait_s are skipped), for a pre-fork master
+        """
+        if not openai or not openai.api_key:
+            return
+        keys = [tip_key(language) for language in TIP_LANGUAGES]
+        keys += [tip_key(language, 25000, 10) for language in TIP_LANGUAGES]
+        if wait_s is None:
+            self.tip_cache.prewarm(keys)
+            return
+        filled = self.tip_cache.fill(keys, wait_s)
+        print(f"✅ Prewarmed tips for {filled} of {len(keys)} keys")
+    
+    def prewarm_cohorts(self):
+        """Load the cohort store and fold files written since its snapshot in the background"""
+        store = self.cohort_store
+        if store is not None:
+            store.start_refresh()
+    
+    def _llm_tips(self, key) -> List[Dict]:
+        """One upstream LLM call for a tip-cache key"""
+        language, income, savings_rate = key
+        
+        # Create context-aware prompt from the key's buckets
+        context = ""
+        if income is not None:
+            income_low, income_high = bucket_range(income, INCOME_BUCKETS)
+            rate_low, rate_high = bucket_range(savings_rate, SAVINGS_RATE_BUCKETS)
+            income_text = f"₹{income_low}-₹{income_high}" if income_high else f"over ₹{income_low}"
+            rate_text = f"{rate_low}-{rate_high}%" if rate_high else f"{rate_low}% or more"
+            context = f"User has monthly income of {income_text} and saves {rate_text} monthly."
+        
+        prompt = f"""Generate 5 practical financial tips for micro-investment and savings in {TIP_LANGUAGES[language]} for low-income users in India. {context}
 
 Focus on:
 1. Daily savings (₹10-₹50)
@@ -343,6 +1034,7 @@ Focus on:
 
 Format as JSON array with title and content fields."""
 
+        with metrics.stage("llm_call"):
             response = openai.ChatCompletion.create(
                 model="gpt-3.5-turbo",
                 messages=[
@@ -350,24 +1042,21 @@ Format as JSON array with title and content fields."""
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=1500,
-                temperature=0.7
+                temperature=0.7,
+                request_timeout=TIPS_LLM_TIMEOUT_S
             )
-            
-            # Parse response
-            content = response.choices[0].message.content
-            tips = json.loads(content)
-            
-            # Add metadata
-            for i, tip in enumerate(tips):
-                tip['id'] = str(i + 1)
-                tip['category'] = 'ai_generated'
-                tip['source'] = 'OpenAI'
-            
-            return tips
-            
-        except Exception as e:
-            print(f"AI tip generation failed: {e}")
-            return self._static_tips(language)
+        
+        # Parse response
+        content = response.choices[0].message.content
+        tips = json.loads(content)
+        
+        # Add metadata
+        for i, tip in enumerate(tips):
+            tip['id'] = str(i + 1)
+            tip['category'] = 'ai_generated'
+            tip['source'] = 'OpenAI'
+        
+        return tips
     
     def _static_tips(self, language: str) -> List[Dict]:
         """Fallback static tips"""
@@ -397,11 +1086,43 @@ Format as JSON array with title and content fields."""
         }
         return tips_db.get(language, tips_db["en"])
     
-    def analyze_spending_patterns(self, transactions: List[Dict]) -> Dict:
-        """ML-powered spending pattern analysis"""
+    @metrics.timed()
+    def analyze_spending_patterns(self, transactions: List[Dict], engine: Optional[str] = None,
+                                  user_profile: Optional[Dict] = None) -> Dict:
+        """ML-powered spending pattern analysis
+        
+        With a user_profile (location_tier, family_size, income) the columnar engine ranks
+        the user within their cohort instead of applying fixed thresholds.
+        """
         if not transactions:
             return {"patterns": [], "insights": [], "recommendations": []}
         
+        engine = engine or PATTERN_ENGINE
+        if engine == "pandas":
+            with metrics.stage("patterns_pandas"):
+                return self._analyze_patterns_pandas(transactions)
+        
+        # Columnar engine: one parse into typed arrays, bincount reductions per chunk
+        with metrics.stage("patterns_columnar"):
+            accumulator = analyze_columns(transactions, PATTERN_CHUNK_SIZE)
+        cohort = self._cohort_comparison(accumulator, user_profile)
+        return self._spending_report(accumulator.patterns(), accumulator.totals(), cohort)
+    
+    @metrics.timed()
+    def analyze_spending_patterns_stream(self, stream: TransactionStream,
+                                         user_profile: Optional[Dict] = None) -> Dict:
+        """analyze_spending_patterns for NDJSON-streamed transactions (columnar engine)"""
+        accumulator = PatternAccumulator()
+        with metrics.stage("stream_ingest"):
+            for cols in stream.chunks(lambda: 128 * len(accumulator.category_spend)):
+                accumulator.update(cols)
+        if not accumulator.transaction_count:
+            return {"patterns": [], "insights": [], "recommendations": []}
+        cohort = self._cohort_comparison(accumulator, user_profile)
+        return self._spending_report(accumulator.patterns(), accumulator.totals(), cohort)
+    
+    def _analyze_patterns_pandas(self, transactions: List[Dict]) -> Dict:
+        """DataFrame implementation of analyze_spending_patterns"""
         df = pd.DataFrame(transactions)
         
         # Convert date and amount
@@ -409,86 +1130,396 @@ Format as JSON array with title and content fields."""
         df['amount'] = df['amount'].astype(float)
         df['day_of_week'] = df['date'].dt.day_name()
         df['hour'] = df['date'].dt.hour
+        expenses = df[df['amount'] < 0]
         
         # Analyze patterns
+        has_expenses = len(expenses) > 0
         patterns = {
-            "highest_spending_day": df[df['amount'] < 0].groupby('day_of_week')['amount'].sum().abs().idxmax(),
-            "peak_spending_hour": df[df['amount'] < 0].groupby('hour')['amount'].sum().abs().idxmax(),
-            "avg_transaction_size": abs(df[df['amount'] < 0]['amount'].mean()),
-            "spending_by_category": df[df['amount'] < 0].groupby('category')['amount'].sum().abs().to_dict()
+            "highest_spending_day": (expenses.groupby('day_of_week')['amount'].sum().abs().idxmax()
+                                     if has_expenses else None),
+            "peak_spending_hour": (int(expenses.groupby('hour')['amount'].sum().abs().idxmax())
+                                   if has_expenses else None),
+            "avg_transaction_size": float(abs(expenses['amount'].mean())) if has_expenses else 0.0,
+            "spending_by_category": {
+                k: float(v) for k, v in
+                expenses.groupby('category')['amount'].sum().abs().items()
+            }
         }
         
-        # Generate insights
-        insights = []
-        if patterns["highest_spending_day"] in ["Saturday", "Sunday"]:
-            insights.append("You spend more on weekends - consider weekend budgeting")
-        
-        if patterns["peak_spending_hour"] > 20:
-            insights.append("Late night spending detected - avoid impulse purchases")
-        
         # ML-based recommendations
         recommendations = self._generate_ml_recommendations(patterns, df)
         
         return {
             "patterns": patterns,
-            "insights": insights, 
+            "insights": self._generate_insights(patterns),
             "recommendations": recommendations,
             "analysis_date": datetime.now().isoformat()
         }
     
+    @metrics.timed()
+    def analyze_spending_patterns_incremental(self, user_id: str, transactions: List[Dict],
+                                              since: Optional[str] = None,
+                                              rebuild: bool = False,
+                                              stream: Optional[TransactionStream] = None,
+                                              user_profile: Optional[Dict] = None) -> Dict:
+        """Pattern analysis from per-user running aggregates, fed only new transactions
+        
+        With a user_profile the transactions are also recorded in the cohort store (rows
+        it already has are skipped) and the user is ranked within their cohort.
+        """
+        recording = [] if user_profile and self.cohort_store is not None else None
+        with metrics.stage("aggregates_apply"):
+            if stream is not None:
+                def chunks():
+                    # Recorded chunks are kept until the upload ends, 28 bytes a row
+                    for cols in stream.chunks(lambda: 28 * sum(map(len, recording or ()))):
+                        if recording is not None:
+                            recording.append(cols)
+                        yield cols
+                aggregates, applied = self.spending_aggregates.apply_stream(
+                    user_id, chunks(), since=since, rebuild=rebuild
+                )
+            else:
+                aggregates, applied = self.spending_aggregates.apply(
+                    user_id, transactions, since=since, rebuild=rebuild
+                )
+                if recording is not None and transactions:
+                    recording = iter_transaction_columns(transactions, PATTERN_CHUNK_SIZE)
+        with aggregates.lock:
+            patterns = aggregates.patterns()
+            totals = aggregates.totals()
+            accumulator = aggregates.accumulator  # replaced, not mutated, by later updates
+            summary = dict(aggregates.summary(), applied=applied)
+        if recording is not None:
+            self.record_cohort_transactions(user_id, user_profile, recording)
+        
+        if patterns is None:
+            return {"patterns": [], "insights": [], "recommendations": [], "aggregates": summary}
+        
+        cohort = self._cohort_comparison(accumulator, user_profile)
+        return dict(self._spending_report(patterns, totals, cohort), aggregates=summary)
+    
+    def record_cohort_transactions(self, user_id: str, user_profile: Dict, chunks) -> int:
+        """Add a user's transactions to the cohort store; returns how many were new"""
+        store = self.cohort_store
+        if store is None:
+            raise RuntimeError("cohort store not available")
+        with metrics.stage("cohort_ingest"):
+            try:
+                return store.ingest(str(user_id), user_profile, chunks)
+            except OSError as e:
+                # The buffered rows are written again by the next flush
+                print(f"⚠️ Cohort store flush failed: {e}")
+                return 0
+    
+    def _cohort_comparison(self, accumulator: PatternAccumulator,
+                           user_profile: Optional[Dict]) -> Optional[Dict]:
+        """The user's metrics ranked within their cohort; None keeps the fixed thresholds"""
+        if not user_profile or not COHORTS_ENABLED:
+            return None
+        store = self.cohort_store
+        if store is None:
+            metrics.fallback("cohort_fixed_threshold", "unavailable")
+            return None
+        with metrics.stage("cohort_compare"):
+            cohort = store.compare(user_profile, accumulator)
+        if cohort is None:
+            metrics.fallback("cohort_fixed_threshold", "small_cohort")
+        return cohort
+    
+    def _spending_report(self, patterns: Dict, totals: Dict, cohort: Optional[Dict] = None) -> Dict:
+        """Assemble patterns, insights and recommendations from reduced totals"""
+        report = {
+            "patterns": patterns,
+            "insights": self._generate_insights(patterns, cohort),
+            "recommendations": self._recommendations_from_totals(**totals, cohort=cohort),
+            "analysis_date": datetime.now().isoformat()
+        }
+        if cohort is not None:
+            report["cohort"] = cohort
+        return report
+    
+    @staticmethod
+    def _cohort_peers(cohort: Dict) -> str:
+        return "similar households" if cohort["compared_with"] == cohort["cohort"] else "users"
+    
+    def _generate_insights(self, patterns: Dict, cohort: Optional[Dict] = None) -> List[str]:
+        """Generate insights from spending patterns, relative to the cohort when given"""
+        insights = []
+        ranked = cohort["metrics"] if cohort else {}
+        if "weekend_share" in ranked:
+            weekend = ranked["weekend_share"]
+            if weekend["percentile"] >= COHORT_HIGH_PERCENTILE:
+                insights.append(f"You spend more on weekends than {min(weekend['percentile'], 99):.0f}% of "
+                                f"{self._cohort_peers(cohort)} - consider weekend budgeting")
+        elif patterns["highest_spending_day"] in ["Saturday", "Sunday"]:
+            insights.append("You spend more on weekends - consider weekend budgeting")
+        
+        if patterns["peak_spending_hour"] is not None and patterns["peak_spending_hour"] > 20:
+            insights.append("Late night spending detected - avoid impulse purchases")
+        
+        monthly = ranked.get("monthly_spend")
+        if monthly and monthly["percentile"] >= COHORT_HIGH_PERCENTILE:
+            insights.append(f"Your monthly spending of ₹{monthly['value']:,.0f} is higher than "
+                            f"{min(monthly['percentile'], 99):.0f}% of {self._cohort_peers(cohort)} "
+                            f"(typical: ₹{monthly['median']:,.0f})")
+        size = ranked.get("avg_transaction_size")
+        if size and size["percentile"] >= COHORT_HIGH_PERCENTILE:
+            insights.append(f"Your average purchase of ₹{size['value']:,.0f} is larger than "
+                            f"{min(size['percentile'], 99):.0f}% of {self._cohort_peers(cohort)}")
+        
+        return insights
+    
     def _generate_ml_recommendations(self, patterns: Dict, df: pd.DataFrame) -> List[str]:
         """Generate ML-based financial recommendations"""
-        recommendations = []
-        
         # Spending analysis
         total_spending = abs(df[df['amount'] < 0]['amount'].sum())
         essential_spending = abs(df[df['category'] == 'Essential']['amount'].sum())
+        span_days = (df['date'].max().normalize() - df['date'].min().normalize()).days + 1
         
-        if essential_spending / total_spending > 0.7:
-            recommendations.append("Good job! 70%+ spending on essentials shows disciplined budgeting")
-        else:
-            recommendations.append("Consider reducing discretionary spending to improve savings")
+        return self._recommendations_from_totals(total_spending, essential_spending, len(df), span_days)
+    
+    def _recommendations_from_totals(self, total_spending: float, essential_spending: float,
+                                     transaction_count: int, span_days: int,
+                                     cohort: Optional[Dict] = None) -> List[str]:
+        """Recommendations from spending totals, shared by all analysis engines"""
+        recommendations = []
+        
+        essential = cohort["metrics"].get("essential_share") if cohort else None
+        if essential is not None:
+            # Measured against the cohort's median instead of a fixed 70% line
+            if essential["value"] >= essential["median"]:
+                recommendations.append(f"Good job! {essential['value']:.0%} of your spending goes to essentials, "
+                                       f"more than {min(essential['percentile'], 99):.0f}% of {self._cohort_peers(cohort)}")
+            else:
+                recommendations.append(f"{self._cohort_peers(cohort).capitalize()} put {essential['median']:.0%} of "
+                                       f"spending on essentials against your {essential['value']:.0%} - consider "
+                                       "reducing discretionary spending to improve savings")
+        elif total_spending > 0:
+            if essential_spending / total_spending > 0.7:
+                recommendations.append("Good job! 70%+ spending on essentials shows disciplined budgeting")
+            else:
+                recommendations.append("Consider reducing discretionary spending to improve savings")
         
-        # Frequency analysis
-        transaction_frequency = len(df) / 30  # Transactions per day
+        # Frequency analysis over the days the transactions actually cover
+        transaction_frequency = transaction_count / max(1, span_days)  # Transactions per day
         if transaction_frequency > 3:
             recommendations.append("High transaction frequency detected - consider bulk purchases to save")
         
         return recommendations
 
 # Flask API wrapper for Node.js integration
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON handling, with request parsing and response encoding timed as stages"""
+    
+    def loads(self, s, **kwargs):
+        with metrics.stage("json_parse"):
+            return super().loads(s, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        with metrics.stage("json_encode"):
+            return super().response(*args, **kwargs)
+
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app)
 
+def _forecast_job(job: Dict):
+    """Process-pool entry point: one goal forecast with the worker's own AIService"""
+    started = time.perf_counter()
+    result = ai_service.forecast_savings_goal(
+        job.get('transactions', []), job.get('goal_amount', 50000),
+        user_id=job.get('user_id'), method=job.get('method', 'auto')
+    )
+    return result, round(time.perf_counter() - started, 4)
+
 # Initialize AI service
 ai_service = AIService()
 
+# Keeps request threads free for health checks and cache hits while models run
+cpu_executor = BoundedExecutor(max_workers=CPU_WORKERS, max_queue=CPU_QUEUE_DEPTH, name="cpu-bound")
+
+# Component counters already kept for /ai/health, exported as gauges at scrape time
+metrics.add_stats("cpu_executor", cpu_executor.stats)
+metrics.add_stats("category_cache", ai_service.category_cache.stats)
+metrics.add_stats("category_batcher", ai_service.category_batcher.stats)
+metrics.add_stats("forecast_cache", ai_service.forecast_cache.stats)
+metrics.add_stats("forecast_pool", ai_service.forecast_pool.stats)
+metrics.add_stats("forecast_fits", ai_service.fit_stats)
+metrics.add_stats("tip_cache", ai_service.tip_cache.stats)
+metrics.add_stats("cohort_store", lambda: (ai_service.registry.peek('cohort_store').stats()
+                                           if ai_service.registry.is_ready('cohort_store') else None))
+metrics.add_gauges(lambda: [("rss_bytes", {}, current_rss_bytes() or 0)])
+
+@app.errorhandler(ExecutorBusy)
+def service_busy(e):
+    response = jsonify({"error": "AI service busy, retry shortly"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(PayloadTooLarge)
+def payload_too_large(e):
+    return jsonify({"error": f"Payload too large: {e}"}), 413
+
+@app.errorhandler(InvalidTransaction)
+def invalid_transaction(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None and request.url_rule is not None:
+        # Streamed responses (forecast-goal/batch) are timed to their first byte
+        metrics.observe("http_request_seconds", time.perf_counter() - started,
+                        endpoint=request.url_rule.rule, status=str(response.status_code))
+    return response
+
+@app.before_request
+def limit_json_body():
+    # request.json buffers and parses the whole body, so refuse oversized ones up front
+    if request.mimetype == 'application/json' and (request.content_length or 0) > JSON_MAX_BYTES:
+        raise PayloadTooLarge(f"JSON body over {JSON_MAX_BYTES / 2**20:g} MB; "
+                              "send transactions as NDJSON (application/x-ndjson) instead")
+
+def _transaction_request():
+    """(params, stream) for an endpoint that takes transactions
+    
+    NDJSON bodies carry one transaction per line and take the other parameters from the
+    query string; JSON bodies carry both and have no stream.
+    """
+    if request.mimetype not in NDJSON_MIMETYPES:
+        return request.json, None
+    if (request.content_length or 0) > STREAM_MAX_BODY_BYTES:
+        raise PayloadTooLarge(f"body over {STREAM_MAX_BODY_BYTES / 2**20:g} MB")
+    stream = TransactionStream(request.stream, STREAM_MAX_MEMORY_BYTES, STREAM_MAX_BODY_BYTES,
+                               chunk_size=PATTERN_CHUNK_SIZE)
+    return request.args.to_dict(), stream
+
+def _user_profile(data: Dict, stream: Optional[TransactionStream]) -> Optional[Dict]:
+    """user_profile from a JSON body, or location_tier/family_size/income query parameters"""
+    if stream is None:
+        profile = data.get('user_profile')
+        return profile if isinstance(profile, dict) and profile else None
+    profile = {key: data[key] for key in ('location_tier', 'family_size', 'income') if key in data}
+    return profile or None
+
+def _flag(value) -> bool:
+    """JSON booleans, or query-string flags like "true"/"1" """
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
 @app.route('/ai/predict-savings', methods=['POST'])
 def predict_savings():
     """ML-powered savings prediction endpoint"""
     data = request.json
-    result = ai_service.predict_safe_savings(data)
+    engine = data.get('model', DEFAULT_SAVINGS_ENGINE)
+    if engine not in SAVINGS_ENGINES:
+        return jsonify({"error": f"unknown model: {engine}"}), 400
+    if engine == 'compact':
+        # Microseconds of work: not worth a trip through the CPU executor
+        return jsonify(ai_service.predict_safe_savings(data, engine))
+    result = cpu_executor.run(ai_service.predict_safe_savings, data, engine)
     return jsonify(result)
 
+@app.route('/ai/predict-savings/batch', methods=['POST'])
+def predict_savings_batch():
+    """Batch ML savings prediction endpoint"""
+    data = request.json
+    users = data.get('users', [])
+    engine = data.get('model', DEFAULT_SAVINGS_ENGINE)
+    if engine not in SAVINGS_ENGINES:
+        return jsonify({"error": f"unknown model: {engine}"}), 400
+    result = cpu_executor.run(ai_service.predict_safe_savings_batch, users, engine)
+    return jsonify({"predictions": result})
+
 @app.route('/ai/forecast-goal', methods=['POST'])
 def forecast_goal():
-    """Time series goal forecasting endpoint"""
-    data = request.json
-    transactions = data.get('transactions', [])
-    goal_amount = data.get('goal_amount', 50000)
-    result = ai_service.forecast_savings_goal(transactions, goal_amount)
+    """Time series goal forecasting endpoint (JSON, or NDJSON transactions)"""
+    data, stream = _transaction_request()
+    goal_amount = float(data.get('goal_amount', 50000))
+    method = data.get('method', 'auto')
+    if method not in FORECAST_METHODS:
+        return jsonify({"error": f"unknown method: {method}"}), 400
+    options = dict(
+        user_id=data.get('user_id'),
+        include_forecast=_flag(data.get('include_forecast', False)),
+        forecast_days=int(data.get('forecast_days', 365)),
+        method=method
+    )
+    if stream is not None:
+        result = cpu_executor.run(ai_service.forecast_savings_goal_stream, stream, goal_amount, **options)
+    else:
+        result = cpu_executor.run(ai_service.forecast_savings_goal, data.get('transactions', []),
+                                  goal_amount, **options)
     return jsonify(result)
 
+@app.route('/ai/forecast-goal/batch', methods=['POST'])
+def forecast_goal_batch():
+    """Batch goal forecasting endpoint, streamed as NDJSON in completion order"""
+    data = request.json
+    jobs = data.get('jobs', [])
+    for job in jobs:
+        if job.get('method', 'auto') not in FORECAST_METHODS:
+            return jsonify({"error": f"unknown method: {job.get('method')}"}), 400
+    
+    def generate():
+        for line in ai_service.forecast_savings_goals_stream(jobs):
+            yield json.dumps(line) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/ai/categorize-merchant', methods=['POST'])
 def categorize_merchant():
     """NLP merchant categorization endpoint"""
     data = request.json
     merchant = data.get('merchant', '')
     description = data.get('description', '')
-    result = ai_service.categorize_merchant_nlp(merchant, description)
+    engine = data.get('engine', DEFAULT_CATEGORY_ENGINE)
+    if engine not in CATEGORY_ENGINES:
+        return jsonify({"error": f"unknown engine: {engine}"}), 400
+    result = ai_service.cached_categorization(merchant, description, engine)
+    if result is None and ai_service.uses_category_batcher(engine):
+        # The batcher thread already serializes model work; through cpu_executor a burst
+        # would be cut to CPU_WORKERS requests per batch and the rest rejected
+        result = ai_service.categorize_merchant_nlp(merchant, description, engine)
+    elif result is None:
+        result = cpu_executor.run(ai_service.categorize_merchant_nlp, merchant, description, engine)
+    return jsonify(result)
+
+@app.route('/ai/categorize-merchants', methods=['POST'])
+def categorize_merchants():
+    """Bulk NLP merchant categorization endpoint"""
+    data = request.json
+    merchants = data.get('merchants', [])
+    engine = data.get('engine', DEFAULT_CATEGORY_ENGINE)
+    if engine not in CATEGORY_ENGINES:
+        return jsonify({"error": f"unknown engine: {engine}"}), 400
+    result = cpu_executor.run(ai_service.categorize_merchants_bulk, merchants, engine)
+    return jsonify({"categorizations": result})
+
+@app.route('/ai/merchant-index/exemplars', methods=['POST'])
+def add_merchant_exemplars():
+    """Add labeled merchants to the embedding categorizer (no retraining)"""
+    data = request.json
+    exemplars = data.get('exemplars', [])
+    if not isinstance(exemplars, list) or not all(isinstance(e, dict) and e.get('merchant') for e in exemplars):
+        return jsonify({"error": "exemplars must be a list of {merchant, category}"}), 400
+    unknown = sorted({str(e.get('category')) for e in exemplars} - set(MERCHANT_CATEGORIES))
+    if unknown:
+        return jsonify({"error": f"unknown categories: {unknown}"}), 400
+    try:
+        result = cpu_executor.run(ai_service.add_merchant_exemplars, exemplars)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
     return jsonify(result)
 
 @app.route('/ai/generate-tips', methods=['POST'])
@@ -502,25 +1533,125 @@ def generate_tips():
 
 @app.route('/ai/analyze-patterns', methods=['POST'])
 def analyze_patterns():
-    """ML spending pattern analysis endpoint"""
-    data = request.json
-    transactions = data.get('transactions', [])
-    result = ai_service.analyze_spending_patterns(transactions)
+    """ML spending pattern analysis endpoint (JSON, or NDJSON transactions)"""
+    data, stream = _transaction_request()
+    transactions = data.get('transactions', []) if stream is None else []
+    user_id = data.get('user_id')
+    # With a user profile the results are relative to the user's cohort (columnar engine)
+    user_profile = _user_profile(data, stream)
+    if user_id is None:
+        engine = data.get('engine')
+        if engine not in (None, 'columnar', 'pandas'):
+            return jsonify({"error": f"unknown engine: {engine}"}), 400
+        if stream is not None:
+            if engine == 'pandas':
+                return jsonify({"error": "streamed transactions use the columnar engine"}), 400
+            return jsonify(cpu_executor.run(ai_service.analyze_spending_patterns_stream, stream,
+                                            user_profile=user_profile))
+        result = cpu_executor.run(ai_service.analyze_spending_patterns, transactions, engine=engine,
+                                  user_profile=user_profile)
+        return jsonify(result)
+    
+    # With a user_id: "delta" (or a "since" timestamp) folds only new transactions into
+    # the stored aggregates, "rebuild" (default) recomputes them from the full list
+    since = data.get('since')
+    mode = data.get('mode', 'delta' if since else 'rebuild')
+    if mode not in ('delta', 'rebuild'):
+        return jsonify({"error": f"unknown mode: {mode}"}), 400
+    result = cpu_executor.run(
+        ai_service.analyze_spending_patterns_incremental, str(user_id), transactions, since=since, rebuild=(mode == 'rebuild'),
+        stream=stream, user_profile=user_profile
+    )
     return jsonify(result)
 
+@app.route('/ai/cohorts/ingest', methods=['POST'])
+def cohort_ingest():
+    """Record a user's transactions in the cohort store (JSON, or NDJSON transactions)"""
+    data, stream = _transaction_request()
+    user_id = data.get('user_id')
+    user_profile = _user_profile(data, stream)
+    if user_id is None or user_profile is None:
+        return jsonify({"error": "user_id and user_profile (location_tier, family_size, income) are required"}), 400
+    if stream is not None:
+        chunks = stream.chunks()
+    else:
+        chunks = iter_transaction_columns(data.get('transactions', []), PATTERN_CHUNK_SIZE)
+    try:
+        applied = cpu_executor.run(ai_service.record_cohort_transactions, user_id, user_profile, chunks)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"user_id": str(user_id), "cohort": cohort_id(user_profile), "applied": applied})
+
+@app.route('/ai/cohorts/refresh', methods=['POST'])
+def cohort_refresh():
+    """Fold newly written files and rebuild the affected cohort percentile tables"""
+    store = ai_service.cohort_store
+    if store is None:
+        return jsonify({"error": "cohort store not available"}), 503
+    refreshed = cpu_executor.run(store.refresh)
+    return jsonify(dict(store.stats(), refreshed=refreshed))
+
+@app.route('/ai/cohorts', methods=['GET'])
+def cohorts():
+    """Cohort store summary and per-cohort medians"""
+    store = ai_service.cohort_store
+    if store is None:
+        return jsonify({"error": "cohort store not available"}), 503
+    return jsonify({"store": store.stats(), "cohorts": store.cohorts()})
+
 @app.route('/ai/health', methods=['GET'])
 def ai_health():
     """AI service health check"""
     return jsonify({
         "status": "healthy",
         "models_loaded": len(ai_service.models),
-        "nlp_available": ai_service.sentiment_pipeline is not None,
+        "nlp_available": (_module_available('transformers') and
+                          ai_service.registry.state('category_pipeline') != FAILED),
         "openai_available": openai is not None and openai.api_key is not None,
-        "prophet_available": Prophet is not None
+        "prophet_available": (_module_available('prophet') and
+                              ai_service.registry.state('prophet') != FAILED),
+        "models": ai_service.registry.status(),
+        "category_engine": DEFAULT_CATEGORY_ENGINE,
+        "merchant_index": (ai_service.registry.peek('merchant_index').stats()
+                           if ai_service.registry.is_ready('merchant_index') else None),
+        "nlp_backend": {
+            "configured": NLP_BACKEND,
+            "threads": NLP_THREADS,
+            **{name: getattr(ai_service.registry.peek(name), 'inference_backend', None)
+               for name in ('category_pipeline', 'sentiment_pipeline')}
+        },
+        "savings_model": (ai_service.models['savings_predictor'].status()
+                          if 'savings_predictor' in ai_service.models else None),
+        "savings_compact": (ai_service.models['savings_compact'].status()
+                            if 'savings_compact' in ai_service.models else None),
+        "category_cache": ai_service.category_cache.stats(),
+        "category_batcher": ai_service.category_batcher.stats(),
+        "forecast_cache": ai_service.forecast_cache.stats(),
+        "forecast_pool": ai_service.forecast_pool.stats(),
+        "forecast_fits": ai_service.fit_stats(),
+        "cpu_executor": cpu_executor.stats(),
+        "tip_cache": ai_service.tip_cache.stats(),
+        "cohort_store": (ai_service.registry.peek('cohort_store').stats()
+                         if ai_service.registry.is_ready('cohort_store') else None),
+        "merchant_keywords": ai_service.keyword_matcher.stats(),
+        "rss_mb": round((current_rss_bytes() or 0) / 2**20, 1)
     })
 
+@app.route('/ai/metrics', methods=['GET'])
+def ai_metrics():
+    """Prometheus scrape endpoint (per process; each gunicorn worker reports its own)"""
+    if not metrics.enabled:
+        return jsonify({"error": "metrics disabled (AI_METRICS=0)"}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     print("🤖 Starting AI/ML Service...")
     print("📊 Models loaded:", len(ai_service.models))
-    print("🔗 Available at: http://localhost:5000")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    port = int(os.getenv("AI_PORT", "5000"))
+    print(f"🔗 Available at: http://localhost:{port}")
+    # Development server only; the reloader (AI_DEBUG=1) imports the module, and builds
+    # AIService, twice. Production: gunicorn -c gunicorn_conf.py ai_service:app
+    debug = os.getenv("AI_DEBUG", "0") == "1"
+    ai_service.prewarm_tips()
+    ai_service.prewarm_cohorts()
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
\ No newline at end of file
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Zero-shot categorization throughput at different batch sizes
+
+Usage:
+    python benchmarks/bench_categorize_batching.py                  # facebook/bart-large-mnli
+    python benchmarks/bench_categorize_batching.py --model valhalla/distilbart-mnli-12-1
+    python benchmarks/bench_categorize_batching.py --stub           # no model, batching mechanics only
+
+Reports items/sec calling the pipeline directly with batch 1/8/32, and through the
+MicroBatcher with concurrent single-item callers (the /ai/categorize-merchant path).
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from micro_batcher import MicroBatcher  # noqa: E402
+
+CATEGORIES = ["Essential", "Discretionary", "Debt", "Income"]
+
+MERCHANTS = [
+    "Big Bazaar", "Punjab Kirana Store", "Mother Dairy", "Reliance Fresh", "Apollo Pharmacy",
+    "Indian Oil Petrol Pump", "BSES Electricity Bill", "Swiggy", "Zomato", "BookMyShow",
+    "Amazon", "Flipkart", "Myntra", "HDFC Bank EMI", "LIC Premium", "Credit Card Payment",
+    "Salary Credit", "Freelance Payment", "Airtel Recharge", "Jio Recharge",
+    "DMart", "More Supermarket", "PVR Cinemas", "Ola Cabs", "Uber India",
+]
+
+
+def stub_pipeline(per_call_ms: float = 8.0, per_item_ms: float = 1.5):
+    """Stand-in with a fixed per-call overhead, like tokenizer/framework setup"""
+    def _pipeline(texts, labels, batch_size=None):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        time.sleep((per_call_ms + per_item_ms * len(batch)) / 1000.0)
+        out = [{"sequence": t, "labels": list(labels), "scores": [0.7, 0.1, 0.1, 0.1]} for t in batch]
+        return out[0] if single else out
+    return _pipeline
+
+
+def load_pipeline(model: str, threads: int):
+    import torch
+    from transformers import pipeline
+    if threads:
+        torch.set_num_threads(threads)
+    return pipeline("zero-shot-classification", model=model, device=-1)
+
+
+def bench_direct(pipe, texts, batch_size: int) -> float:
+    """Items/sec calling the pipeline with fixed-size batches"""
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        pipe(chunk if batch_size > 1 else chunk[0], CATEGORIES, batch_size=batch_size)
+    return len(texts) / (time.perf_counter() - started)
+
+
+def bench_batcher(pipe, texts, max_batch_size: int, max_wait_ms: float, concurrency: int) -> dict:
+    """Items/sec for concurrent single-item callers going through the MicroBatcher"""
+    batcher = MicroBatcher(
+        lambda batch: pipe(batch, CATEGORIES, batch_size=len(batch)),
+        max_batch_size=max_batch_size, max_wait_ms=max_wait_ms
+    )
+    batcher(texts[0])  # start the worker thread outside the timed region
+    batcher.batches = batcher.items = 0
+
+    cursor = iter(range(len(texts)))
+    cursor_lock = threading.Lock()
+
+    def _caller():
+        while True:
+            with cursor_lock:
+                i = next(cursor, None)
+            if i is None:
+                return
+            batcher(texts[i])
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=_caller) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {"items_per_sec": round(len(texts) / elapsed, 1), **batcher.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="facebook/bart-large-mnli")
+    parser.add_argument("--stub", action="store_true", help="use a sleep-based stand-in pipeline")
+    parser.add_argument("--items", type=int, default=256)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    pipe = stub_pipeline() if args.stub else load_pipeline(args.model, args.threads)
+    texts = [MERCHANTS[i % len(MERCHANTS)] + f" #{i}" for i in range(args.items)]
+
+    # Warm-up so lazy initialization is not timed
+    pipe(texts[:2], CATEGORIES, batch_size=2)
+
+    results = {"model": "stub" if args.stub else args.model, "items": args.items,
+               "direct": {}, "micro_batcher": {}}
+    for batch_size in (1, 8, 32):
+        results["direct"][batch_size] = round(bench_direct(pipe, texts, batch_size), 1)
+        results["micro_batcher"][batch_size] = bench_batcher(
+            pipe, texts, batch_size, args.max_wait_ms, args.concurrency)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Model: {results['model']}  items: {args.items}  concurrency: {args.concurrency}")
+    print(f"{'batch':>6} {'direct items/s':>15} {'batcher items/s':>16} {'avg batch':>10}")
+    for batch_size in (1, 8, 32):
+        batched = results["micro_batcher"][batch_size]
+        print(f"{batch_size:>6} {results['direct'][batch_size]:>15} "
+              f"{batched['items_per_sec']:>16} {str(batched['avg_batch_size']):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Cohort store at scale: ingest, full and incremental refresh, lookup latency
+
+Usage:
+    python benchmarks/bench_cohorts.py                        # 20k users, about 4M rows
+    python benchmarks/bench_cohorts.py --users 100000         # about 20M rows
+    python benchmarks/bench_cohorts.py --root /data/cohorts --keep
+
+Users get profiles from the savings model's training distribution and a year of
+transactions with per-user category and weekend habits, so cohort percentiles have
+something to separate. Reported: ingest rows/s (including Parquet writes), the first
+refresh over everything, an incremental refresh after one more month of data for a
+tenth of the users, a restart from the snapshot, compaction followed by a refold from
+scratch, compare() latency percentiles, and the store's size on disk and the process RSS.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cohort_store import CohortStore, MANIFEST_FILE  # noqa: E402
+from columnar_patterns import NS_PER_DAY, PatternAccumulator, TransactionColumns  # noqa: E402
+from model_registry import current_rss_bytes  # noqa: E402
+from synthetic_data import AMOUNT_RANGES, savings_profiles  # noqa: E402
+
+CATEGORIES = ["Essential", "Discretionary", "Debt", "Income"]
+START_NS = int(np.datetime64("2024-01-01T00:00:00", "ns").astype(np.int64))
+
+
+def user_columns(rng: np.random.Generator, start_day: int, days: int, per_month: float) -> TransactionColumns:
+    """A user's transactions over [start_day, start_day + days) with their own habits"""
+    n = max(1, rng.poisson(per_month * days / 30))
+    discretionary = rng.uniform(0.1, 0.5)
+    weights = np.array([0.85 - discretionary, discretionary, 0.1, 0.05])
+    codes = rng.choice(4, size=n, p=weights / weights.sum()).astype(np.int32)
+
+    # Weekend lovers move some weekday transactions onto Saturday/Sunday
+    day = start_day + rng.integers(0, days, size=n)
+    weekend_bias = rng.uniform(0.0, 0.5)
+    shift = rng.random(n) < weekend_bias
+    day[shift] += (5 - day[shift] % 7) % 7  # forward to the next Saturday (2024-01-01 is a Monday)
+    ns = START_NS + day * NS_PER_DAY + rng.integers(8, 23, size=n) * 3_600_000_000_000
+
+    low = np.array([AMOUNT_RANGES[c][0] for c in CATEGORIES], dtype=np.float64)
+    high = np.array([AMOUNT_RANGES[c][1] for c in CATEGORIES], dtype=np.float64)
+    amount = rng.uniform(low[codes], high[codes])
+    amount[codes != 3] *= -1  # Income is the only credit
+    return TransactionColumns(ns, ns, np.round(amount, 2), codes, CATEGORIES)
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--per-month", type=float, default=17, help="transactions per user per month")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--root", help="store directory (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="keep the store afterwards")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    root = args.root or tempfile.mkdtemp(prefix="cohorts-")
+    rng = np.random.default_rng(args.seed)
+    profiles = savings_profiles(args.users, seed=args.seed)
+    user_ids = [f"user-{i}" for i in range(args.users)]
+    results = {"users": args.users}
+    try:
+        store = CohortStore(root, refresh_s=1e9)
+
+        started = time.perf_counter()
+        rows = 0
+        for user_id, profile in zip(user_ids, profiles):
+            rows += store.ingest(user_id, profile, [user_columns(rng, 0, args.days, args.per_month)])
+        store.flush()
+        ingest_s = time.perf_counter() - started
+        results["rows"] = rows
+        results["ingest_rows_per_sec"] = round(rows / ingest_s)
+
+        started = time.perf_counter()
+        store.refresh()
+        results["full_refresh_s"] = round(time.perf_counter() - started, 2)
+        results["parts"] = store.stats()["parts"]
+
+        # One more month for a tenth of the users: only their new files are read
+        started = time.perf_counter()
+        new_rows = 0
+        for i in range(0, args.users, 10):
+            new_rows += store.ingest(user_ids[i], profiles[i], [user_columns(rng, args.days, 30, args.per_month)])
+        ingest_s = time.perf_counter() - started
+        started = time.perf_counter()
+        store.refresh()
+        results["incremental_rows"] = new_rows
+        results["incremental_ingest_s"] = round(ingest_s, 2)
+        results["incremental_refresh_s"] = round(time.perf_counter() - started, 2)
+
+        started = time.perf_counter()
+        restarted = CohortStore(root, refresh_s=1e9)
+        restarted.refresh()
+        results["restart_s"] = round(time.perf_counter() - started, 2)
+
+        # Compaction, then folding everything again without the snapshot
+        started = time.perf_counter()
+        store.compact(min_files=2)
+        results["compact_s"] = round(time.perf_counter() - started, 2)
+        os.remove(os.path.join(root, MANIFEST_FILE))
+        started = time.perf_counter()
+        refolded = CohortStore(root, refresh_s=1e9)
+        refolded.refresh()
+        results["refold_after_compact_s"] = round(time.perf_counter() - started, 2)
+        results["parts_after_compact"] = refolded.stats()["parts"]
+
+        # Users with the last half year of transactions, the span the tables cover
+        accumulators = []
+        for _ in range(min(args.lookups, 1000)):
+            accumulator = PatternAccumulator()
+            accumulator.update(user_columns(rng, args.days + 30 - 182, 182, args.per_month))
+            accumulators.append(accumulator)
+        latencies = []
+        for i in range(args.lookups):
+            started = time.perf_counter()
+            store.compare(profiles[i % args.users], accumulators[i % len(accumulators)])
+            latencies.append(time.perf_counter() - started)
+        results["compare_ms"] = {"p50": percentile_ms(latencies, 50), "p99": percentile_ms(latencies, 99)}
+        results["cohorts"] = store.stats()["cohorts"]
+        results["disk_mb"] = round(sum(os.path.getsize(os.path.join(d, f))
+                                       for d, _, files in os.walk(root) for f in files) / 2**20, 1)
+        results["rss_mb"] = round((current_rss_bytes() or 0) / 2**20, 1)
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{results['users']} users, {results['rows']:,} rows in {results['parts']} files "
+          f"({results['disk_mb']} MB), {results['cohorts']} cohorts")
+    print(f"ingest:              {results['ingest_rows_per_sec']:,} rows/s")
+    print(f"full refresh:        {results['full_refresh_s']} s")
+    print(f"incremental refresh: {results['incremental_refresh_s']} s after {results['incremental_rows']:,} new rows")
+    print(f"restart + refresh:   {results['restart_s']} s")
+    print(f"compact:             {results['compact_s']} s, {results['parts_after_compact']} files; "
+          f"refolding them without the snapshot {results['refold_after_compact_s']} s")
+    print(f"compare():           p50 {results['compare_ms']['p50']} ms, p99 {results['compare_ms']['p99']} ms")
+    print(f"RSS:                 {results['rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Goal-forecast engines: accuracy vs latency on synthetic expense histories
+
+Usage:
+    python benchmarks/bench_forecast.py
+    python benchmarks/bench_forecast.py --users 5000 --prophet-users 0 --json
+
+Each synthetic user has a daily expense series with a weekly pattern, a salary-cycle
+monthly pattern, slow drift and noise. The last 30 days are held out; every engine
+forecasts their total, and the error is reported as MAPE. Prophet is fitted on the
+first --prophet-users series only (one fit per user).
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fast_forecast import forecast_batch  # noqa: E402
+
+HORIZON = 30
+
+
+def synthetic_series(users: int, days: int, seed: int = 5):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=days + HORIZON, freq="D")
+    weekday = dates.dayofweek.to_numpy()
+    dom = dates.day.to_numpy()
+    t = np.arange(days + HORIZON)
+    series = []
+    for _ in range(users):
+        base = rng.uniform(300, 1500)
+        weekly = rng.normal(0, 0.15, 7) * base
+        weekly[5:] += rng.uniform(0.1, 0.4) * base      # weekend spending
+        salary_boost = rng.uniform(0.0, 0.5) * base * (dom <= 7)
+        drift = base * rng.normal(0, 0.001) * t
+        noise = rng.normal(0, rng.uniform(0.1, 0.4) * base, len(t))
+        y = np.maximum(0.0, base + weekly[weekday] + salary_boost + drift + noise)
+        series.append(pd.DataFrame({"ds": dates, "y": y}))
+    return series
+
+
+def mape(pred: np.ndarray, actual: np.ndarray) -> float:
+    return float(np.mean(np.abs(pred - actual) / np.maximum(actual, 1.0)) * 100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=180, help="history length before the holdout")
+    parser.add_argument("--prophet-users", type=int, default=20)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    full = synthetic_series(args.users, args.days)
+    history = [df.iloc[:-HORIZON].reset_index(drop=True) for df in full]
+    actual = np.array([df["y"].iloc[-HORIZON:].sum() for df in full])
+    results = {"users": args.users, "history_days": args.days, "horizon_days": HORIZON, "engines": {}}
+
+    # Simple: mean daily expense x 30, like _simple_goal_forecast
+    started = time.perf_counter()
+    simple = np.array([df["y"].mean() * HORIZON for df in history])
+    results["engines"]["simple"] = {
+        "mape_pct": round(mape(simple, actual), 2),
+        "ms_per_series": round((time.perf_counter() - started) * 1000 / args.users, 4)
+    }
+
+    # Exponential smoothing: one batched call for every user
+    started = time.perf_counter()
+    stats = forecast_batch(history, horizon=HORIZON)
+    elapsed = time.perf_counter() - started
+    smoothing = np.array([s["expense_forecast"] for s in stats])
+    lower = np.array([s["expense_lower"] for s in stats])
+    upper = np.array([s["expense_upper"] for s in stats])
+    results["engines"]["exponential_smoothing"] = {
+        "mape_pct": round(mape(smoothing, actual), 2),
+        "ms_per_series": round(elapsed * 1000 / args.users, 4),
+        "batch_seconds": round(elapsed, 3),
+        "interval_80_coverage_pct": round(float(np.mean((actual >= lower) & (actual <= upper)) * 100), 1)
+    }
+
+    if args.prophet_users:
+        try:
+            from prophet import Prophet
+        except ImportError:
+            Prophet = None
+            results["engines"]["prophet"] = {"skipped": "prophet not installed"}
+        if Prophet is not None:
+            logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+            logging.getLogger("prophet").setLevel(logging.WARNING)
+            n = min(args.prophet_users, args.users)
+            preds, elapsed = [], 0.0
+            for df in history[:n]:
+                started = time.perf_counter()
+                model = Prophet(yearly_seasonality=True, weekly_seasonality=True, daily_seasonality=False)
+                model.fit(df)
+                forecast = model.predict(model.make_future_dataframe(periods=HORIZON, include_history=False))
+                elapsed += time.perf_counter() - started
+                preds.append(float(np.maximum(forecast["yhat"].to_numpy(), 0).sum()))
+            results["engines"]["prophet"] = {
+                "mape_pct": round(mape(np.array(preds), actual[:n]), 2),
+                "ms_per_series": round(elapsed * 1000 / n, 2),
+                "series": n,
+                "exponential_smoothing_mape_same_series_pct": round(mape(smoothing[:n], actual[:n]), 2)
+            }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.users} users, {args.days} days history, {HORIZON}-day holdout")
+    print(f"{'engine':>22} {'MAPE %':>8} {'ms/series':>10}")
+    for name, row in results["engines"].items():
+        if "skipped" in row:
+            print(f"{name:>22} skipped ({row['skipped']})")
+            continue
+        print(f"{name:>22} {row['mape_pct']:>8} {row['ms_per_series']:>10}")
+    smoothing_row = results["engines"]["exponential_smoothing"]
+    print(f"exponential smoothing 80% interval coverage: {smoothing_row['interval_80_coverage_pct']}%")
+    if "series" in results["engines"].get("prophet", {}):
+        prophet_row = results["engines"]["prophet"]
+        print(f"on Prophet's {prophet_row['series']} series, exponential smoothing MAPE: "
+              f"{prophet_row['exponential_smoothing_mape_same_series_pct']}%")
+
+
+if __name__ == "__main__":
+    main()
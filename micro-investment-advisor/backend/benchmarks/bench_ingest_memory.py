@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Peak memory of transaction uploads: one JSON body vs streamed NDJSON
+
+Usage:
+    python benchmarks/bench_ingest_memory.py
+    python benchmarks/bench_ingest_memory.py --sizes 10000 100000 --json
+
+For each size, writes a synthetic statement to a temp file as a JSON body and as NDJSON,
+then posts it to /ai/analyze-patterns and /ai/forecast-goal (exponential smoothing) in a
+fresh process per run, with the body read from the file the way a server reads its
+socket. Reports the process's peak RSS growth over its post-import RSS.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+ENDPOINTS = {
+    "analyze-patterns": "/ai/analyze-patterns",
+    "forecast-goal": "/ai/forecast-goal?method=exponential_smoothing&goal_amount=50000",
+}
+
+
+def write_bodies(n: int, directory: str, seed: int = 7):
+    """Same transactions as <n>.json ({"transactions": [...]}) and <n>.ndjson"""
+    rng = random.Random(seed)
+    json_path = os.path.join(directory, f"{n}.json")
+    ndjson_path = os.path.join(directory, f"{n}.ndjson")
+    with open(json_path, "w") as body, open(ndjson_path, "w") as lines:
+        body.write('{"method": "exponential_smoothing", "goal_amount": 50000, "transactions": [')
+        for i in range(n):
+            line = json.dumps({
+                "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:"
+                        f"{rng.randint(0, 59):02d}:00+05:30",
+                "amount": round(rng.choice([-1, -1, -1, 1]) * rng.uniform(10, 5000), 2),
+                "category": rng.choice(["Essential", "Discretionary", "Debt", "Income"])
+            })
+            body.write(("," if i else "") + line)
+            lines.write(line + "\n")
+        body.write("]}")
+    return json_path, ndjson_path
+
+
+def child(mode: str, endpoint: str, path: str):
+    """Runs in a fresh process: one request, prints peak RSS growth as JSON"""
+    os.environ.setdefault("AI_JSON_MAX_MB", "100000")
+    import ai_service
+    from model_registry import current_rss_bytes
+
+    client = ai_service.app.test_client()
+    content_type = "application/json" if mode == "json" else "application/x-ndjson"
+    baseline = current_rss_bytes()
+    started = time.perf_counter()
+    with open(path, "rb") as body:
+        response = client.post(ENDPOINTS[endpoint], input_stream=body, content_type=content_type,
+                               content_length=os.path.getsize(path))
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps({"status": response.status_code, "seconds": round(elapsed, 2),
+                      "peak_growth_mb": round((peak - baseline) / 2**20, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "ENDPOINT", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n in args.sizes:
+            paths = dict(zip(("json", "ndjson"), write_bodies(n, directory)))
+            for endpoint in args.endpoints:
+                row = {"transactions": n, "endpoint": endpoint,
+                       "body_mb": round(os.path.getsize(paths["json"]) / 2**20, 1)}
+                for mode, path in paths.items():
+                    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, endpoint, path],
+                                         cwd=BACKEND, capture_output=True, text=True, check=True)
+                    row[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+                results.append(row)
+                if not args.json:
+                    print(f"{n:>9} {endpoint:<17} body {row['body_mb']:>6} MB | "
+                          f"JSON peak +{row['json']['peak_growth_mb']:>7} MB {row['json']['seconds']:>6}s | "
+                          f"NDJSON peak +{row['ndjson']['peak_growth_mb']:>6} MB {row['ndjson']['seconds']:>6}s")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
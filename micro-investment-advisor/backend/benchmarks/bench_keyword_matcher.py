@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Per-lookup latency of the rule-based keyword matcher as the dictionary grows
+
+Usage:
+    python benchmarks/bench_keyword_matcher.py
+    python benchmarks/bench_keyword_matcher.py --sizes 100 10000 100000 --json
+
+Synthetic brand names and UPI handles are appended to the shipped dictionary. The naive
+column is the previous approach (substring scan over every keyword) for comparison.
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyword_matcher import KeywordMatcher, DEFAULT_KEYWORDS_PATH  # noqa: E402
+
+CATEGORIES = ["Essential", "Discretionary", "Debt", "Income"]
+
+QUERIES = [
+    "Big Bazaar", "Punjab Kirana Store", "Mother Dairy", "Reliance Fresh", "Paytm Recharge",
+    "Bharat Gas", "State Bus Depot", "LIC Premium", "HDFC Bank EMI", "Credit Card Payment",
+    "Swiggy", "Zomato", "BookMyShow", "Myntra", "Amazon", "Flipkart", "Salary Credit",
+    "Freelance Payment", "UPI/9876543210@ybl/Sharma General Store", "POS 4411 Unknown Merchant",
+]
+
+
+def synthetic_spec(size: int, seed: int = 7) -> dict:
+    """Shipped dictionary plus `size` random brand keywords"""
+    with open(DEFAULT_KEYWORDS_PATH, encoding='utf-8') as f:
+        spec = json.load(f)
+    rng = random.Random(seed)
+    keywords = list(spec["keywords"])
+    for _ in range(size):
+        stem = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+        keyword = f"{stem}@okaxis" if rng.random() < 0.2 else stem
+        keywords.append({
+            "keyword": keyword,
+            "category": rng.choice(CATEGORIES),
+            "priority": rng.randint(0, 2),
+            "confidence": 0.8
+        })
+    return {**spec, "keywords": keywords}
+
+
+def naive_categorize(keywords, merchant_name: str):
+    merchant_lower = merchant_name.lower()
+    for item in keywords:
+        if item["keyword"] in merchant_lower:
+            return item["category"]
+    return "Essential"
+
+
+def time_per_lookup_us(fn, queries, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for q in queries:
+            fn(q)
+    return (time.perf_counter() - started) / (rounds * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1000, 10000, 50000, 100000])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--naive-limit", type=int, default=50000,
+                        help="skip the naive scan above this many keywords")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        spec = synthetic_spec(size)
+        started = time.perf_counter()
+        matcher = KeywordMatcher.from_spec(spec)
+        build_s = time.perf_counter() - started
+        row = {
+            "keywords": matcher.size,
+            "build_s": round(build_s, 3),
+            "matcher_us": round(time_per_lookup_us(matcher.categorize, QUERIES, args.rounds), 2),
+            "naive_us": None
+        }
+        if len(spec["keywords"]) <= args.naive_limit:
+            naive_rounds = max(1, args.rounds // 10)
+            row["naive_us"] = round(time_per_lookup_us(
+                lambda q: naive_categorize(spec["keywords"], q), QUERIES, naive_rounds), 2)
+        rows.append(row)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'keywords':>9} {'build s':>8} {'matcher us':>11} {'naive us':>10}")
+    for row in rows:
+        naive = "-" if row["naive_us"] is None else row["naive_us"]
+        print(f"{row['keywords']:>9} {row['build_s']:>8} {row['matcher_us']:>11} {naive:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Embedding merchant index vs zero-shot: throughput, accuracy and index updates
+
+Usage:
+    python benchmarks/bench_merchant_index.py                           # all-MiniLM-L6-v2 vs bart-large-mnli
+    python benchmarks/bench_merchant_index.py --encoder hashing --no-zero-shot
+    python benchmarks/bench_merchant_index.py --zero-shot-model valhalla/distilbart-mnli-12-1 --offline
+
+Both categorizers label the same statement-style merchant strings
+(benchmarks/synthetic_data.py), whose expected category is known, at batch 1 and --batch.
+The report covers items/sec, accuracy, index build time, and the cost of adding labeled
+merchants at runtime: the latency of MerchantIndex.add, accuracy before and after adding a
+few merchants the keyword dictionary lacks, and classification time as the index grows.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from keyword_matcher import KeywordMatcher, DEFAULT_KEYWORDS_PATH  # noqa: E402
+from merchant_embeddings import MerchantIndex, load_encoder, DEFAULT_EMBEDDING_MODEL, DEFAULT_SEEDS_PATH  # noqa: E402
+from synthetic_data import MERCHANTS, merchant_strings  # noqa: E402
+
+CATEGORIES = ["Essential", "Discretionary", "Debt", "Income"]
+
+
+def items_per_sec(classify, texts, batch_size: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        classify(texts[start:start + batch_size])
+    return len(texts) / (time.perf_counter() - started)
+
+
+def accuracy(predicted, expected) -> float:
+    return round(sum(p == e for p, e in zip(predicted, expected)) / len(expected), 4)
+
+
+def bench_index(args, texts, expected) -> dict:
+    encoder = load_encoder(args.encoder, args.threads)
+    started = time.perf_counter()
+    index = MerchantIndex.build(encoder, DEFAULT_KEYWORDS_PATH, DEFAULT_SEEDS_PATH, categories=CATEGORIES)
+    build_ms = (time.perf_counter() - started) * 1000
+    index.classify(texts[:2])  # warm-up
+
+    def classify(batch):
+        return index.classify(batch)
+
+    row = {
+        "encoder": encoder.name,
+        "build_ms": round(build_ms, 1),
+        "rows": index.stats()["rows"],
+        "items_per_sec_batch_1": round(items_per_sec(classify, texts[:args.single_items], 1), 1),
+        f"items_per_sec_batch_{args.batch}": round(items_per_sec(classify, texts, args.batch), 1),
+        "accuracy": accuracy([r["category"] for r in index.classify(texts)], expected)
+    }
+
+    # Merchants neither the keyword dictionary nor the seed list covers, labeled at runtime
+    matcher = KeywordMatcher.from_file(DEFAULT_KEYWORDS_PATH)
+    with open(DEFAULT_SEEDS_PATH, encoding='utf-8') as f:
+        seeded = {s["merchant"] for s in json.load(f)["merchants"]}
+    missing = [(name, category) for category, names in MERCHANTS.items() for name in names
+               if matcher.match(name) is None and not any(seed in name.lower() for seed in seeded)][:args.add]
+    started = time.perf_counter()
+    index.add([name for name, _ in missing], [category for _, category in missing])
+    row["added_merchants"] = len(missing)
+    row["add_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    row["accuracy_after_add"] = accuracy([r["category"] for r in index.classify(texts)], expected)
+
+    # Search cost as the index grows (synthetic rows; only the matrix size matters here)
+    scaling = {}
+    filler = [f"merchant {i} store" for i in range(max(args.grow))]
+    grown = 0
+    for size in sorted(args.grow):
+        index.add(filler[grown:size], [CATEGORIES[i % len(CATEGORIES)] for i in range(grown, size)])
+        grown = size
+        scaling[index.stats()["rows"]] = round(items_per_sec(classify, texts, args.batch), 1)
+    row["items_per_sec_by_rows"] = scaling
+    return row
+
+
+def bench_zero_shot(args, texts, expected) -> dict:
+    from nlp_backends import load_pipeline
+
+    pipe = load_pipeline("zero-shot-classification", args.zero_shot_model, args.backend, args.threads)
+
+    def classify(batch):
+        out = pipe(batch, CATEGORIES, batch_size=len(batch))
+        return [out] if isinstance(out, dict) else out
+
+    classify(texts[:2])  # warm-up
+    single = texts[:args.single_items]
+    return {
+        "model": args.zero_shot_model,
+        "backend": pipe.inference_backend,
+        "items_per_sec_batch_1": round(items_per_sec(classify, single, 1), 1),
+        f"items_per_sec_batch_{args.batch}": round(items_per_sec(classify, texts, args.batch), 1),
+        "accuracy": accuracy([r["labels"][0] for r in classify(texts)], expected)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--encoder", default=os.getenv("AI_EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL),
+                        help="sentence-transformers model, or 'hashing'")
+    parser.add_argument("--zero-shot-model", default=os.getenv("AI_CATEGORY_MODEL", "facebook/bart-large-mnli"))
+    parser.add_argument("--backend", default=os.getenv("AI_NLP_BACKEND", "pytorch"),
+                        help="zero-shot inference backend (see nlp_backends.py)")
+    parser.add_argument("--no-zero-shot", action="store_true", help="benchmark the index only")
+    parser.add_argument("--samples", type=int, default=512)
+    parser.add_argument("--single-items", type=int, default=64, help="items timed one at a time")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--add", type=int, default=10, help="labeled merchants added at runtime")
+    parser.add_argument("--grow", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="index sizes to time classification at")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("AI_NLP_THREADS", "0")))
+    parser.add_argument("--seed", type=int, default=21)
+    parser.add_argument("--offline", action="store_true", help="use only locally cached weights")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.offline:
+        os.environ.update(HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+    items = merchant_strings(args.samples, seed=args.seed)
+    texts = [f"{item['merchant']} {item['description']}".strip() for item in items]
+    expected = [item["category"] for item in items]
+
+    results = {"samples": args.samples, "embedding": bench_index(args, texts, expected)}
+    if not args.no_zero_shot:
+        try:
+            results["zero_shot"] = bench_zero_shot(args, texts, expected)
+        except ImportError as e:
+            results["zero_shot"] = None
+            print(f"⚠️ Zero-shot skipped, transformers not installed: {e}", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    emb, zs = results["embedding"], results.get("zero_shot")
+    b = f"items_per_sec_batch_{args.batch}"
+    print(f"{args.samples} merchant strings")
+    print(f"{'categorizer':>34} {'items/s b1':>11} {'items/s b' + str(args.batch):>12} {'accuracy':>9}")
+    print(f"{'embedding (' + emb['encoder'] + ')':>34} {emb['items_per_sec_batch_1']:>11} {emb[b]:>12} "
+          f"{emb['accuracy']:>9}")
+    if zs:
+        print(f"{'zero-shot (' + zs['model'].split('/')[-1] + ', ' + zs['backend'] + ')':>34} "
+              f"{zs['items_per_sec_batch_1']:>11} {zs[b]:>12} {zs['accuracy']:>9}")
+        print(f"Embedding speed-up at batch {args.batch}: {emb[b] / zs[b]:.0f}x")
+    print(f"Index: {emb['rows']} rows built in {emb['build_ms']} ms; adding {emb['added_merchants']} "
+          f"merchants took {emb['add_ms']} ms, accuracy {emb['accuracy']} -> {emb['accuracy_after_add']}")
+    print("items/s by index rows: " + ", ".join(f"{rows}: {ips}" for rows, ips in emb["items_per_sec_by_rows"].items()))
+
+
+if __name__ == "__main__":
+    main()
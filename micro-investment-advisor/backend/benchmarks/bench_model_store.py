@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Savings model: pickled sklearn forest vs memory-mapped flat forest from the model store
+
+Usage:
+    python benchmarks/bench_model_store.py
+    python benchmarks/bench_model_store.py --trees 300 --rows 1 100 100000 --json
+
+Trains a forest in a temporary store, then compares load time, private memory added by
+loading, single-row and batch prediction latency, and checks the predictions are equal.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import current_rss_bytes  # noqa: E402
+from model_store import ModelStore  # noqa: E402
+from train_models import SAVINGS_MODEL, publish, synthetic_savings_data, train_savings_model  # noqa: E402
+
+
+def timed(fn, repeat: int = 1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    model, scaler, _, X_test = train_savings_model(n_estimators=args.trees)
+    with tempfile.TemporaryDirectory() as root:
+        pickle_path = os.path.join(root, "savings_predictor.pkl")
+        with open(pickle_path, "wb") as f:
+            pickle.dump((model, scaler), f)
+        store = ModelStore(root)
+        publish(store, model, scaler, X_test, {"source": "benchmark"}, promote=True)
+        del model, scaler
+
+        rss = current_rss_bytes()
+        (model, scaler), pickle_load = timed(lambda: pickle.load(open(pickle_path, "rb")))
+        pickle_rss = current_rss_bytes() - rss
+        rss = current_rss_bytes()
+        forest, mmap_load = timed(lambda: store.load_forest(SAVINGS_MODEL))
+        mmap_rss = current_rss_bytes() - rss
+
+        results = {"trees": args.trees, "nodes": forest.manifest["n_nodes"],
+                   "pickle_load_ms": round(pickle_load * 1000, 2),
+                   "mmap_load_ms": round(mmap_load * 1000, 2),
+                   "pickle_rss_mb": round(pickle_rss / 2**20, 2),
+                   "mmap_rss_mb": round(mmap_rss / 2**20, 2),
+                   "predict": []}
+        for n in args.rows:
+            X, _ = synthetic_savings_data(n, seed=n)
+            repeat = max(1, 2000 // n)
+            expected, sk_time = timed(lambda: model.predict(scaler.transform(X)), repeat)
+            actual, flat_time = timed(lambda: forest.predict(X), repeat)
+            results["predict"].append({
+                "rows": n,
+                "sklearn_ms": round(sk_time * 1000, 3),
+                "flat_ms": round(flat_time * 1000, 3),
+                "max_abs_diff": float(np.max(np.abs(expected - actual)))
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{results['trees']} trees, {results['nodes']} nodes")
+    print(f"load: pickle {results['pickle_load_ms']} ms (+{results['pickle_rss_mb']} MB private), "
+          f"mmap {results['mmap_load_ms']} ms (+{results['mmap_rss_mb']} MB, file-backed pages are shared)")
+    print(f"{'rows':>8} {'sklearn ms':>11} {'flat ms':>9} {'max diff':>9}")
+    for row in results["predict"]:
+        print(f"{row['rows']:>8} {row['sklearn_ms']:>11} {row['flat_ms']:>9} {row['max_abs_diff']:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Spending-pattern analysis: columnar engine vs the pandas DataFrame path
+
+Usage:
+    python benchmarks/bench_spending_patterns.py
+    python benchmarks/bench_spending_patterns.py --sizes 10000 1000000 --json
+
+Reports wall time and peak traced allocation (tracemalloc, excluding the input list)
+per engine, and checks that both engines return the same patterns and recommendations.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ai_service  # noqa: E402
+from synthetic_data import synthetic_transactions  # noqa: E402
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    service = ai_service.ai_service
+    rows = []
+    for size in args.sizes:
+        transactions = synthetic_transactions(size)
+        row = {"transactions": size}
+        outputs = {}
+        for engine in ("pandas", "columnar"):
+            result, elapsed, peak = measure(
+                lambda: service.analyze_spending_patterns(transactions, engine=engine))
+            outputs[engine] = result
+            row[f"{engine}_s"] = round(elapsed, 3)
+            row[f"{engine}_peak_mb"] = round(peak / 2**20, 1)
+        row["speedup"] = round(row["pandas_s"] / row["columnar_s"], 1)
+        row["identical"] = all(
+            outputs["pandas"][key] == outputs["columnar"][key]
+            for key in ("patterns", "insights", "recommendations")
+        )
+        rows.append(row)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'transactions':>12} {'pandas s':>9} {'peak MB':>8} {'columnar s':>11} {'peak MB':>8} "
+          f"{'speedup':>8} {'identical':>10}")
+    for row in rows:
+        print(f"{row['transactions']:>12} {row['pandas_s']:>9} {row['pandas_peak_mb']:>8} "
+              f"{row['columnar_s']:>11} {row['columnar_peak_mb']:>8} {row['speedup']:>8} "
+              f"{str(row['identical']):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: per-method micro-benchmarks and an HTTP load run, offline, with baselines
+
+Usage:
+    python benchmarks/bench_suite.py --out baseline.json                 # micro + load
+    python benchmarks/bench_suite.py --out new.json --baseline baseline.json
+    python benchmarks/bench_suite.py --suite micro --quick --only predict_savings categorize
+    python benchmarks/bench_suite.py --suite load --concurrency 32 --duration 30
+    python benchmarks/bench_suite.py --compare new.json baseline.json --threshold 10
+
+micro calls each AIService method in-process on synthetic data (benchmarks/synthetic_data.py)
+and reports ops/sec, mean and p50/p95/p99 latency, and the process's peak RSS after each
+case. load starts the service under gunicorn (or the development server, --server dev)
+through benchmarks/offline_app.py, warms it up, then drives every route from --concurrency
+clients for --duration seconds (benchmarks/load_test.py). It reports per-endpoint req/s,
+latency percentiles, 503s and errors, and the server's peak RSS. --url runs the load
+against a server that is already up instead.
+
+Both suites run offline. Tips come from benchmarks/stub_llm_server.py (--llm-latency
+seconds per completion). Categorization uses a sleep-based stand-in for the zero-shot
+pipeline (AI_STUB_NLP_CALL_MS / AI_STUB_NLP_ITEM_MS); set AI_STUB_NLP=0 to use the real
+one. Savings cases use the versions served from AI_MODEL_DIR (run train_models.py train
+--promote first, and distill for the compact model). Without them, they time the
+rule-based fallback, and the results say so.
+
+--baseline (or --compare) lists every case whose throughput dropped, or whose p95 rose,
+by more than --threshold percent. The exit status is 1 if any did.
+"""
+
+import argparse
+import json
+import os
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional, Tuple
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, BENCHMARKS)
+
+from load_test import percentile, run_load, stop_server, wait_healthy  # noqa: E402
+from synthetic_data import merchant_strings, savings_profiles, synthetic_transactions  # noqa: E402
+
+# p95 changes smaller than this are noise, whatever the percentage
+MIN_P95_DELTA_MS = 0.05
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def environment() -> Dict:
+    from forecast_pool import available_cpus
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": available_cpus()
+    }
+
+
+# ---------------------------------------------------------------------------
+# Micro-benchmarks
+
+def micro_cases(service, args) -> List[Tuple[str, Callable[[int], object], Optional[int]]]:
+    """(name, fn(iteration), max iterations) for every benchmarked AIService method"""
+    profiles = savings_profiles(1000)
+    merchants = merchant_strings(2000)
+    history = synthetic_transactions(args.transactions, days=args.days)
+    statement = synthetic_transactions(args.pattern_size, days=args.days)
+    delta = synthetic_transactions(50, days=args.days, seed=12)
+
+    def fresh(items, i):
+        # Unique per iteration so every call misses the categorization cache
+        return [{"merchant": f"{m['merchant']} {i}", "description": m["description"]} for m in items]
+
+    cached = merchants[:200]
+    for item in cached:
+        service.categorize_merchant_nlp(item["merchant"], item["description"])
+
+    cases = [
+        ("predict_savings.forest", lambda i: service.predict_safe_savings(profiles[i % 1000], "forest"), None),
+        ("predict_savings.compact", lambda i: service.predict_safe_savings(profiles[i % 1000], "compact"), None),
+        ("predict_savings_batch.1000", lambda i: service.predict_safe_savings_batch(profiles, "forest"), None),
+        ("categorize.cached", lambda i: service.categorize_merchant_nlp(
+            cached[i % 200]["merchant"], cached[i % 200]["description"]), None),
+        ("categorize.miss", lambda i: service.categorize_merchant_nlp(
+            f"{merchants[i % 2000]['merchant']} {i}", merchants[i % 2000]["description"]), None),
+        ("categorize_bulk.500", lambda i: service.categorize_merchants_bulk(
+            fresh(merchants[:500], i)), None),
+        (f"forecast.simple.{args.transactions}", lambda i: service.forecast_savings_goal(
+            history, 50000, method="simple"), None),
+        (f"forecast.smoothing.{args.transactions}", lambda i: service.forecast_savings_goal(
+            history, 50000, method="exponential_smoothing"), None),
+        (f"analyze_patterns.columnar.{args.pattern_size}", lambda i: service.analyze_spending_patterns(
+            statement, engine="columnar"), None),
+        (f"analyze_patterns.pandas.{args.pattern_size}", lambda i: service.analyze_spending_patterns(
+            statement, engine="pandas"), None),
+        ("analyze_patterns.incremental.50", lambda i: service.analyze_spending_patterns_incremental(
+            "bench-user", delta), None),
+        ("generate_tips.cached", lambda i: service.generate_ai_tips(
+            "en", {"income": 25000, "savings_rate": 10}), None),
+        ("generate_tips.llm_call", lambda i: service._llm_tips(("en", None, None)), 20),
+    ]
+    if not args.skip_prophet and service.registry.get('prophet') is not None:
+        # Cold fits get a different series (and no user cache entry) every iteration
+        cold = [synthetic_transactions(args.transactions, days=args.days, seed=100 + i)
+                for i in range(args.prophet_fits + 1)]
+        cases += [
+            (f"forecast.prophet.cached.{args.transactions}", lambda i: service.forecast_savings_goal(
+                history, 50000, user_id="bench-user", method="prophet"), None),
+            (f"forecast.prophet.cold.{args.transactions}", lambda i: service.forecast_savings_goal(
+                cold[i], 50000, method="prophet"), args.prophet_fits),
+        ]
+    return cases
+
+
+def time_case(fn: Callable[[int], object], min_time: float, max_iters: Optional[int], warmup: int) -> Dict:
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    i = warmup
+    started = time.perf_counter()
+    while (time.perf_counter() - started < min_time or len(latencies) < 5) and \
+            (max_iters is None or len(latencies) < max_iters):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+        i += 1
+    total = sum(latencies)
+    return {
+        "iterations": len(latencies),
+        "ops_per_s": round(len(latencies) / total, 2),
+        "mean_ms": round(total / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_micro(args) -> Dict:
+    from stub_llm_server import serve
+    # cmdstanpy logs two lines per Prophet fit
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    serve(args.llm_port, args.llm_latency, background=True)
+    os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{args.llm_port}/v1"
+    import offline_app
+    service = offline_app.ai_service.ai_service
+
+    # Tips are served from the cache; fill it the way a starting worker does
+    service.prewarm_tips()
+    deadline = time.monotonic() + 30
+    while service.tip_cache.stats()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    served = {name: service.registry.get(name) for name in ("savings_predictor", "savings_compact")}
+    meta = {"savings_models": {name: live.get().version if live is not None and live.get() is not None else None
+                               for name, live in served.items()}}
+    if not meta["savings_models"].get("savings_predictor"):
+        print("⚠️ No savings model served from AI_MODEL_DIR: predict_savings cases time the rule-based "
+              "fallback (run train_models.py train --promote)")
+
+    results = {}
+    for name, fn, max_iters in micro_cases(service, args):
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        results[name] = time_case(fn, args.min_time, max_iters, warmup=1 if max_iters else 3)
+        if not args.json:
+            row = results[name]
+            print(f"{name:>38} {row['ops_per_s']:>10} ops/s  p50 {row['p50_ms']:>9} ms  "
+                  f"p95 {row['p95_ms']:>9} ms  p99 {row['p99_ms']:>9} ms  peak RSS {row['peak_rss_mb']} MB")
+    return {"meta": meta, "cases": results, "peak_rss_mb": peak_rss_mb()}
+
+
+# ---------------------------------------------------------------------------
+# Load generator
+
+def load_workload(args):
+    """Every route, weighted roughly like app traffic; bodies vary per request"""
+    profiles = savings_profiles(1000)
+    merchants = merchant_strings(2000)
+    history = synthetic_transactions(args.transactions, days=args.days)
+    statement = synthetic_transactions(min(args.pattern_size, 5000), days=args.days)
+    languages = ["en", "hi", "pb"]
+    counter = iter(range(10**9))
+
+    def unique_merchant(rng):
+        item = rng.choice(merchants)
+        return {"merchant": f"{item['merchant']} {next(counter)}", "description": item["description"]}
+
+    workload = [
+        ("health", 2, "GET", "/ai/health", None),
+        ("predict_savings", 4, "POST", "/ai/predict-savings", lambda rng: rng.choice(profiles)),
+        ("predict_savings_compact", 2, "POST", "/ai/predict-savings",
+         lambda rng: dict(rng.choice(profiles), model="compact")),
+        ("predict_savings_batch", 1, "POST", "/ai/predict-savings/batch",
+         lambda rng: {"users": rng.sample(profiles, 100)}),
+        ("categorize_cached", 3, "POST", "/ai/categorize-merchant",
+         lambda rng: {k: v for k, v in rng.choice(merchants[:200]).items() if k != "category"}),
+        ("categorize_miss", 1, "POST", "/ai/categorize-merchant", unique_merchant),
+        ("categorize_bulk", 1, "POST", "/ai/categorize-merchants",
+         lambda rng: {"merchants": [unique_merchant(rng) for _ in range(50)]}),
+        ("forecast_smoothing", 1, "POST", "/ai/forecast-goal",
+         {"transactions": history, "goal_amount": 50000, "method": "exponential_smoothing"}),
+        ("analyze_patterns", 1, "POST", "/ai/analyze-patterns", {"transactions": statement}),
+        ("generate_tips", 2, "POST", "/ai/generate-tips", lambda rng: {
+            "language": rng.choice(languages),
+            "user_context": {"income": rng.randint(8000, 120000), "savings_rate": rng.randint(0, 40)}}),
+    ]
+    if args.with_prophet:
+        # A small set of users, so most requests reuse a cached fit
+        workload.append(("forecast_prophet", 1, "POST", "/ai/forecast-goal", lambda rng: {
+            "transactions": history, "goal_amount": 50000, "user_id": f"load-{rng.randint(0, 19)}"}))
+    return workload
+
+
+def process_tree_peak_rss_mb(pid: int) -> Optional[Dict]:
+    """VmHWM of a process and its descendants (Linux /proc), max and sum"""
+    def children(p):
+        try:
+            with open(f"/proc/{p}/task/{p}/children") as f:
+                return [int(c) for c in f.read().split()]
+        except OSError:
+            return []
+
+    peaks, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        stack.extend(children(p))
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peaks.append(int(line.split()[1]) / 1024)
+        except OSError:
+            pass
+    if not peaks:
+        return None
+    return {"processes": len(peaks), "max_mb": round(max(peaks), 1), "sum_mb": round(sum(peaks), 1)}
+
+
+def start_offline_server(mode: str, port: int, llm_url: str) -> subprocess.Popen:
+    env = dict(os.environ, OPENAI_API_BASE=llm_url)
+    if mode == "dev":
+        env.update(AI_PORT=str(port))
+        cmd = [sys.executable, os.path.join(BENCHMARKS, "offline_app.py")]
+    else:
+        env.update(AI_BIND=f"127.0.0.1:{port}")
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "--pythonpath", BENCHMARKS,
+               "offline_app:app"]
+    return subprocess.Popen(cmd, cwd=BACKEND, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_load_suite(args) -> Dict:
+    workload = load_workload(args)
+    if args.url:
+        wait_healthy(args.url)
+        run_load(args.url, 2, 2, workload=workload)
+        return dict(run_load(args.url, args.duration, args.concurrency, workload=workload),
+                    server={"url": args.url})
+
+    llm = subprocess.Popen([sys.executable, os.path.join(BENCHMARKS, "stub_llm_server.py"),
+                            "--port", str(args.llm_port), "--latency", str(args.llm_latency)],
+                           start_new_session=True, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.port}"
+    server = start_offline_server(args.server, args.port, f"http://127.0.0.1:{args.llm_port}/v1")
+    try:
+        wait_healthy(url)
+        # Untimed pass so lazy model loads are not part of the measurement
+        run_load(url, 3, 2, workload=workload)
+        report = run_load(url, args.duration, args.concurrency, workload=workload)
+        report["server"] = {"mode": args.server, "peak_rss": process_tree_peak_rss_mb(server.pid)}
+        with urllib.request.urlopen(f"{url}/ai/health") as response:
+            report["server"]["cpu_executor"] = json.loads(response.read())["cpu_executor"]
+        return report
+    finally:
+        stop_server(server)
+        stop_server(llm)
+
+
+def print_load(report: Dict):
+    print(f"\nload: {report['total_rps']} req/s total ({report['concurrency']} clients, "
+          f"{report['duration_s']}s), server peak RSS {report['server'].get('peak_rss')}")
+    print(f"{'endpoint':>24} {'ok':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'503':>5} {'errors':>6}")
+    for name, row in report["endpoints"].items():
+        print(f"{name:>24} {row['ok']:>7} {row['rps']:>7} {str(row['p50_ms']):>8} "
+              f"{str(row['p95_ms']):>8} {str(row['p99_ms']):>8} {row['busy_503']:>5} {row['errors']:>6}")
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+
+def _rows(results: Dict):
+    """(section.case, throughput, p95_ms) for every case in a results file"""
+    for name, row in results.get("micro", {}).get("cases", {}).items():
+        yield f"micro.{name}", row["ops_per_s"], row["p95_ms"]
+    for name, row in results.get("load", {}).get("endpoints", {}).items():
+        if row["ok"]:
+            yield f"load.{name}", row["rps"], row["p95_ms"]
+
+
+def compare(current: Dict, baseline: Dict, threshold_pct: float) -> List[Dict]:
+    base = {name: (throughput, p95) for name, throughput, p95 in _rows(baseline)}
+    rows = []
+    for name, throughput, p95 in _rows(current):
+        if name not in base:
+            continue
+        base_throughput, base_p95 = base[name]
+        throughput_pct = 100 * (throughput - base_throughput) / base_throughput if base_throughput else 0.0
+        p95_pct = 100 * (p95 - base_p95) / base_p95 if base_p95 else 0.0
+        regressed = (throughput_pct < -threshold_pct or
+                     (p95_pct > threshold_pct and p95 - base_p95 > MIN_P95_DELTA_MS))
+        rows.append({"case": name, "throughput": throughput, "baseline_throughput": base_throughput,
+                     "throughput_change_pct": round(throughput_pct, 1), "p95_ms": p95,
+                     "baseline_p95_ms": base_p95, "p95_change_pct": round(p95_pct, 1),
+                     "regression": regressed})
+    return rows
+
+
+def print_comparison(rows: List[Dict], threshold_pct: float):
+    print(f"\n{'case':>46} {'throughput':>12} {'change':>8} {'p95 ms':>10} {'change':>8}")
+    for row in rows:
+        flag = "  ❌ regression" if row["regression"] else ""
+        print(f"{row['case']:>46} {row['throughput']:>12} {row['throughput_change_pct']:>+7}% "
+              f"{row['p95_ms']:>10} {row['p95_change_pct']:>+7}%{flag}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"\n{regressions} of {len(rows)} cases regressed by more than {threshold_pct:g}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", choices=["micro", "load", "all"], default="all")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--compare", nargs=2, metavar=("RESULTS", "BASELINE"),
+                        help="only compare two saved results files")
+    parser.add_argument("--threshold", type=float, default=15.0, help="regression threshold, percent")
+    parser.add_argument("--quick", action="store_true", help="short runs, for a smoke test")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    micro = parser.add_argument_group("micro")
+    micro.add_argument("--only", nargs="+", help="case name prefixes to run")
+    micro.add_argument("--min-time", type=float, default=2.0, help="seconds per case")
+    micro.add_argument("--transactions", type=int, default=2000, help="transactions per forecast history")
+    micro.add_argument("--pattern-size", type=int, default=10000, help="transactions per pattern analysis")
+    micro.add_argument("--days", type=int, default=180, help="days covered by synthetic histories")
+    micro.add_argument("--prophet-fits", type=int, default=5, help="cold Prophet fits to time")
+    micro.add_argument("--skip-prophet", action="store_true")
+    load = parser.add_argument_group("load")
+    load.add_argument("--url", help="load an already running server instead of starting one")
+    load.add_argument("--server", choices=["gunicorn", "dev"], default="gunicorn")
+    load.add_argument("--port", type=int, default=5056)
+    load.add_argument("--concurrency", type=int, default=16)
+    load.add_argument("--duration", type=float, default=20)
+    load.add_argument("--with-prophet", action="store_true", help="add Prophet goal forecasts to the load")
+    parser.add_argument("--llm-port", type=int, default=8098)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM seconds per completion")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            rows = compare(json.load(f), json.load(g), args.threshold)
+        print(json.dumps(rows, indent=2)) if args.json else print_comparison(rows, args.threshold)
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+    if args.quick:
+        args.min_time, args.duration, args.prophet_fits = 0.3, 5, 2
+        args.transactions, args.pattern_size = min(args.transactions, 500), min(args.pattern_size, 2000)
+
+    results = {"environment": environment(), "settings": {
+        k: getattr(args, k) for k in ("min_time", "transactions", "pattern_size", "days", "concurrency",
+                                      "duration", "server", "llm_latency", "quick")
+    }, "offline": {"stub_llm": True, "stub_nlp": os.getenv("AI_STUB_NLP", "1") == "1"}}
+    if args.suite in ("micro", "all"):
+        results["micro"] = run_micro(args)
+    if args.suite in ("load", "all"):
+        results["load"] = run_load_suite(args)
+        if not args.json:
+            print_load(results["load"])
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+    rows = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(results, json.load(f), args.threshold)
+        results["comparison"] = rows
+        if not args.json:
+            print_comparison(rows, args.threshold)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
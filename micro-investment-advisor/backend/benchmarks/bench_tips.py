@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tip generation: cached/coalesced/rate-limited vs one LLM call per request, offline
+
+Usage:
+    python benchmarks/bench_tips.py
+    python benchmarks/bench_tips.py --requests 5000 --concurrency 64 --llm-latency 2 --wait 3
+
+Starts benchmarks/stub_llm_server.py in-process and points the openai client at it
+(OPENAI_API_BASE), then sends bursts of /ai/generate-tips-style calls for random users.
+Reports request latency, how many requests got generated (not static) tips, and how
+many upstream LLM calls were made.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm_server import serve  # noqa: E402
+
+
+def upstream_calls(port: int) -> int:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/v1/stats") as response:
+        return json.loads(response.read())["calls"]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def burst(service, n: int, concurrency: int, seed: int):
+    rng = random.Random(seed)
+    contexts = [(rng.choice(["en", "hi", "pb"]),
+                 {"income": rng.randint(8000, 120000), "savings_rate": rng.randint(0, 40)})
+                for _ in range(n)]
+    latencies, generated = [], []
+    lock = threading.Lock()
+    cursor = iter(range(n))
+
+    def client():
+        while True:
+            with lock:
+                i = next(cursor, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            tips = service.generate_ai_tips(*contexts[i])
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                generated.append(bool(tips) and tips[0].get("source") == "OpenAI")
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "requests": n,
+        "wall_s": round(time.perf_counter() - started, 2),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "generated_pct": round(100 * sum(generated) / n, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="stub seconds per completion")
+    parser.add_argument("--rate-per-min", type=float, default=600, help="upstream token bucket rate")
+    parser.add_argument("--wait", type=float, default=0.0, help="AI_TIPS_WAIT_S for cache misses")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    serve(args.port, args.llm_latency, background=True)
+    os.environ.update(OPENAI_API_KEY="stub", OPENAI_API_BASE=f"http://127.0.0.1:{args.port}/v1",
+                      AI_TIPS_RATE_PER_MIN=str(args.rate_per_min), AI_TIPS_WAIT_S=str(args.wait))
+    import ai_service
+    service = ai_service.ai_service
+
+    results = {"llm_latency_s": args.llm_latency}
+
+    # Baseline: what every request used to cost, one LLM call each
+    key = ai_service.tip_key("en", 25000, 10)
+    started = time.perf_counter()
+    for _ in range(3):
+        service._llm_tips(key)
+    results["uncached_ms_per_request"] = round((time.perf_counter() - started) / 3 * 1000, 1)
+
+    before = upstream_calls(args.port)
+    results["cold"] = burst(service, args.requests, args.concurrency, seed=1)
+    # Let the refresh worker drain its queue, then send the same kind of traffic again
+    while service.tip_cache.stats()["pending"]:
+        time.sleep(0.1)
+    results["warm"] = burst(service, args.requests, args.concurrency, seed=2)
+    results["upstream_calls"] = upstream_calls(args.port) - before
+    results["distinct_keys"] = service.tip_cache.stats()["entries"]
+    results["tip_cache"] = service.tip_cache.stats()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"uncached: {results['uncached_ms_per_request']} ms per request (one LLM call each)")
+    for phase in ("cold", "warm"):
+        row = results[phase]
+        print(f"{phase:>8}: {row['requests']} requests in {row['wall_s']}s, p50 {row['p50_ms']} ms, "
+              f"p99 {row['p99_ms']} ms, {row['generated_pct']}% generated tips")
+    print(f"upstream LLM calls: {results['upstream_calls']} for {2 * args.requests} requests "
+          f"({results['distinct_keys']} distinct cache keys)")
+
+
+if __name__ == "__main__":
+    main()
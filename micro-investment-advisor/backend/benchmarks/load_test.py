@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Load test: requests/sec and latency per endpoint under concurrent clients
+
+Usage:
+    python benchmarks/load_test.py --url http://localhost:5000
+    python benchmarks/load_test.py --compare --duration 20 --concurrency 32
+
+--compare starts the development server (python ai_service.py with AI_DEBUG=1, as it
+used to run) and then gunicorn with gunicorn_conf.py, runs the same workload against
+each, and prints them side by side. Extra gunicorn settings come from the environment
+(AI_WORKERS, AI_THREADS, AI_CPU_WORKERS, AI_CPU_QUEUE_DEPTH).
+
+The workload mixes cheap calls (/ai/health, a cached merchant categorization) with
+CPU-heavy ones (savings prediction, goal forecast, pattern analysis), to show whether
+cheap calls stay fast while heavy ones are running.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import synthetic_transactions  # noqa: E402
+
+# (name, weight, method, path, body); body may be a function of a random.Random that
+# builds a fresh body per request
+TRANSACTIONS = synthetic_transactions(500, days=120)
+WORKLOAD = [
+    ("health", 3, "GET", "/ai/health", None),
+    ("categorize_cached", 3, "POST", "/ai/categorize-merchant",
+     {"merchant": "Swiggy", "description": "food order"}),
+    ("predict_savings", 2, "POST", "/ai/predict-savings",
+     {"income": 40000, "rent": 12000, "emi": 3000, "age": 29, "family_size": 2, "location_tier": 1}),
+    ("forecast_goal", 1, "POST", "/ai/forecast-goal",
+     {"transactions": TRANSACTIONS, "goal_amount": 50000, "method": "exponential_smoothing"}),
+    ("analyze_patterns", 1, "POST", "/ai/analyze-patterns", {"transactions": TRANSACTIONS}),
+]
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_load(url: str, duration: float, concurrency: int, seed: int = 3, workload=WORKLOAD):
+    target = urlparse(url)
+    bodies = {name: body if body is None or callable(body) else json.dumps(body).encode()
+              for name, _, _, _, body in workload}
+    choices = [entry for entry in workload for _ in range(entry[1])]
+    stats = {name: {"latencies": [], "errors": 0, "busy": 0} for name, *_ in workload}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(worker_id):
+        rng = random.Random(seed + worker_id)
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=120)
+        while time.monotonic() < deadline:
+            name, _, method, path, _ = rng.choice(choices)
+            body = bodies[name]
+            if callable(body):
+                body = json.dumps(body(rng)).encode()
+            headers = {"Content-Type": "application/json"} if body else {}
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=120)
+                status = None
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status == 200:
+                    stats[name]["latencies"].append(elapsed)
+                elif status == 503:
+                    stats[name]["busy"] += 1
+                else:
+                    stats[name]["errors"] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    report = {"duration_s": round(wall, 1), "concurrency": concurrency, "endpoints": {}}
+    total = 0
+    for name, entry in stats.items():
+        lat = entry["latencies"]
+        total += len(lat)
+        report["endpoints"][name] = {
+            "ok": len(lat),
+            "rps": round(len(lat) / wall, 1),
+            "p50_ms": round(percentile(lat, 0.5) * 1000, 1) if lat else None,
+            "p95_ms": round(percentile(lat, 0.95) * 1000, 1) if lat else None,
+            "p99_ms": round(percentile(lat, 0.99) * 1000, 1) if lat else None,
+            "busy_503": entry["busy"],
+            "errors": entry["errors"]
+        }
+    report["total_rps"] = round(total / wall, 1)
+    return report
+
+
+def wait_healthy(url: str, timeout_s: float = 120):
+    target = urlparse(url)
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=2)
+            conn.request("GET", "/ai/health")
+            if conn.getresponse().status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} did not become healthy within {timeout_s}s")
+
+
+def start_server(mode: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    if mode == "dev":
+        env.update(AI_DEBUG="1", AI_PORT=str(port))
+        cmd = [sys.executable, "ai_service.py"]
+    else:
+        env.update(AI_BIND=f"127.0.0.1:{port}")
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "ai_service:app"]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_server(process: subprocess.Popen):
+    # The dev reloader and gunicorn both run child processes; stop the whole group
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def print_report(label: str, report):
+    print(f"\n{label}: {report['total_rps']} req/s total "
+          f"({report['concurrency']} clients, {report['duration_s']}s)")
+    print(f"{'endpoint':>18} {'ok':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'503':>5} {'errors':>6}")
+    for name, row in report["endpoints"].items():
+        print(f"{name:>18} {row['ok']:>7} {row['rps']:>7} {str(row['p50_ms']):>8} "
+              f"{str(row['p95_ms']):>8} {str(row['p99_ms']):>8} {row['busy_503']:>5} {row['errors']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--compare", action="store_true", help="start and compare dev server vs gunicorn")
+    parser.add_argument("--port", type=int, default=5055, help="port for servers started by --compare")
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if not args.compare:
+        report = run_load(args.url, args.duration, args.concurrency)
+        print(json.dumps(report, indent=2)) if args.json else print_report(args.url, report)
+        return
+
+    url = f"http://127.0.0.1:{args.port}"
+    reports = {}
+    for mode in ("dev", "gunicorn"):
+        process = start_server(mode, args.port)
+        try:
+            wait_healthy(url)
+            # One untimed pass so lazy model loads are not part of the measurement
+            run_load(url, 2, 2)
+            reports[mode] = run_load(url, args.duration, args.concurrency)
+        finally:
+            stop_server(process)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    print_report("dev server (python ai_service.py, debug)", reports["dev"])
+    print_report("gunicorn (gunicorn_conf.py)", reports["gunicorn"])
+    speedup = reports["gunicorn"]["total_rps"] / max(reports["dev"]["total_rps"], 0.1)
+    print(f"\nthroughput: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
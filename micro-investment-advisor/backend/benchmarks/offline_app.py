@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+The AI service with local stand-ins for its network and NLP dependencies
+
+Usage:
+    python benchmarks/stub_llm_server.py --port 8099 --latency 1.0 &
+    OPENAI_API_BASE=http://127.0.0.1:8099/v1 \
+        gunicorn -c gunicorn_conf.py --pythonpath benchmarks offline_app:app
+    python benchmarks/offline_app.py        # development server, same stand-ins
+
+The openai client is pointed at OPENAI_API_BASE (benchmarks/stub_llm_server.py) with a
+placeholder key. The zero-shot pipeline is replaced by the sleep-based stand-in from
+bench_categorize_batching (AI_STUB_NLP_CALL_MS per call + AI_STUB_NLP_ITEM_MS per item),
+unless AI_STUB_NLP=0 and transformers is installed. Everything else is the real service.
+"""
+
+import os
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Read by the openai client and ai_service at import time
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("OPENAI_API_BASE", "http://127.0.0.1:8099/v1")
+# The stub costs nothing per call, so the upstream rate limit only slows cache fills
+os.environ.setdefault("AI_TIPS_RATE_PER_MIN", "6000")
+os.environ.setdefault("AI_TIPS_BURST", "50")
+
+import ai_service  # noqa: E402
+from bench_categorize_batching import stub_pipeline  # noqa: E402
+
+app = ai_service.app
+
+
+def install_stubs(service):
+    """Swap the zero-shot pipeline for the stand-in (unless AI_STUB_NLP=0)"""
+    if os.getenv("AI_STUB_NLP", "1") != "1":
+        return
+    per_call_ms = float(os.getenv("AI_STUB_NLP_CALL_MS", "8"))
+    per_item_ms = float(os.getenv("AI_STUB_NLP_ITEM_MS", "1.5"))
+    service.registry.register('category_pipeline', lambda: stub_pipeline(per_call_ms, per_item_ms))
+
+
+install_stubs(ai_service.ai_service)
+
+if __name__ == '__main__':
+    port = int(os.getenv("AI_PORT", "5000"))
+    print(f"🧪 Offline AI service (LLM at {os.environ['OPENAI_API_BASE']}) on http://localhost:{port}")
+    ai_service.ai_service.prewarm_tips()
+    app.run(host='0.0.0.0', port=port, threaded=True)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compact savings model vs the forest it was distilled from: parity and single-row latency
+
+Usage:
+    python benchmarks/parity_compact.py
+    python benchmarks/parity_compact.py --rows 50000 --data holdout.csv --json
+
+Loads the CURRENT savings_compact version and its teacher savings_predictor version from
+the model store (--model-dir, default AI_MODEL_DIR), predicts a held-out set with both and
+compares the rounded ₹10-₹50 amounts the service returns. Exits 1 if fewer than
+COMPACT_MIN_WITHIN_1 of rows are within ±1 rupee. Held-out rows are synthetic with a seed
+the distillation does not use, unless --data is given.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_store import DEFAULT_MODEL_DIR, ModelStore  # noqa: E402
+from train_models import (COMPACT_MIN_WITHIN_1, COMPACT_MODEL, SAVINGS_MODEL,  # noqa: E402
+                          compact_parity, synthetic_savings_data)
+
+
+def single_row_us(predict, X: np.ndarray) -> float:
+    started = time.perf_counter()
+    for row in X:
+        predict(row)
+    return round((time.perf_counter() - started) / len(X) * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--data", nargs="+", help="CSV/Parquet held-out rows")
+    parser.add_argument("--seed", type=int, default=99)
+    parser.add_argument("--model-dir", default=os.getenv("AI_MODEL_DIR", DEFAULT_MODEL_DIR))
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    store = ModelStore(args.model_dir)
+    compact = store.load_forest(COMPACT_MODEL)
+    teacher = store.load_forest(SAVINGS_MODEL, compact.manifest["teacher_version"])
+    if args.data:
+        from training_pipeline import load_training_data
+        X, _, _ = load_training_data(args.data, max_rows=args.rows, seed=args.seed)
+    else:
+        X, _ = synthetic_savings_data(args.rows, seed=args.seed)
+
+    results = {"compact_version": compact.version, "teacher_version": teacher.version,
+               "compact_nodes": compact.manifest["n_nodes"], "teacher_nodes": teacher.manifest["n_nodes"],
+               "parity": compact_parity(teacher, compact, X),
+               "min_within_1": COMPACT_MIN_WITHIN_1}
+    sample = X[:500]
+    results["single_row_us"] = {"forest": single_row_us(lambda row: teacher.predict(row[None]), sample),
+                                "compact": single_row_us(compact.predict_one, sample)}
+    passed = results["parity"]["within_1"] >= COMPACT_MIN_WITHIN_1
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        parity = results["parity"]
+        print(f"compact {compact.version} ({results['compact_nodes']} nodes) vs "
+              f"forest {teacher.version} ({results['teacher_nodes']} nodes), {parity['rows']} rows")
+        print(f"rounded amounts: {parity['exact']:.1%} exact, {parity['within_1']:.1%} within ±1 "
+              f"(need {COMPACT_MIN_WITHIN_1:.0%}), max diff {parity['max_abs_diff']:.0f}")
+        print(f"single row: forest {results['single_row_us']['forest']} us, "
+              f"compact {results['single_row_us']['compact']} us")
+        print("PASS" if passed else "FAIL")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+NLP inference backends: accuracy parity, latency and memory on labeled merchant strings
+
+Usage:
+    python nlp_backends.py export facebook/bart-large-mnli       # once, for the onnx backend
+    python benchmarks/parity_nlp.py
+    python benchmarks/parity_nlp.py --model valhalla/distilbart-mnli-12-1 --samples 200 --offline
+    python benchmarks/parity_nlp.py --task sentiment-analysis --model cardiffnlp/twitter-roberta-base-sentiment-latest
+
+Each backend (pytorch, torch_int8, onnx) is loaded in a fresh process, which reports its
+load time, RSS growth and per-item latency at batch 1 and --batch. Then it classifies the
+same statement-style merchant strings (benchmarks/synthetic_data.py), whose expected
+category is known. The report covers accuracy against those labels, agreement of the top
+label with pytorch, and the mean absolute difference of the top score. Exits 1 if a
+backend agrees with pytorch on fewer than --min-agreement of the samples.
+
+--offline sets HF_HUB_OFFLINE/TRANSFORMERS_OFFLINE, so weights must already be in the
+local Hugging Face cache (or --model is a local path). A small MNLI model such as
+valhalla/distilbart-mnli-12-1 stands in for bart-large-mnli when a quick check is enough.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nlp_backends import BACKENDS, DEFAULT_ONNX_DIR  # noqa: E402
+from synthetic_data import merchant_strings  # noqa: E402
+
+# Same labels as the service's zero-shot call (ai_service.MERCHANT_CATEGORIES)
+CATEGORIES = ["Essential", "Discretionary", "Debt", "Income"]
+
+# Sentiment has no labeled sample here; backends are only compared with each other
+SENTIMENT_TEXTS = [
+    "I finally saved enough for my daughter's school fees",
+    "The EMI bounced again and the bank charged a penalty",
+    "Paid the electricity bill on time this month",
+    "Lost money in an online scam, feeling terrible",
+    "Salary credited, planning to start a small SIP",
+    "Groceries are getting more expensive every week",
+]
+
+
+def sample_texts(task: str, n: int, seed: int):
+    """(texts, expected labels or None)"""
+    if task == "zero-shot-classification":
+        items = merchant_strings(n, seed=seed)
+        return [f"{item['merchant']} {item['description']}".strip() for item in items], \
+               [item["category"] for item in items]
+    texts = (SENTIMENT_TEXTS * (n // len(SENTIMENT_TEXTS) + 1))[:n]
+    return texts, None
+
+
+def classify(pipe, task: str, texts, batch_size: int):
+    """[(top label, top score)] for each text"""
+    if task == "zero-shot-classification":
+        out = pipe(texts, CATEGORIES, batch_size=batch_size)
+        out = [out] if isinstance(out, dict) else out
+        return [(r["labels"][0], float(r["scores"][0])) for r in out]
+    out = pipe(texts, batch_size=batch_size)
+    return [(r["label"], float(r["score"])) for r in out]
+
+
+def child(args):
+    """Runs in a fresh process: one backend, prints its measurements as JSON"""
+    from model_registry import current_rss_bytes
+    from nlp_backends import load_pipeline
+
+    texts, _ = sample_texts(args.task, args.samples, args.seed)
+    baseline = current_rss_bytes() or 0
+    started = time.perf_counter()
+    pipe = load_pipeline(args.task, args.model, args.child, args.threads, args.onnx_dir)
+    load_seconds = time.perf_counter() - started
+    loaded_rss = current_rss_bytes() or 0
+
+    classify(pipe, args.task, texts[:2], 2)  # warm-up: lazy allocations, kernel selection
+    single = texts[:min(len(texts), args.single_items)]
+    started = time.perf_counter()
+    for text in single:
+        classify(pipe, args.task, [text], 1)
+    single_ms = (time.perf_counter() - started) / len(single) * 1000
+
+    started = time.perf_counter()
+    predictions = classify(pipe, args.task, texts, args.batch)
+    batch_ms = (time.perf_counter() - started) / len(texts) * 1000
+
+    print(json.dumps({
+        "requested": args.child,
+        "backend": pipe.inference_backend,
+        "load_seconds": round(load_seconds, 2),
+        "model_rss_mb": round((loaded_rss - baseline) / 2**20, 1),
+        "peak_rss_mb": round((max(loaded_rss, current_rss_bytes() or 0) - baseline) / 2**20, 1),
+        "ms_per_item_batch_1": round(single_ms, 2),
+        f"ms_per_item_batch_{args.batch}": round(batch_ms, 2),
+        "predictions": predictions
+    }))
+
+
+def compare(results, expected):
+    """Add accuracy and agreement with the pytorch reference to each backend's row"""
+    predictions = {name: row.pop("predictions") for name, row in results.items()}
+    reference = predictions.get("pytorch")
+    for name, row in results.items():
+        ours = predictions[name]
+        if expected is not None:
+            row["accuracy"] = round(sum(p[0] == e for p, e in zip(ours, expected)) / len(expected), 4)
+        if reference is not None and name != "pytorch":
+            row["agreement_with_pytorch"] = round(
+                sum(p[0] == r[0] for p, r in zip(ours, reference)) / len(reference), 4)
+            row["mean_abs_score_diff"] = round(
+                sum(abs(p[1] - r[1]) for p, r in zip(ours, reference)) / len(reference), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--task", default="zero-shot-classification",
+                        choices=["zero-shot-classification", "sentiment-analysis"])
+    parser.add_argument("--model", default=os.getenv("AI_CATEGORY_MODEL", "facebook/bart-large-mnli"))
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--samples", type=int, default=300)
+    parser.add_argument("--single-items", type=int, default=50, help="items timed one at a time")
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=int(os.getenv("AI_NLP_THREADS", "0")),
+                        help="intra-op threads (0 = one per core)")
+    parser.add_argument("--onnx-dir", default=os.getenv("AI_ONNX_DIR", DEFAULT_ONNX_DIR))
+    parser.add_argument("--seed", type=int, default=21)
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    parser.add_argument("--offline", action="store_true", help="use only locally cached weights")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    env = dict(os.environ)
+    if args.offline:
+        env.update(HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+    # pytorch first: it is the reference the others are compared with
+    backends = sorted(set(args.backends) | {"pytorch"}, key=BACKENDS.index)
+    passthrough = ["--task", args.task, "--model", args.model, "--samples", str(args.samples),
+                   "--single-items", str(args.single_items), "--batch", str(args.batch),
+                   "--threads", str(args.threads), "--onnx-dir", args.onnx_dir, "--seed", str(args.seed)]
+    results = {}
+    for backend in backends:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", backend, *passthrough],
+                             cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            sys.exit(f"❌ {backend} failed:\n{out.stderr[-2000:]}")
+        results[backend] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    _, expected = sample_texts(args.task, args.samples, args.seed)
+    compare(results, expected)
+    failed = [name for name, row in results.items()
+              if row["backend"] != row["requested"] or row.get("agreement_with_pytorch", 1.0) < args.min_agreement]
+
+    if args.json:
+        print(json.dumps({"model": args.model, "task": args.task, "samples": args.samples,
+                          "threads": args.threads, "backends": results, "failed": failed}, indent=2))
+    else:
+        print(f"{args.model} ({args.task}), {args.samples} samples, threads={args.threads or 'default'}")
+        print(f"{'backend':>11} {'runs on':>11} {'load s':>7} {'RSS MB':>7} {'ms/item b1':>11} "
+              f"{'ms/item b' + str(args.batch):>12} {'accuracy':>9} {'agree':>7} {'score diff':>11}")
+        for name, row in results.items():
+            print(f"{name:>11} {row['backend']:>11} {row['load_seconds']:>7} {row['model_rss_mb']:>7} "
+                  f"{row['ms_per_item_batch_1']:>11} {row[f'ms_per_item_batch_{args.batch}']:>12} "
+                  f"{str(row.get('accuracy', '-')):>9} {str(row.get('agreement_with_pytorch', '-')):>7} "
+                  f"{str(row.get('mean_abs_score_diff', '-')):>11}")
+        for name in failed:
+            row = results[name]
+            reason = (f"fell back to {row['backend']}" if row["backend"] != row["requested"]
+                      else f"agreement below {args.min_agreement:.0%}")
+            print(f"{name}: {reason}")
+        print("FAIL" if failed else "PASS")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
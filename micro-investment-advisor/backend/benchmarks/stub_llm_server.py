@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Stub OpenAI-compatible LLM server for offline testing of tip generation
+
+Usage:
+    python benchmarks/stub_llm_server.py --port 8099 --latency 2.0
+    OPENAI_API_KEY=stub OPENAI_API_BASE=http://127.0.0.1:8099/v1 python ai_service.py
+
+Answers POST /v1/chat/completions with five tips as a JSON array, after --latency
+seconds. GET /stats returns the number of completions served.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    calls = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._reply(200, {"calls": StubLLMHandler.calls})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._reply(404, {"error": "not found"})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        with StubLLMHandler.lock:
+            StubLLMHandler.calls += 1
+            call = StubLLMHandler.calls
+        time.sleep(StubLLMHandler.latency)
+        tips = [{"title": f"Stub tip {i + 1}", "content": f"Call {call}: {prompt[:80]}"} for i in range(5)]
+        self._reply(200, {
+            "id": f"chatcmpl-stub-{call}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": json.dumps(tips)}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+
+def serve(port: int = 8099, latency: float = 1.0, background: bool = False) -> ThreadingHTTPServer:
+    """Start the stub; with background=True it runs in a daemon thread and is returned"""
+    StubLLMHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubLLMHandler)
+    if background:
+        threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per completion")
+    args = parser.parse_args()
+    print(f"Stub LLM on http://127.0.0.1:{args.port}/v1 ({args.latency}s per completion)")
+    serve(args.port, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Synthetic benchmark data: user profiles, Indian merchant strings, transaction histories
+
+Usage:
+    python benchmarks/synthetic_data.py transactions --n 100000 --days 365 --out tx.ndjson
+    python benchmarks/synthetic_data.py merchants --n 1000 --out merchants.json
+    python benchmarks/synthetic_data.py profiles --n 1000
+
+Profiles use the savings model's training distributions (train_models.synthetic_savings_data).
+Transactions follow server.js generateFakeTransactions: its category weights, amount
+ranges and merchants. Merchant strings look like bank-statement narrations (UPI, POS,
+NEFT/IMPS, ECS), with the noise a keyword or zero-shot categorizer has to cope with.
+Everything is seeded and reproducible.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# server.js: categories (with repeats as weights), amount ranges and merchants
+CATEGORIES = ["Essential"] * 5 + ["Discretionary"] * 3 + ["Debt"] * 2 + ["Income"]
+AMOUNT_RANGES = {"Essential": (50, 1050), "Discretionary": (100, 2100),
+                 "Debt": (500, 5500), "Income": (15000, 35000)}
+MERCHANTS = {
+    "Essential": ["Big Bazaar", "Punjab Kirana Store", "Mother Dairy", "Reliance Fresh",
+                  "Paytm Recharge", "Bharat Gas", "State Bus Depot", "DMart", "Apollo Pharmacy",
+                  "BSES Electricity Bill", "Indian Oil Petrol Pump", "Jio Recharge", "Airtel Recharge"],
+    "Discretionary": ["Swiggy", "Zomato", "BookMyShow", "Myntra", "Amazon", "Flipkart",
+                      "PVR Cinemas", "Ola Cabs", "Uber India", "Nykaa"],
+    "Debt": ["LIC Premium", "HDFC Bank EMI", "Credit Card Payment", "Bajaj Finserv EMI"],
+    "Income": ["Salary Credit", "Freelance Payment"],
+}
+
+CITIES = ["MUMBAI", "DELHI", "BANGALORE", "PUNE", "CHENNAI", "HYDERABAD", "KOLKATA",
+          "LUDHIANA", "JAIPUR", "LUCKNOW", "INDORE", "PATNA"]
+BANKS = ["HDFC", "ICIC", "SBIN", "UTIB", "KKBK", "PUNB", "BARB"]
+UPI_HANDLES = ["okaxis", "okhdfcbank", "oksbi", "ybl", "paytm", "ibl", "upi"]
+
+
+def _narration(rng: random.Random, merchant: str, category: str) -> str:
+    """A merchant name as it shows up on a statement line"""
+    slug = merchant.upper()
+    style = rng.random()
+    if style < 0.3:
+        return merchant
+    if category == "Income":
+        return f"NEFT-{rng.choice(BANKS)}0{rng.randint(100000, 999999)}-{slug}"
+    if style < 0.6:
+        handle = merchant.lower().replace(" ", "")[:12]
+        return f"UPI/{rng.randint(10**11, 10**12 - 1)}/{slug}/{handle}@{rng.choice(UPI_HANDLES)}"
+    if style < 0.75 and category in ("Essential", "Discretionary"):
+        return f"POS {rng.randint(4000, 4999)}XXXXXX{rng.randint(1000, 9999)} {slug} {rng.choice(CITIES)}"
+    if category == "Debt":
+        return f"ECS/{slug}/{rng.randint(10**7, 10**8 - 1)}"
+    return f"IMPS/P2M/{rng.randint(10**11, 10**12 - 1)}/{slug} {rng.choice(CITIES)}"
+
+
+def savings_profiles(n: int, seed: int = 42) -> List[Dict]:
+    """/ai/predict-savings bodies drawn from the savings model's training distribution"""
+    from train_models import FEATURE_NAMES, synthetic_savings_data
+    X, _ = synthetic_savings_data(n, seed)
+    return [{name: (round(float(v), 2) if name in ("income", "rent", "emi") else int(v))
+             for name, v in zip(FEATURE_NAMES, row)} for row in X]
+
+
+def merchant_strings(n: int, seed: int = 7) -> List[Dict]:
+    """/ai/categorize-merchant bodies: {"merchant", "description", "category"} (expected label)"""
+    rng = random.Random(seed)
+    items = []
+    for _ in range(n):
+        category = rng.choice(CATEGORIES)
+        merchant = rng.choice(MERCHANTS[category])
+        items.append({
+            "merchant": _narration(rng, merchant, category),
+            "description": rng.choice(["", "", "payment", "order", "bill payment", "monthly"]),
+            "category": category
+        })
+    return items
+
+
+def synthetic_transactions(n: int, days: int = 365, seed: int = 11, merchants: bool = False):
+    """Transactions shaped like server.js generateFakeTransactions
+
+    merchants=True adds a statement-style "merchant" to each, from a separate random
+    stream so dates, amounts and categories are the same either way.
+    """
+    rng = random.Random(seed)
+    merchant_rng = random.Random(seed + 1)
+    start = 1704067200  # 2024-01-01T00:00:00Z
+    transactions = []
+    for _ in range(n):
+        category = rng.choice(CATEGORIES)
+        low, high = AMOUNT_RANGES[category]
+        amount = rng.randint(low, high)
+        ts = start + rng.randint(0, days * 86400 - 1)
+        transaction = {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(ts)),
+            "amount": amount if category == "Income" else -amount,
+            "category": category
+        }
+        if merchants:
+            merchant = merchant_rng.choice(MERCHANTS[category])
+            transaction["merchant"] = _narration(merchant_rng, merchant, category)
+        transactions.append(transaction)
+    return transactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=["transactions", "merchants", "profiles"])
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365, help="history length for transactions")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--out", help="file to write (.ndjson: one record per line); default stdout")
+    args = parser.parse_args()
+
+    seed = {} if args.seed is None else {"seed": args.seed}
+    if args.kind == "transactions":
+        records = synthetic_transactions(args.n, args.days, merchants=True, **seed)
+    elif args.kind == "merchants":
+        records = merchant_strings(args.n, **seed)
+    else:
+        records = savings_profiles(args.n, **seed)
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        if args.out and args.out.endswith((".ndjson", ".jsonl")):
+            for record in records:
+                out.write(json.dumps(record) + "\n")
+        else:
+            json.dump(records, out, indent=None if args.out else 2)
+            out.write("\n")
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Bounded executor for CPU-heavy request handling
+Caps how many heavy requests run and wait at once per worker process, so request threads
+stay free for health checks and cached lookups and overload is rejected instead of queued
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorBusy(Exception):
+    """Raised when every slot (running plus queued) is taken"""
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor with at most max_workers running and max_queue waiting calls"""
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 16, name: str = "cpu-bound"):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.name = name
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive fork; pre-forked workers build their own pool
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=self.name)
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn in the pool and wait for its result; ExecutorBusy if no slot is free"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorBusy(f"{self.name}: {self.max_workers} running, {self.max_queue} queued")
+        with self._lock:
+            self._in_use += 1
+        try:
+            return self._get_executor().submit(fn, *args, **kwargs).result()
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_use": self._in_use,
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,784 @@
+#!/usr/bin/env python3
+"""
+Cohort analytics over a columnar transaction store
+
+Transactions are appended to Parquet files partitioned by month and cohort (location tier,
+family size band and income band):
+
+    <root>/month=2024-05/cohort=t2_f3-4_i25000/part-<flush ns>-<pid>-<n>.parquet
+
+A refresh folds only the files it has not seen yet into per-user monthly totals, then
+recomputes percentile tables for the cohorts those files touched. Comparing a user with
+their cohort is a binary search in a 101-point table, independent of how many rows are
+stored. Every process folds the same files, so gunicorn workers converge on the same
+tables without sharing memory. Each row carries a transaction id (see TransactionIds);
+a transaction written more than once, by several processes or re-sent uploads, is folded
+once.
+
+Usage:
+    python cohort_store.py ingest --root cohort_store statement.ndjson --user-id u1 \
+        --location-tier 2 --family-size 4 --income 30000
+    python cohort_store.py refresh --root cohort_store
+    python cohort_store.py compact --root cohort_store
+    python cohort_store.py stats --root cohort_store
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from columnar_patterns import MONTH_TOTALS, NS_PER_DAY, PatternAccumulator, TransactionColumns, month_index
+from profile_buckets import INCOME_BUCKETS, bucket
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# (smallest family size, label) per family-size band
+FAMILY_BANDS = [(1, "1"), (2, "2"), (3, "3-4"), (5, "5+")]
+
+# Table used when a user's own cohort has too few users
+ALL_USERS = "all"
+
+METRICS = ("monthly_spend", "weekend_share", "essential_share", "discretionary_share",
+           "avg_transaction_size")
+
+PERCENTILES = np.linspace(0.0, 100.0, 101)
+
+# Per-user monthly sums kept by the rollup, the same as a pattern accumulator's month totals
+ROLLUP_SUMS = list(MONTH_TOTALS)
+
+PART_COLUMNS = ["user_id", "ts", "utc_ts", "amount", "category", "txn_id"]
+
+# Part files are read and folded together until a batch holds this many rows
+FOLD_BATCH_ROWS = 2_000_000
+
+MANIFEST_FILE = "_manifest.json"
+
+# Snapshot files replaced by a newer one are deleted after this long, so a process that
+# read an older manifest can still open the files it names
+SNAPSHOT_GRACE_S = 600
+
+
+def cohort_id(profile: Dict) -> str:
+    """Cohort of a user profile, e.g. t2_f3-4_i25000 (tier, family band, income band)"""
+    tier = min(3, max(1, _number(profile.get('location_tier'), 2, int)))
+    family = max(1, _number(profile.get('family_size'), 3, int))
+    family_band = [label for lower, label in FAMILY_BANDS if family >= lower][-1]
+    income = _number(profile.get('income'), 25000, float)
+    income_band = bucket(income, INCOME_BUCKETS)
+    return f"t{tier}_f{family_band}_i{income_band}"
+
+
+def _number(value, default, kind):
+    try:
+        return kind(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def month_label(index: int) -> str:
+    return f"{1970 + index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def parse_month_label(label: str) -> int:
+    year, month = label.split("-")
+    return (int(year) - 1970) * 12 + int(month) - 1
+
+
+def metric_values(sums: Dict, active_months):
+    """Cohort metrics from window sums (ROLLUP_SUMS) and the months with transactions
+
+    Works on scalars for one user and on arrays for a whole cohort.
+    """
+    spend = sums["spend"]
+    return {
+        "monthly_spend": spend / active_months,
+        "weekend_share": sums["weekend_spend"] / spend,
+        "essential_share": sums["essential_spend"] / spend,
+        "discretionary_share": sums["discretionary_spend"] / spend,
+        "avg_transaction_size": spend / np.maximum(sums["expense_count"], 1)
+    }
+
+
+def user_metrics(accumulator: PatternAccumulator, window: Tuple[int, int]) -> Optional[Dict[str, float]]:
+    """A user's cohort metrics over the window's months (None without expenses in it)
+
+    Computed like the cohort tables: sums over the window divided by the months in which
+    the user has transactions.
+    """
+    months = [totals for month, totals in accumulator.month_totals.items() if window[0] <= month <= window[1]]
+    if not months:
+        return None
+    sums = dict(zip(ROLLUP_SUMS, np.sum(months, axis=0)))
+    if sums["spend"] <= 0:
+        return None
+    return {metric: float(value) for metric, value in metric_values(sums, len(months)).items()}
+
+
+def _contains(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Which ids occur in a sorted id array"""
+    if not len(sorted_ids):
+        return np.zeros(len(ids), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return sorted_ids[pos] == ids
+
+
+def _hash_rows(*columns: np.ndarray) -> np.ndarray:
+    """Row-wise uint64 hash of equal-length numeric columns"""
+    hashed = pd.util.hash_array(columns[0])
+    for column in columns[1:]:
+        hashed = pd.util.hash_array(hashed * np.uint64(0x9E3779B97F4A7C15) ^ pd.util.hash_array(column))
+    return hashed
+
+
+class TransactionIds:
+    """Ids for the transactions of one upload
+
+    An id hashes the user, UTC time, amount and category together with the number of
+    identical transactions earlier in the same upload. Re-sending a statement, or one
+    that overlaps an earlier upload, yields the same ids for the same transactions, while
+    genuine repeats (two equal purchases on a date-only day) stay distinct, and older
+    transactions sent later (backfills) get ids of their own.
+    """
+
+    def __init__(self, user_id: str):
+        self.user = pd.util.hash_array(np.array([user_id], dtype=object))[0]
+        self._seen = np.empty(0, dtype=np.uint64)  # sorted content hashes of the upload so far
+        self._counts = np.empty(0, dtype=np.int64)
+
+    def __call__(self, cols: TransactionColumns) -> np.ndarray:
+        n = len(cols)
+        labels = pd.util.hash_array(np.array(list(cols.categories) + [None], dtype=object))
+        content = _hash_rows(cols.utc_ns, cols.amount, labels[cols.category_code])
+
+        # Occurrence of each row's content: its rank among equal rows of this chunk (in
+        # upload order) plus how many earlier chunks had
+        order = np.argsort(content, kind="stable")
+        ordered = content[order]
+        starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+        counts = np.diff(np.r_[starts, n])
+        uniques = ordered[starts]
+        pos = np.searchsorted(self._seen, uniques)
+        found = _contains(self._seen, uniques)
+        earlier = np.zeros(len(uniques), dtype=np.int64)
+        earlier[found] = self._counts[pos[found]]
+        occurrence = np.empty(n, dtype=np.int64)
+        occurrence[order] = np.arange(n) - np.repeat(starts, counts) + np.repeat(earlier, counts)
+
+        self._counts[pos[found]] += counts[found]
+        self._seen = np.insert(self._seen, pos[~found], uniques[~found])
+        self._counts = np.insert(self._counts, pos[~found], counts[~found])
+        return _hash_rows(content, occurrence, np.full(n, self.user))
+
+
+class CohortTable:
+    """Percentile grid of each metric over one cohort's users"""
+
+    __slots__ = ("users", "quantiles")
+
+    def __init__(self, users: int, quantiles: Dict[str, np.ndarray]):
+        self.users = users
+        self.quantiles = quantiles
+
+    @classmethod
+    def from_values(cls, values: Dict[str, np.ndarray]) -> "CohortTable":
+        users = len(next(iter(values.values())))
+        return cls(users, {metric: np.percentile(v, PERCENTILES) for metric, v in values.items()})
+
+    def percentile(self, metric: str, value: float) -> float:
+        """Share of the cohort (0-100) below value, interpolated between grid points"""
+        grid = self.quantiles[metric]
+        left = int(np.searchsorted(grid, value, side='left'))
+        right = int(np.searchsorted(grid, value, side='right'))
+        if left == right:
+            return float(np.interp(value, grid, PERCENTILES))
+        # value equals a run of grid points (e.g. many users with no weekend spend)
+        return float(PERCENTILES[left] + PERCENTILES[right - 1]) / 2
+
+    def median(self, metric: str) -> float:
+        return float(self.quantiles[metric][50])
+
+
+class CohortStore:
+    """Parquet transaction store with incrementally refreshed cohort percentiles
+
+    ingest() buffers rows in memory and writes them out every flush_rows rows (or on
+    refresh). Rows whose transaction id this process has already recorded are skipped, so
+    re-sending a whole statement adds nothing twice. Folding checks the ids again, which
+    drops rows that another process ingested as well.
+    """
+
+    def __init__(self, root: str, window_months: int = 6, min_users: int = 20,
+                 flush_rows: int = 250_000, flush_s: float = 60.0, refresh_s: float = 300.0):
+        import pyarrow  # noqa: F401  (fail when the store is created, not at the first flush)
+
+        self.root = root
+        self.window_months = window_months
+        self.min_users = min_users
+        self.flush_rows = flush_rows
+        self.flush_s = flush_s
+        self.refresh_s = refresh_s
+        os.makedirs(root, exist_ok=True)
+
+        # Write buffer and ingest watermarks
+        self._lock = threading.Lock()
+        self._pending: List[Dict] = []
+        self._pending_rows = 0
+        self._pending_since: Optional[float] = None
+        self._unfolded_ids: Dict[str, List[np.ndarray]] = {}  # ingested since the last refresh
+        self._flushes = 0
+
+        # Folded state, owned by refresh(); _tables and the id arrays are replaced as a whole
+        self._refresh_lock = threading.Lock()
+        self._parts = set()
+        self._rollup: Dict[int, pd.DataFrame] = {}  # month -> ROLLUP_SUMS per user_id
+        self._ids: Dict[int, np.ndarray] = {}  # month -> sorted ids of the folded transactions
+        self._watermarks: Dict[str, int] = {}  # newest folded transaction per user
+        self._user_cohort: Dict[str, str] = {}
+        self._tables: Dict[str, CohortTable] = {}
+        self._window: Optional[Tuple[int, int]] = None
+        self._refreshed: Optional[float] = None
+
+        self.ingested_rows = 0
+        self.rows_folded = 0
+        self.duplicate_rows = 0
+        self.last_refresh_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._load_snapshot()
+
+    def ingest(self, user_id: str, profile: Dict, chunks: Iterable[TransactionColumns]) -> int:
+        """Buffer a user's transactions; returns how many were new"""
+        cohort = cohort_id(profile)
+        transaction_ids = TransactionIds(user_id)
+        applied = 0
+        for cols in chunks:
+            if not len(cols):
+                continue
+            txn_ids = transaction_ids(cols)
+            new = ~self._known(user_id, txn_ids, month_index(cols.local_ns))
+            cols, txn_ids = cols.select(new), txn_ids[new]
+            if not len(cols):
+                continue
+            labels = np.array(list(cols.categories) + [None], dtype=object)
+            rows = {
+                "user_id": user_id,
+                "cohort": cohort,
+                "local_ns": cols.local_ns,
+                "utc_ns": cols.utc_ns,
+                "amount": cols.amount,
+                "category": labels[cols.category_code],  # code -1 (missing) picks None
+                "txn_id": txn_ids,
+            }
+            with self._lock:
+                self._pending.append(rows)
+                self._unfolded_ids.setdefault(user_id, []).append(txn_ids)
+                self._pending_rows += len(cols)
+                if self._pending_since is None:
+                    self._pending_since = time.monotonic()
+                self.ingested_rows += len(cols)
+                full = self._pending_rows >= self.flush_rows
+            applied += len(cols)
+            if full:
+                self.flush()  # keeps a long upload from buffering everything
+        return applied
+
+    def _known(self, user_id: str, txn_ids: np.ndarray, months: np.ndarray) -> np.ndarray:
+        """Rows already folded, or ingested by this process since the last refresh"""
+        known = np.zeros(len(txn_ids), dtype=bool)
+        for month in np.unique(months).tolist():
+            folded = self._ids.get(month)
+            if folded is not None:
+                rows = months == month
+                known[rows] = _contains(folded, txn_ids[rows])
+        with self._lock:
+            unfolded = list(self._unfolded_ids.get(user_id, ()))
+        if unfolded:
+            known |= np.isin(txn_ids, np.concatenate(unfolded))
+        return known
+
+    def flush(self) -> int:
+        """Write buffered rows, one file per (month, cohort); returns rows written"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._pending_rows = 0
+            self._pending_since = None
+            self._flushes += 1
+            flush_name = f"part-{time.time_ns()}-{os.getpid()}-{self._flushes}"
+        if not pending:
+            return 0
+
+        sizes = [len(rows["amount"]) for rows in pending]
+        users = np.repeat(np.array([rows["user_id"] for rows in pending], dtype=object), sizes)
+        cohorts = np.repeat(np.array([rows["cohort"] for rows in pending], dtype=object), sizes)
+        local_ns = np.concatenate([rows["local_ns"] for rows in pending])
+        utc_ns = np.concatenate([rows["utc_ns"] for rows in pending])
+        amount = np.concatenate([rows["amount"] for rows in pending])
+        category = np.concatenate([rows["category"] for rows in pending])
+        txn_ids = np.concatenate([rows["txn_id"] for rows in pending])
+
+        try:
+            self._write_parts(flush_name, users, cohorts, local_ns, utc_ns, amount, category, txn_ids)
+        except Exception:
+            # Requeued; rows of files written before the failure are dropped again when folded
+            with self._lock:
+                self._pending[:0] = pending
+                self._pending_rows += len(amount)
+                if self._pending_since is None:
+                    self._pending_since = time.monotonic()
+            raise
+        return len(amount)
+
+    def _write_parts(self, flush_name: str, users: np.ndarray, cohorts: np.ndarray, local_ns: np.ndarray,
+                     utc_ns: np.ndarray, amount: np.ndarray, category: np.ndarray, txn_ids: np.ndarray):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        months = month_index(local_ns)
+        groups = pd.DataFrame({"month": months, "cohort": cohorts}).groupby(["month", "cohort"]).indices
+        for (month, cohort), idx in groups.items():
+            # Sorted by user so row-group statistics let readers skip other users
+            idx = idx[np.argsort(users[idx], kind="stable")]
+            table = pa.table({
+                "user_id": pa.array(users[idx], pa.string()),
+                "ts": pa.array(local_ns[idx], pa.timestamp('ns')),
+                "utc_ts": pa.array(utc_ns[idx], pa.timestamp('ns', tz='UTC')),
+                "amount": pa.array(amount[idx], pa.float64()),
+                "category": pa.array(category[idx], pa.string()),
+                "txn_id": pa.array(txn_ids[idx], pa.uint64()),
+            })
+            directory = os.path.join(self.root, f"month={month_label(int(month))}", f"cohort={cohort}")
+            os.makedirs(directory, exist_ok=True)
+            # Written under a hidden name and renamed, so readers never see a partial file
+            staging = os.path.join(directory, f".{flush_name}.parquet")
+            pq.write_table(table, staging, compression="zstd")
+            os.replace(staging, os.path.join(directory, f"{flush_name}.parquet"))
+
+    def refresh(self) -> bool:
+        """Flush, fold unseen files and rebuild the affected percentile tables
+
+        Returns False if another thread is already refreshing.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        with self._lock:
+            # Everything ingested so far is written by the flush below and folded here
+            unfolded, self._unfolded_ids = self._unfolded_ids, {}
+        try:
+            import pyarrow.parquet as pq
+
+            started = time.perf_counter()
+            self.flush()
+            listed = self._list_parts()
+            self._parts.intersection_update(listed)  # drop files merged by compact()
+            new_parts = sorted((p for p in listed if p not in self._parts), key=os.path.basename)
+            dirty, batch, batch_rows = set(), [], 0
+            for part in new_parts:
+                try:
+                    # ParquetFile skips read_table's dataset setup, which dominates for small files
+                    with pq.ParquetFile(os.path.join(self.root, part)) as f:
+                        table = f.read(columns=PART_COLUMNS, use_threads=False)
+                except FileNotFoundError:
+                    continue  # compacted away since it was listed; its rows are in the new file
+                batch.append((part, table))
+                batch_rows += table.num_rows
+                if batch_rows >= FOLD_BATCH_ROWS:
+                    self._fold(batch, dirty)
+                    batch, batch_rows = [], 0
+            self._fold(batch, dirty)
+
+            window = self._current_window()
+            if window != self._window or not self._tables:
+                dirty = None  # window moved (or first tables): every cohort changes
+            if dirty is None or dirty:
+                self._tables = self._compute_tables(window, dirty)
+                self._window = window
+            if new_parts:
+                self._save_snapshot()
+            self.last_refresh_seconds = round(time.perf_counter() - started, 3)
+            self.last_error = None
+            return True
+        except Exception as e:
+            with self._lock:
+                for user, ids in unfolded.items():
+                    self._unfolded_ids.setdefault(user, []).extend(ids)
+            self.last_error = str(e)
+            print(f"⚠️ Cohort refresh failed: {e}")
+            raise
+        finally:
+            self._refreshed = time.monotonic()
+            self._refresh_lock.release()
+
+    def _list_parts(self) -> List[str]:
+        """Part files, relative to the root"""
+        parts = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.startswith("part-") and name.endswith(".parquet"):
+                    parts.append(os.path.relpath(os.path.join(directory, name), self.root))
+        return parts
+
+    def _fold(self, batch: List[Tuple[str, "pa.Table"]], dirty: set):
+        """Add the rows of a batch of part files whose transactions are not folded yet"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        tables = [table for _, table in batch if table.num_rows]
+        if tables:
+            sizes = [table.num_rows for table in tables]
+            table = pa.concat_tables(tables)
+            file_idx = np.repeat(np.arange(len(tables)), sizes)
+            locations = [part.split(os.sep) for part, table in batch if table.num_rows]
+            months = np.repeat([parse_month_label(m.split("=", 1)[1]) for m, _, _ in locations], sizes)
+            cohort_names = np.array([c.split("=", 1)[1] for _, c, _ in locations], dtype=object)
+
+            users = table.column("user_id").combine_chunks().dictionary_encode()
+            codes = users.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+            uniques = users.dictionary.to_numpy(zero_copy_only=False)
+            utc_ns = table.column("utc_ts").combine_chunks().cast(pa.int64()).to_numpy(zero_copy_only=False)
+            local_ns = table.column("ts").combine_chunks().cast(pa.int64()).to_numpy(zero_copy_only=False)
+            amount = table.column("amount").combine_chunks().to_numpy(zero_copy_only=False)
+            category = table.column("category").combine_chunks()
+            txn_ids = table.column("txn_id").combine_chunks().to_numpy(zero_copy_only=False)
+
+            # A transaction recorded by several processes, by a retried request, or merged
+            # into a compacted file, is folded once
+            keep, ids = self._unseen(txn_ids, months)
+            self.duplicate_rows += int((~keep).sum())
+            if keep.any():
+                self._fold_rows(keep, codes, uniques, utc_ns, file_idx, cohort_names, dirty)
+
+                # One code per (user, month) pair
+                first_month = int(months.min())
+                span = int(months.max()) - first_month + 1
+                pairs, pair_codes = np.unique(codes * span + (months - first_month), return_inverse=True)
+                keys = pd.MultiIndex.from_arrays([uniques[pairs // span], pairs % span + first_month],
+                                                 names=["user_id", "month"])
+
+                expense = keep & (amount < 0)
+                spend = np.where(expense, -amount, 0.0)
+                weekend = (local_ns // NS_PER_DAY + 3) % 7 >= 5  # 1970-01-01 was a Thursday
+                essential = pc.fill_null(pc.equal(category, "Essential"), False).to_numpy(zero_copy_only=False)
+                discretionary = pc.fill_null(pc.equal(category, "Discretionary"),
+                                             False).to_numpy(zero_copy_only=False)
+                self.rows_folded += int(keep.sum())
+
+                n = len(pairs)
+                frame = pd.DataFrame({
+                    "spend": np.bincount(pair_codes, weights=spend, minlength=n),
+                    "weekend_spend": np.bincount(pair_codes, weights=spend * weekend, minlength=n),
+                    "essential_spend": np.bincount(pair_codes, weights=spend * essential, minlength=n),
+                    "discretionary_spend": np.bincount(pair_codes, weights=spend * discretionary, minlength=n),
+                    "expense_count": np.bincount(pair_codes, weights=expense, minlength=n),
+                    "transaction_count": np.bincount(pair_codes, weights=keep, minlength=n)
+                }, index=keys)
+                self._merge_rollup(frame[frame["transaction_count"] > 0])
+            self._ids.update(ids)
+        self._parts.update(part for part, _ in batch)
+
+    def _unseen(self, txn_ids: np.ndarray, months: np.ndarray) -> Tuple[np.ndarray, Dict[int, np.ndarray]]:
+        """Rows of transactions not folded before, one per id; and the months' updated ids"""
+        order = np.lexsort((txn_ids, months))
+        ids, by_month = txn_ids[order], months[order]
+        new_month = np.r_[True, by_month[1:] != by_month[:-1]]
+        keep = new_month | np.r_[True, ids[1:] != ids[:-1]]
+        bounds = np.r_[np.flatnonzero(new_month), len(ids)]
+        merged = {}
+        for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            month = int(by_month[start])
+            folded = self._ids.get(month, np.empty(0, dtype=np.uint64))
+            keep[start:end] &= ~_contains(folded, ids[start:end])
+            added = ids[start:end][keep[start:end]]
+            merged[month] = np.insert(folded, np.searchsorted(folded, added), added)
+        unseen = np.empty(len(keep), dtype=bool)
+        unseen[order] = keep
+        return unseen, merged
+
+    def _merge_rollup(self, frame: pd.DataFrame):
+        """Add per-(user, month) sums; months the frame does not cover are left untouched"""
+        for month, totals in frame.groupby(level="month"):
+            totals = totals.droplevel("month")
+            current = self._rollup.get(int(month))
+            self._rollup[int(month)] = totals if current is None else current.add(totals, fill_value=0)
+
+    def _fold_rows(self, keep: np.ndarray, codes: np.ndarray, uniques: np.ndarray, utc_ns: np.ndarray,
+                   file_idx: np.ndarray, cohort_names: np.ndarray, dirty: set):
+        """Advance user watermarks; a user belongs to the cohort of their newest transaction"""
+        rows = np.flatnonzero(keep)
+        rows = rows[np.lexsort((utc_ns[rows], codes[rows]))]
+        last = rows[np.r_[codes[rows][1:] != codes[rows][:-1], True]]  # newest kept row per user
+        dirty.update(cohort_names[np.unique(file_idx[rows])])
+        for user, newest, cohort in zip(uniques[codes[last]], utc_ns[last].tolist(),
+                                        cohort_names[file_idx[last]]):
+            if newest > self._watermarks.get(user, -1):
+                self._watermarks[user] = newest
+                old = self._user_cohort.get(user)
+                if old != cohort:
+                    if old is not None:
+                        dirty.add(old)
+                    self._user_cohort[user] = cohort
+
+    def _current_window(self) -> Optional[Tuple[int, int]]:
+        """(first, last) month index of the comparison window, ending at the newest month"""
+        if not self._rollup:
+            return None
+        last = max(self._rollup)
+        return last - self.window_months + 1, last
+
+    def _compute_tables(self, window: Optional[Tuple[int, int]], dirty: Optional[set]) -> Dict[str, CohortTable]:
+        """Percentile tables for the dirty cohorts (all when dirty is None) plus ALL_USERS"""
+        if window is None:
+            return {}
+        recent = pd.concat([self._rollup[m] for m in range(window[0], window[1] + 1) if m in self._rollup])
+        per_user = recent.groupby(level="user_id").sum()
+        active_months = recent.groupby(level="user_id").size()
+        per_user = per_user[per_user["spend"] > 0]
+        active_months = active_months.reindex(per_user.index).to_numpy()
+        values = metric_values({name: per_user[name].to_numpy() for name in ROLLUP_SUMS}, active_months)
+        cohorts = pd.Series([self._user_cohort.get(u) for u in per_user.index], dtype=object)
+
+        tables = {} if dirty is None else {c: t for c, t in self._tables.items() if c not in dirty}
+        for cohort, idx in cohorts.groupby(cohorts).indices.items():
+            if dirty is None or cohort in dirty:
+                tables[cohort] = CohortTable.from_values({m: v[idx] for m, v in values.items()})
+        if len(per_user):
+            tables[ALL_USERS] = CohortTable.from_values(values)
+        return tables
+
+    def _save_snapshot(self):
+        """Persist the folded state so a restart only folds files written since"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        generation = f"{time.time_ns()}-{os.getpid()}"
+        rollup_file, users_file = f"_rollup-{generation}.parquet", f"_users-{generation}.parquet"
+        ids_file = f"_ids-{generation}.npy"
+        months = sorted(self._rollup)
+        rollup = (pd.concat([self._rollup[m] for m in months], keys=months, names=["month", "user_id"])
+                  .reset_index() if months else pd.DataFrame(columns=["month", "user_id"] + ROLLUP_SUMS))
+        pq.write_table(pa.Table.from_pandas(rollup, preserve_index=False),
+                       os.path.join(self.root, rollup_file))
+        users = list(self._watermarks)
+        pq.write_table(pa.table({
+            "user_id": pa.array(users, pa.string()),
+            "cohort": pa.array([self._user_cohort.get(u) for u in users], pa.string()),
+            "last_utc_ns": pa.array([self._watermarks[u] for u in users], pa.int64())
+        }), os.path.join(self.root, users_file))
+        # Random 64-bit ids do not compress; a raw array loads an order of magnitude faster
+        months = sorted(self._ids)
+        np.save(os.path.join(self.root, ids_file),
+                np.concatenate([self._ids[m] for m in months] or [np.empty(0, np.uint64)]))
+
+        manifest = {"rollup": rollup_file, "users": users_file, "ids": ids_file,
+                    "id_counts": [[m, len(self._ids[m])] for m in months],
+                    "parts": sorted(self._parts), "rows_folded": self.rows_folded}
+        staging = os.path.join(self.root, f".{MANIFEST_FILE}.{generation}")
+        with open(staging, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(staging, os.path.join(self.root, MANIFEST_FILE))
+
+        cutoff = time.time() - SNAPSHOT_GRACE_S
+        for name in os.listdir(self.root):
+            if name.startswith(("_rollup-", "_users-", "_ids-")) and name not in (rollup_file, users_file, ids_file):
+                path = os.path.join(self.root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def _load_snapshot(self):
+        path = os.path.join(self.root, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return
+        try:
+            import pyarrow.parquet as pq
+
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            rollup = pq.read_table(os.path.join(self.root, manifest["rollup"])).to_pandas()
+            users = pq.read_table(os.path.join(self.root, manifest["users"])).to_pandas()
+            ids = np.load(os.path.join(self.root, manifest["ids"]))
+        except Exception as e:
+            # Everything is refolded from the part files instead
+            print(f"⚠️ Cohort snapshot unreadable, refolding {self.root}: {e}")
+            return
+        self._rollup = {int(month): totals.drop(columns="month").set_index("user_id")
+                        for month, totals in rollup.groupby("month")}
+        counts = manifest["id_counts"]
+        self._ids = dict(zip((month for month, _ in counts),
+                             np.split(ids, np.cumsum([count for _, count in counts])[:-1])))
+        self._watermarks = dict(zip(users["user_id"], users["last_utc_ns"].astype(int)))
+        self._user_cohort = dict(zip(users["user_id"], users["cohort"]))
+        self._parts = set(manifest["parts"])
+        self.rows_folded = manifest.get("rows_folded", 0)
+
+    def compact(self, min_files: int = 8) -> int:
+        """Merge partitions with at least min_files part files into one file each
+
+        Returns the number of files removed. Safe while other processes ingest or refresh:
+        rows of a merged file that were already folded are dropped by their ids.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        by_partition: Dict[str, List[str]] = {}
+        for part in self._list_parts():
+            by_partition.setdefault(os.path.dirname(part), []).append(part)
+        removed = 0
+        for partition, parts in by_partition.items():
+            if len(parts) < min_files:
+                continue
+            directory = os.path.join(self.root, partition)
+            lock_path = os.path.join(directory, ".compacting")
+            try:
+                lock = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue  # another process is compacting this partition
+            try:
+                parts = sorted(parts, key=os.path.basename)
+                tables = []
+                for p in parts:
+                    with pq.ParquetFile(os.path.join(self.root, p)) as f:
+                        tables.append(f.read(use_threads=False))
+                table = pa.concat_tables(tables)
+                users = table.column("user_id").combine_chunks().to_numpy(zero_copy_only=False)
+                table = table.take(pa.array(np.argsort(users, kind="stable")))
+                # Named after the newest merged file so it sorts after everything it contains
+                name = os.path.basename(parts[-1])[:-len(".parquet")] + "-c.parquet"
+                staging = os.path.join(directory, "." + name)
+                pq.write_table(table, staging, compression="zstd")
+                os.replace(staging, os.path.join(directory, name))
+                for p in parts:
+                    os.remove(os.path.join(self.root, p))
+                removed += len(parts) - 1
+            finally:
+                os.close(lock)
+                os.remove(lock_path)
+        return removed
+
+    def compare(self, profile: Dict, accumulator: PatternAccumulator) -> Optional[Dict]:
+        """Percentile of each of a user's metrics within the profile's cohort
+
+        The user's metrics cover the same months as the tables. Falls back to all users
+        when the cohort has fewer than min_users; None when there is not enough data yet
+        or the user has no expenses in the window.
+        """
+        self._maybe_refresh()
+        tables, window = self._tables, self._window
+        values = user_metrics(accumulator, window) if window is not None else None
+        if values is None:
+            return None
+        cohort = cohort_id(profile)
+        compared_with = cohort
+        table = tables.get(cohort)
+        if table is None or table.users < self.min_users:
+            compared_with = ALL_USERS
+            table = tables.get(ALL_USERS)
+        if table is None or table.users < self.min_users:
+            return None
+        return {
+            "cohort": cohort,
+            "compared_with": compared_with,
+            "users": table.users,
+            "months": [month_label(window[0]), month_label(window[1])],
+            "metrics": {
+                metric: {
+                    "value": round(float(value), 4),
+                    "percentile": round(table.percentile(metric, value), 1),
+                    "median": round(table.median(metric), 4)
+                }
+                for metric, value in values.items() if metric in table.quantiles
+            }
+        }
+
+    def _maybe_refresh(self):
+        """Start a background refresh when the tables or the write buffer are stale"""
+        now = time.monotonic()
+        stale = self._refreshed is None or now - self._refreshed >= self.refresh_s
+        buffered = self._pending_since is not None and now - self._pending_since >= self.flush_s
+        if stale or buffered:
+            self.start_refresh()
+
+    def start_refresh(self) -> bool:
+        """Refresh in a background thread; False if a refresh is already running"""
+        if self._refresh_lock.locked():
+            return False
+        threading.Thread(target=self._refresh_quietly, name="cohort-refresh", daemon=True).start()
+        return True
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception:
+            pass  # recorded in last_error; the previous tables keep serving
+
+    def cohorts(self) -> Dict[str, Dict]:
+        """Users and metric medians per cohort table"""
+        return {
+            cohort: {"users": table.users, "medians": {m: round(table.median(m), 4) for m in table.quantiles}}
+            for cohort, table in sorted(self._tables.items())
+        }
+
+    def stats(self) -> Dict:
+        window = self._window
+        return {
+            "parts": len(self._parts),
+            "rows_folded": self.rows_folded,
+            "duplicate_rows": self.duplicate_rows,
+            "ingested_rows": self.ingested_rows,
+            "pending_rows": self._pending_rows,
+            "users": len(self._watermarks),
+            "cohorts": len([c for c in self._tables if c != ALL_USERS]),
+            "window": [month_label(window[0]), month_label(window[1])] if window else None,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "last_error": self.last_error
+        }
+
+
+def main():
+    from transaction_stream import TransactionStream
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=os.getenv("AI_COHORT_DIR", "cohort_store"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="add one user's NDJSON transactions")
+    ingest.add_argument("path")
+    ingest.add_argument("--user-id", required=True)
+    ingest.add_argument("--location-tier", type=int, default=2)
+    ingest.add_argument("--family-size", type=int, default=3)
+    ingest.add_argument("--income", type=float, default=25000)
+
+    commands.add_parser("refresh", help="fold new files and rebuild percentile tables")
+    compact = commands.add_parser("compact", help="merge small files per partition")
+    compact.add_argument("--min-files", type=int, default=8)
+    commands.add_parser("stats", help="store summary and per-cohort medians")
+    args = parser.parse_args()
+
+    store = CohortStore(args.root)
+    if args.command == "ingest":
+        profile = {"location_tier": args.location_tier, "family_size": args.family_size, "income": args.income}
+        with open(args.path, "rb") as f:
+            stream = TransactionStream(f, max_memory_bytes=64 * 2**20, max_body_bytes=2**40)
+            applied = store.ingest(args.user_id, profile, stream.chunks())
+        store.flush()
+        print(f"✅ Ingested {applied} transactions for {args.user_id} ({cohort_id(profile)})")
+    elif args.command == "refresh":
+        store.refresh()
+        print(json.dumps(store.stats(), indent=2))
+    elif args.command == "compact":
+        removed = store.compact(args.min_files)
+        print(f"✅ Compacted {removed} files")
+    else:
+        store.refresh()
+        print(json.dumps({"store": store.stats(), "cohorts": store.cohorts()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Columnar spending-pattern engine
+Parses transactions once into typed NumPy columns and reduces them with bincount
+"""
+
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+NS_PER_HOUR = 3_600_000_000_000
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+# Transactions parsed per chunk; bounds the temporary arrays for very large payloads
+DEFAULT_CHUNK_SIZE = 65536
+
+# Sums kept per calendar month by PatternAccumulator.month_totals, in array order
+MONTH_TOTALS = ("spend", "weekend_spend", "essential_spend", "discretionary_spend",
+                "expense_count", "transaction_count")
+
+
+class TransactionColumns:
+    """Typed columns for a batch of transactions"""
+
+    __slots__ = ("local_ns", "utc_ns", "amount", "category_code", "categories")
+
+    def __init__(self, local_ns: np.ndarray, utc_ns: np.ndarray, amount: np.ndarray,
+                 category_code: np.ndarray, categories: List[str]):
+        self.local_ns = local_ns            # int64 wall-clock epoch ns (weekday/hour)
+        self.utc_ns = utc_ns                # int64 UTC epoch ns (ordering)
+        self.amount = amount                # float64
+        self.category_code = category_code  # int32 index into categories, -1 if missing
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.amount)
+
+    def select(self, mask: np.ndarray) -> "TransactionColumns":
+        return TransactionColumns(self.local_ns[mask], self.utc_ns[mask], self.amount[mask],
+                                  self.category_code[mask], self.categories)
+
+
+def parse_transaction_columns(transactions: List[Dict]) -> TransactionColumns:
+    """Parse a list of transaction dicts into typed columns"""
+    n = len(transactions)
+    amount = np.fromiter((t['amount'] for t in transactions), dtype=np.float64, count=n)
+    return build_transaction_columns([t['date'] for t in transactions], amount,
+                                     [t.get('category') for t in transactions])
+
+
+def build_transaction_columns(dates, amount: np.ndarray, categories) -> TransactionColumns:
+    """Typed columns from raw date strings, float64 amounts and category labels"""
+    dates = pd.DatetimeIndex(pd.to_datetime(dates)).as_unit('ns')
+    if dates.tz is not None:
+        utc_ns = dates.tz_convert('UTC').asi8
+        local_ns = dates.tz_localize(None).asi8
+    else:
+        utc_ns = local_ns = dates.asi8
+    codes, uniques = pd.factorize(pd.Series(categories, dtype=object))
+    return TransactionColumns(np.asarray(local_ns, dtype=np.int64), np.asarray(utc_ns, dtype=np.int64),
+                              amount, codes.astype(np.int32), [str(u) for u in uniques])
+
+
+def iter_transaction_columns(transactions: List[Dict],
+                             chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[TransactionColumns]:
+    for start in range(0, len(transactions), chunk_size):
+        yield parse_transaction_columns(transactions[start:start + chunk_size])
+
+
+def month_index(local_ns: np.ndarray) -> np.ndarray:
+    """Months since 1970-01 for wall-clock epoch ns"""
+    return np.asarray(local_ns, dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+
+def to_utc_ns(ts) -> int:
+    """Epoch ns for a `since` timestamp; naive values are taken as UTC"""
+    ts = pd.Timestamp(ts).as_unit('ns')
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return int(ts.tz_convert('UTC').value)
+
+
+class PatternAccumulator:
+    """Running bincount reductions over transaction column chunks"""
+
+    def __init__(self):
+        self.weekday_spend = np.zeros(7)
+        self.hour_spend = np.zeros(24)
+        self.category_spend: Dict[str, float] = {}
+        self.expense_total = 0.0
+        self.expense_count = 0
+        self.essential_net = 0.0
+        self.transaction_count = 0
+        self.first_local_ns: Optional[int] = None
+        self.last_local_ns: Optional[int] = None
+        self.last_utc_ns: Optional[int] = None
+        # Months since 1970-01 -> MONTH_TOTALS (spend positive), for windowed cohort metrics
+        self.month_totals: Dict[int, np.ndarray] = {}
+
+    def update(self, cols: TransactionColumns):
+        if not len(cols):
+            return
+        amount = cols.amount
+        expense = amount < 0
+        exp_amount = amount[expense]
+        exp_local = cols.local_ns[expense]
+
+        # 1970-01-01 was a Thursday (Monday = 0)
+        weekday = (exp_local // NS_PER_DAY + 3) % 7
+        hour = (exp_local // NS_PER_HOUR) % 24
+        self.weekday_spend += np.bincount(weekday, weights=exp_amount, minlength=7)
+        self.hour_spend += np.bincount(hour, weights=exp_amount, minlength=24)
+
+        if cols.categories:
+            exp_codes = cols.category_code[expense]
+            known = exp_codes >= 0
+            by_code = np.bincount(exp_codes[known], weights=exp_amount[known],
+                                  minlength=len(cols.categories))
+            present = np.bincount(exp_codes[known], minlength=len(cols.categories))
+            for name, total, count in zip(cols.categories, by_code.tolist(), present.tolist()):
+                if count:
+                    self.category_spend[name] = self.category_spend.get(name, 0.0) + total
+            if 'Essential' in cols.categories:
+                essential = cols.category_code == cols.categories.index('Essential')
+                self.essential_net += float(amount[essential].sum())
+
+        self._update_months(cols, expense)
+        self.expense_total += float(exp_amount.sum())
+        self.expense_count += int(expense.sum())
+        self.transaction_count += len(cols)
+
+        first, last = int(cols.local_ns.min()), int(cols.local_ns.max())
+        self.first_local_ns = first if self.first_local_ns is None else min(self.first_local_ns, first)
+        self.last_local_ns = last if self.last_local_ns is None else max(self.last_local_ns, last)
+        last_utc = int(cols.utc_ns.max())
+        self.last_utc_ns = last_utc if self.last_utc_ns is None else max(self.last_utc_ns, last_utc)
+
+    def _update_months(self, cols: TransactionColumns, expense: np.ndarray):
+        months = month_index(cols.local_ns)
+        first = int(months.min())
+        offset = months - first
+        spend = np.where(expense, -cols.amount, 0.0)
+        weekend = (cols.local_ns // NS_PER_DAY + 3) % 7 >= 5
+        weights = [spend, spend * weekend, spend * _is_category(cols, 'Essential'),
+                   spend * _is_category(cols, 'Discretionary'), expense, None]
+        totals = np.stack([np.bincount(offset, weights=w, minlength=int(offset.max()) + 1) for w in weights])
+        for i in np.flatnonzero(totals[-1]).tolist():
+            previous = self.month_totals.get(first + i)
+            self.month_totals[first + i] = totals[:, i].copy() if previous is None else previous + totals[:, i]
+
+    def patterns(self) -> Dict:
+        """Spending patterns; day/hour are None when there are no expenses"""
+        # Ties resolve like pandas groupby().idxmax(): day names alphabetically, hours ascending
+        spent_days = sorted(name for name, total in zip(WEEKDAY_NAMES, self.weekday_spend) if total < 0)
+        highest_day = max(spent_days, key=lambda name: -self.weekday_spend[WEEKDAY_NAMES.index(name)],
+                          default=None)
+        peak_hour = int(np.argmax(-self.hour_spend)) if self.expense_count else None
+        return {
+            "highest_spending_day": highest_day,
+            "peak_spending_hour": peak_hour,
+            "avg_transaction_size": abs(self.expense_total / self.expense_count) if self.expense_count else 0.0,
+            "spending_by_category": {k: abs(v) for k, v in sorted(self.category_spend.items())}
+        }
+
+    def span_days(self) -> int:
+        """Calendar days covered by the transactions (at least 1)"""
+        if self.first_local_ns is None:
+            return 1
+        return int(self.last_local_ns // NS_PER_DAY - self.first_local_ns // NS_PER_DAY) + 1
+
+    def totals(self) -> Dict:
+        """Inputs for AIService._recommendations_from_totals"""
+        return {
+            "total_spending": abs(self.expense_total),
+            "essential_spending": abs(self.essential_net),
+            "transaction_count": self.transaction_count,
+            "span_days": self.span_days()
+        }
+
+
+def _is_category(cols: TransactionColumns, name: str) -> np.ndarray:
+    if name not in cols.categories:
+        return np.zeros(len(cols), dtype=bool)
+    return cols.category_code == cols.categories.index(name)
+
+
+def analyze_columns(transactions: List[Dict], chunk_size: int = DEFAULT_CHUNK_SIZE) -> PatternAccumulator:
+    """Single pass over transactions in fixed-size chunks"""
+    accumulator = PatternAccumulator()
+    for cols in iter_transaction_columns(transactions, chunk_size):
+        accumulator.update(cols)
+    return accumulator
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Goal forecast cache
+Fitted Prophet models per user, keyed on a hash of the aggregated daily series
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from columnar_patterns import NS_PER_DAY, TransactionColumns
+
+
+def daily_expense_series(transactions: List[Dict]) -> pd.DataFrame:
+    """Daily expense totals as a Prophet frame (ds, y)"""
+    expenses = [t for t in transactions if t['amount'] < 0]
+    if not expenses:
+        return pd.DataFrame(columns=['ds', 'y'])
+    ds = pd.DatetimeIndex(pd.to_datetime([t['date'] for t in expenses]))
+    # Prophet rejects tz-aware timestamps; keep the local calendar day
+    if ds.tz is not None:
+        ds = ds.tz_localize(None)
+    days = ds.to_numpy().astype('datetime64[D]')
+    amounts = np.fromiter((abs(t['amount']) for t in expenses), dtype=np.float64, count=len(expenses))
+    unique_days, day_index = np.unique(days, return_inverse=True)
+    return pd.DataFrame({
+        'ds': pd.to_datetime(unique_days),
+        'y': np.bincount(day_index.ravel(), weights=amounts)  # Daily expenses
+    })
+
+
+class DailyExpenseAccumulator:
+    """daily_expense_series built incrementally from TransactionColumns chunks
+
+    Only the per-day totals are kept, so memory grows with the number of days covered,
+    not the number of transactions.
+    """
+
+    def __init__(self):
+        self.days = np.empty(0, dtype=np.int64)  # local calendar day (days since epoch)
+        self.totals = np.empty(0, dtype=np.float64)
+        self.transaction_count = 0
+        self.expense_count = 0
+        self.expense_total = 0.0  # sum of abs(expense amounts)
+
+    def update(self, cols: TransactionColumns):
+        expense = cols.amount < 0
+        amounts = -cols.amount[expense]
+        self.transaction_count += len(cols)
+        self.expense_count += len(amounts)
+        self.expense_total += float(amounts.sum())
+        days = np.concatenate([self.days, cols.local_ns[expense] // NS_PER_DAY])
+        self.days, day_index = np.unique(days, return_inverse=True)
+        self.totals = np.bincount(day_index.ravel(), weights=np.concatenate([self.totals, amounts]))
+
+    @property
+    def nbytes(self) -> int:
+        return self.days.nbytes + self.totals.nbytes
+
+    def series(self) -> pd.DataFrame:
+        """Same frame as daily_expense_series(transactions)"""
+        if not len(self.days):
+            return pd.DataFrame(columns=['ds', 'y'])
+        return pd.DataFrame({'ds': pd.to_datetime(self.days * NS_PER_DAY, unit='ns'), 'y': self.totals})
+
+
+def series_fingerprint(df: pd.DataFrame) -> str:
+    """Stable hash of a (ds, y) series"""
+    digest = hashlib.sha1()
+    digest.update(df['ds'].astype(str).str.cat(sep='|').encode())
+    digest.update(np.ascontiguousarray(df['y'].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def stan_init(model) -> Dict:
+    """Fitted Prophet parameters in the form accepted by Prophet.fit(init=...)"""
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        params[name] = float(model.params[name][0][0])
+    for name in ['delta', 'beta']:
+        params[name] = model.params[name][0]
+    return params
+
+
+class ForecastFit:
+    """A fitted model plus the summary statistics derived from its series"""
+
+    def __init__(self, series_hash: str, series_len: int, model, daily_avg_expense: float,
+                 fit_seconds: float, warm_started: bool):
+        self.series_hash = series_hash
+        self.series_len = series_len
+        self.model = model
+        self.params = stan_init(model)
+        self.daily_avg_expense = daily_avg_expense
+        self.fit_seconds = fit_seconds
+        self.warm_started = warm_started
+        self.forecasts: Dict[int, List[Dict]] = {}
+
+
+class ForecastCache:
+    """LRU map of user key to the latest ForecastFit"""
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._fits: "OrderedDict[str, ForecastFit]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.warm_starts = 0
+
+    def get(self, key: str, series_hash: str) -> Optional[ForecastFit]:
+        """Cached fit for exactly this series, or None"""
+        with self._lock:
+            fit = self._fits.get(key)
+            if fit is None or fit.series_hash != series_hash:
+                self.misses += 1
+                return None
+            self._fits.move_to_end(key)
+            self.hits += 1
+            return fit
+
+    def warm_start_params(self, key: str, df: pd.DataFrame) -> Optional[Dict]:
+        """Prior parameters when df only appends new days to the previously fitted series"""
+        with self._lock:
+            fit = self._fits.get(key)
+        if fit is None or len(df) <= fit.series_len:
+            return None
+        if series_fingerprint(df.iloc[:fit.series_len]) != fit.series_hash:
+            return None
+        return fit.params
+
+    def put(self, key: str, fit: ForecastFit):
+        with self._lock:
+            self._fits[key] = fit
+            self._fits.move_to_end(key)
+            if fit.warm_started:
+                self.warm_starts += 1
+            while len(self._fits) > self.max_users:
+                self._fits.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"users": len(self._fits), "hits": self.hits, "misses": self.misses,
+                    "warm_starts": self.warm_starts}
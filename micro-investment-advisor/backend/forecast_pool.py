@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Forecast process pool
+A long-lived ProcessPoolExecutor for CPU-bound goal forecasts, with per-job timeouts
+and results yielded in completion order
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# Reasons a job has no worker result
+TIMEOUT = "timeout"
+WORKER_ERROR = "worker_error"
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (respects affinity masks and container pinning)"""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+class ForecastPool:
+    """Runs worker(job) in a process pool that is created once and reused across requests"""
+
+    def __init__(self, worker: Callable[[Any], Any], max_workers: Optional[int] = None,
+                 start_method: str = "spawn"):
+        self.worker = worker
+        self.max_workers = max_workers or available_cpus()
+        # spawn by default: forking a process that already runs threads can deadlock
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Executors torn down because a job overran; their other jobs are resubmitted
+        self._recycled: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+        self.jobs = 0
+        self.timeouts = 0
+        self.worker_errors = 0
+        self.restarts = 0
+        self.recycles = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+            return self._executor
+
+    def _reset(self, broken: ProcessPoolExecutor):
+        """Drop a broken executor so the next submission starts a fresh one"""
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """Kill an executor whose worker is stuck on a timed-out job and start afresh
+
+        A timed-out fit would otherwise hold its worker until it finished, shrinking the
+        pool and pushing later jobs past their deadlines.
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.recycles += 1
+            self._recycled.add(executor)
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, job: Any) -> Tuple[Future, ProcessPoolExecutor]:
+        executor = self._get_executor()
+        try:
+            return executor.submit(self.worker, job), executor
+        except (BrokenProcessPool, RuntimeError):
+            # Broken, or shut down by another request's recycle since we fetched it
+            self._reset(executor)
+            executor = self._get_executor()
+            return executor.submit(self.worker, job), executor
+
+    def imap_unordered(self, jobs: Iterable[Tuple[Any, Any]],
+                       timeout_s: float) -> Iterator[Tuple[Any, Any, Optional[str]]]:
+        """Yield (key, result, error) per (key, job) as jobs finish
+
+        At most max_workers jobs are in flight, so each job's timeout starts roughly when
+        a worker picks it up. error is None, TIMEOUT or WORKER_ERROR. A job still running
+        at its deadline gets the pool recycled; jobs that were on the recycled pool are
+        resubmitted with a fresh deadline.
+        """
+        pending = iter(jobs)
+        in_flight: Dict[Future, Tuple[Any, Any, float, ProcessPoolExecutor]] = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < self.max_workers:
+                try:
+                    key, job = next(pending)
+                except StopIteration:
+                    exhausted = True
+                    break
+                future, executor = self._submit(job)
+                in_flight[future] = (key, job, time.monotonic() + timeout_s, executor)
+                self.jobs += 1
+            if not in_flight:
+                return
+
+            next_deadline = min(deadline for _, _, deadline, _ in in_flight.values())
+            done, _ = wait(list(in_flight), timeout=max(0.0, next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                key, job, _, executor = in_flight.pop(future)
+                try:
+                    yield key, future.result(), None
+                except (BrokenProcessPool, CancelledError):
+                    if executor in self._recycled:
+                        # Killed with a timed-out neighbour, not by its own fault
+                        resubmitted, executor = self._submit(job)
+                        in_flight[resubmitted] = (key, job, time.monotonic() + timeout_s, executor)
+                        continue
+                    # A worker died (e.g. OOM-killed); every job on that executor fails
+                    self.worker_errors += 1
+                    self._reset(executor)
+                    yield key, None, WORKER_ERROR
+                except Exception as e:
+                    print(f"Forecast job {key} failed: {e}")
+                    self.worker_errors += 1
+                    yield key, None, WORKER_ERROR
+
+            now = time.monotonic()
+            for future, (key, _, deadline, executor) in list(in_flight.items()):
+                if deadline <= now and not future.done():
+                    del in_flight[future]
+                    if not future.cancel():
+                        self._recycle(executor)  # running: its worker is stuck on it
+                    self.timeouts += 1
+                    yield key, None, TIMEOUT
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.max_workers,
+            "started": self._executor is not None,
+            "jobs": self.jobs,
+            "timeouts": self.timeouts,
+            "worker_errors": self.worker_errors,
+            "restarts": self.restarts,
+            "recycles": self.recycles
+        }
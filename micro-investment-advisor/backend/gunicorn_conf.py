@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Production serving for the AI service
+    gunicorn -c gunicorn_conf.py ai_service:app
+
+The app is imported once in the master (preload_app), which loads the models listed in
+AI_WARMUP_MODELS before forking, so workers share them copy-on-write instead of each
+loading its own copy. Each worker serves AI_THREADS request threads; CPU-heavy endpoints
+additionally go through the bounded executor (AI_CPU_WORKERS / AI_CPU_QUEUE_DEPTH).
+"""
+
+import gc
+import os
+
+from forecast_pool import available_cpus
+
+bind = os.getenv("AI_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("AI_WORKERS", "0")) or available_cpus()
+worker_class = "gthread"
+threads = int(os.getenv("AI_THREADS", "8"))
+# Pending connections the kernel holds before refusing new ones
+backlog = int(os.getenv("AI_BACKLOG", "256"))
+# Prophet cold fits and first model loads can take tens of seconds
+timeout = int(os.getenv("AI_WORKER_TIMEOUT_S", "120"))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to return fragmented memory
+max_requests = int(os.getenv("AI_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+# Split the cores between workers for the NLP models' intra-op threads, so workers running
+# inference at the same time do not oversubscribe the CPU
+os.environ.setdefault("AI_NLP_THREADS", str(max(1, available_cpus() // workers)))
+
+preload_app = True
+# Warm-up must complete before fork: threads (and half-loaded models) do not survive it
+os.environ.setdefault("AI_WARMUP_BLOCKING", "1")
+
+accesslog = os.getenv("AI_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def when_ready(server):
+    # Tips are generated once, before fork, and inherited by every worker; prewarming in
+    # each worker would repeat the same LLM calls once per worker
+    import ai_service
+    ai_service.ai_service.prewarm_tips(wait_s=float(os.getenv("AI_TIPS_PREWARM_S", "30")))
+
+    # Move everything loaded so far out of the collector's reach, so GC passes in the
+    # workers do not write to (and un-share) the preloaded model pages
+    gc.freeze()
+    server.log.info("AI service preloaded: %d workers x %d threads", workers, threads)
+
+
+def post_worker_init(worker):
+    # Background threads start per worker: each worker folds the cohort store into its own
+    # tables (tip refresh workers start on the first tips request)
+    import ai_service
+    ai_service.ai_service.prewarm_cohorts()
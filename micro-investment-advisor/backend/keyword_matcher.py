@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Multi-pattern merchant keyword matcher
+Aho-Corasick automaton over a versioned keyword dictionary, built once at startup
+"""
+
+import json
+import os
+from collections import deque
+from typing import Dict, List, Optional
+
+DEFAULT_KEYWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     'data', 'merchant_keywords.json')
+
+
+class KeywordEntry:
+    __slots__ = ("keyword", "category", "priority", "confidence", "whole_word", "order")
+
+    def __init__(self, keyword: str, category: str, priority: int = 1,
+                 confidence: float = 0.8, whole_word: bool = False, order: int = 0):
+        self.keyword = keyword.lower()
+        self.category = category
+        self.priority = priority
+        self.confidence = confidence
+        self.whole_word = whole_word
+        self.order = order
+
+    def rank(self):
+        """Highest priority wins, then the longest keyword, then dictionary order"""
+        return (self.priority, len(self.keyword), -self.order)
+
+
+class KeywordMatcher:
+    """Finds the best dictionary keyword occurring anywhere in a merchant string"""
+
+    def __init__(self, entries: List[KeywordEntry], version: str = "unversioned",
+                 default_category: str = "Essential", default_confidence: float = 0.5):
+        self.version = version
+        self.default_category = default_category
+        self.default_confidence = default_confidence
+        self.size = 0
+        self._build(entries)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_KEYWORDS_PATH) -> "KeywordMatcher":
+        """Load a keyword dictionary file (see data/merchant_keywords.json)"""
+        with open(path, encoding='utf-8') as f:
+            spec = json.load(f)
+        return cls.from_spec(spec)
+
+    @classmethod
+    def from_spec(cls, spec: Dict) -> "KeywordMatcher":
+        default = spec.get("default", {})
+        entries = [
+            KeywordEntry(
+                item["keyword"],
+                item["category"],
+                priority=int(item.get("priority", 1)),
+                confidence=float(item.get("confidence", 0.8)),
+                whole_word=bool(item.get("whole_word", False)),
+                order=i
+            )
+            for i, item in enumerate(spec.get("keywords", []))
+            if item.get("keyword", "").strip()
+        ]
+        return cls(entries,
+                   version=str(spec.get("version", "unversioned")),
+                   default_category=default.get("category", "Essential"),
+                   default_confidence=float(default.get("confidence", 0.5)))
+
+    def _build(self, entries: List[KeywordEntry]):
+        # Trie: goto[state] maps a character to the next state
+        goto: List[Dict[str, int]] = [{}]
+        own: List[Optional[KeywordEntry]] = [None]
+        for entry in entries:
+            state = 0
+            for ch in entry.keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    own.append(None)
+                state = nxt
+            # Duplicate keywords keep the better-ranked entry
+            if own[state] is None or entry.rank() > own[state].rank():
+                if own[state] is None:
+                    self.size += 1
+                own[state] = entry
+
+        # Breadth-first failure links; each state's outputs include those of its
+        # failure chain, pre-sorted best first
+        fail = [0] * len(goto)
+        outputs: List[tuple] = [()] * len(goto)
+        queue = deque()
+        for ch, nxt in goto[0].items():
+            queue.append(nxt)
+            outputs[nxt] = (own[nxt],) if own[nxt] else ()
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                inherited = outputs[fail[nxt]]
+                merged = ((own[nxt],) if own[nxt] else ()) + inherited
+                outputs[nxt] = tuple(sorted(merged, key=KeywordEntry.rank, reverse=True))
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = outputs
+
+    def match(self, text: str) -> Optional[KeywordEntry]:
+        """Best matching entry for text, or None"""
+        text = text.lower()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        best = None
+        best_rank = None
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for entry in outputs[state]:
+                rank = entry.rank()
+                if best_rank is not None and rank <= best_rank:
+                    break
+                if entry.whole_word and not _is_whole_word(text, i - len(entry.keyword) + 1, i + 1):
+                    continue
+                best, best_rank = entry, rank
+                break
+        return best
+
+    def categorize(self, merchant_name: str) -> Dict:
+        """Categorization result in the shape used by AIService"""
+        entry = self.match(merchant_name or "")
+        if entry is None:
+            return {"category": self.default_category, "confidence": self.default_confidence,
+                    "method": "Rule-based"}
+        return {"category": entry.category, "confidence": entry.confidence,
+                "method": "Rule-based", "matched_keyword": entry.keyword}
+
+    def stats(self) -> Dict:
+        return {"version": self.version, "keywords": self.size, "states": len(self._goto)}
+
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not before.isalnum() and not after.isalnum()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Merchant categorization cache
+LRU-bounded memo of categorization results with optional SQLite persistence. Changes are
+written behind: collected in memory and flushed in one transaction every flush_s seconds
+or flush_entries changes, outside the lock that lookups take.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Higher rank wins: a model result (zero-shot "NLP" or "Embedding") may replace a cached
+# rule-based one
+METHOD_RANK = {"Rule-based": 0, "NLP": 1, "Embedding": 1}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_merchant_key(merchant_name: str, description: str = "") -> str:
+    """Cache key for a merchant/description pair: lowercased, whitespace collapsed"""
+    text = f"{merchant_name or ''} {description or ''}"
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def categorization_key(engine: str, merchant_name: str, description: str = "") -> str:
+    """Cache key of one categorization engine's result for a merchant/description pair"""
+    return f"{engine}:{normalize_merchant_key(merchant_name, description)}"
+
+
+class CategorizationCache:
+    """Thread-safe LRU cache of categorization results, bounded by entries and bytes"""
+
+    def __init__(self, max_entries: int = 50000, max_bytes: int = 32 * 2**20,
+                 snapshot_path: Optional[str] = None, flush_s: float = 1.0, flush_entries: int = 512):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.snapshot_path = snapshot_path
+        self.flush_s = flush_s
+        self.flush_entries = flush_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        # Unwritten changes: key -> (method, payload), or None for a deleted key
+        self._dirty: Dict[str, Optional[tuple]] = {}
+        self._db_lock = threading.Lock()  # serializes flushes; never taken with _lock held
+        self._wake = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        if snapshot_path:
+            self._open_snapshot(snapshot_path)
+
+    @staticmethod
+    def _entry_size(key: str, payload: str) -> int:
+        return sys.getsizeof(key) + sys.getsizeof(payload)
+
+    def get(self, key: str, min_method: Optional[str] = None) -> Optional[Dict]:
+        """Cached result for key, or None; entries from a weaker method than min_method miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (min_method is not None and
+                                 METHOD_RANK.get(entry[0]["method"], 0) < METHOD_RANK.get(min_method, 0)):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, key: str, result: Dict):
+        """Store a result unless a stronger method already produced one for this key"""
+        payload = json.dumps(result, sort_keys=True)
+        size = self._entry_size(key, payload)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                if METHOD_RANK.get(existing[0]["method"], 0) > METHOD_RANK.get(result["method"], 0):
+                    return
+                self._bytes -= existing[1]
+                del self._entries[key]
+            self._entries[key] = (dict(result), size)
+            self._bytes += size
+            evicted = self._evict_locked()
+            if self._db is None:
+                return
+            self._dirty[key] = (result["method"], payload)
+            for k in evicted:
+                self._dirty[k] = None
+            full = len(self._dirty) >= self.flush_entries
+        self._ensure_writer()
+        if full:
+            self._wake.set()
+
+    def _evict_locked(self):
+        evicted = []
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            evicted.append(key)
+        return evicted
+
+    def _open_snapshot(self, path: str):
+        """Open the on-disk snapshot and warm the cache from it"""
+        try:
+            self._db = self._connect(path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS categorizations ("
+                "key TEXT PRIMARY KEY, method TEXT NOT NULL, result TEXT NOT NULL, "
+                "updated_at REAL NOT NULL DEFAULT (julianday('now')))"
+            )
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT key, result FROM categorizations ORDER BY updated_at DESC LIMIT ?",
+                (self.max_entries,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ Categorization cache snapshot unavailable: {e}")
+            self._db = None
+            return
+
+        # Oldest first so the most recently used rows end up at the LRU tail
+        for key, payload in reversed(rows):
+            size = self._entry_size(key, payload)
+            self._entries[key] = (json.loads(payload), size)
+            self._bytes += size
+        self._evict_locked()
+        print(f"✅ Warmed categorization cache with {len(self._entries)} entries")
+
+    def _connect(self, path: str):
+        # Pre-forked workers share the file but each needs its own connection
+        self._db_pid = os.getpid()
+        return sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+
+    def _ensure_writer(self):
+        # Threads do not survive fork, so pre-forked workers start their own
+        if self._writer_pid == os.getpid() and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid() and self._writer.is_alive():
+                return
+            self._writer_pid = os.getpid()
+            self._writer = threading.Thread(target=self._write_behind, name="category-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _write_behind(self):
+        while True:
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write pending changes to the snapshot in one transaction; returns how many"""
+        if self._db is None:
+            return 0
+        with self._db_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return 0
+            upserts = [(key, change[0], change[1]) for key, change in dirty.items() if change is not None]
+            deletes = [(key,) for key, change in dirty.items() if change is None]
+            try:
+                if self._db_pid != os.getpid():
+                    self._db = self._connect(self.snapshot_path)
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO categorizations (key, method, result, updated_at) "
+                        "VALUES (?, ?, ?, julianday('now'))",
+                        upserts
+                    )
+                    self._db.executemany("DELETE FROM categorizations WHERE key = ?", deletes)
+            except sqlite3.Error as e:
+                print(f"⚠️ Failed to persist {len(dirty)} categorization cache entries: {e}")
+                with self._lock:
+                    # Retried with the next flush; changes made since take precedence
+                    for key, change in dirty.items():
+                        self._dirty.setdefault(key, change)
+                return 0
+            self.flushes += 1
+            return len(dirty)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Counters for health reporting"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "persistent": self._db is not None,
+                "unflushed": len(self._dirty),
+                "flushes": self.flushes
+            }
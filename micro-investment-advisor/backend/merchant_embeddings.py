@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Embedding-based merchant categorization
+Merchant strings are embedded once with a small sentence encoder and compared, with one
+matrix product, against an index of category prototypes and labeled merchant exemplars.
+Categories are never re-encoded per call, and labeled merchants can be added to the index
+at runtime without retraining anything.
+"""
+
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from merchant_cache import normalize_merchant_key
+
+# Short descriptions of each category; their mean embedding is the category prototype
+CATEGORY_PROTOTYPES = {
+    "Essential": ["grocery store kirana supermarket", "electricity water gas utility bill",
+                  "pharmacy medical store medicines", "petrol pump fuel", "mobile recharge",
+                  "bus train metro travel", "milk dairy vegetables", "house rent"],
+    "Discretionary": ["restaurant food delivery", "movie tickets cinema entertainment",
+                      "online shopping clothes fashion", "streaming subscription",
+                      "cafe coffee fast food", "cab ride taxi"],
+    "Debt": ["loan emi repayment", "credit card bill payment", "insurance premium",
+             "bank finance installment"],
+    "Income": ["salary credit", "freelance payment received", "interest credit refund cashback",
+               "neft credit transfer received"],
+}
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Known merchants the index starts with besides the keyword dictionary
+DEFAULT_SEEDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'merchant_seeds.json')
+
+_NON_LETTERS = re.compile(r"[^a-z]+")
+
+
+class HashingEncoder:
+    """Dependency-free encoder: signed hashed word and character n-gram counts
+
+    Robust to the reference numbers, handles and city suffixes of statement narrations, and
+    a few microseconds per string. Select it with AI_EMBEDDING_MODEL=hashing.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 512, ngrams: Sequence[int] = (3, 4, 5)):
+        self.dim = dim
+        self.ngrams = tuple(ngrams)
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for word in _NON_LETTERS.sub(" ", text.lower()).split():
+            features.append("w:" + word)
+            padded = f"<{word}>"
+            for n in self.ngrams:
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode())
+                out[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+
+class SentenceEncoder:
+    """sentence-transformers model (e.g. all-MiniLM-L6-v2), returning unit vectors"""
+
+    def __init__(self, model: str, threads: int = 0):
+        from sentence_transformers import SentenceTransformer
+        from nlp_backends import configure_threads
+        configure_threads(threads)
+        self.name = model
+        self.model = SentenceTransformer(model, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        return self.model.encode(list(texts), batch_size=64, convert_to_numpy=True,
+                                 normalize_embeddings=True).astype(np.float32, copy=False)
+
+
+def load_encoder(model: str = DEFAULT_EMBEDDING_MODEL, threads: int = 0):
+    return HashingEncoder() if model == "hashing" else SentenceEncoder(model, threads)
+
+
+class MerchantIndex:
+    """Unit vectors of category prototypes and labeled merchants, searched by dot product
+
+    A text's score for a category is its highest cosine similarity to any of the category's
+    rows; a softmax over those scores gives all_scores. The arrays are replaced, never
+    modified, when merchants are added, so classification reads them without a lock.
+    """
+
+    def __init__(self, encoder, categories: Sequence[str] = tuple(CATEGORY_PROTOTYPES),
+                 temperature: float = 0.1, max_rows: int = 200_000,
+                 exemplars_path: Optional[str] = None):
+        self.encoder = encoder
+        self.categories = list(categories)
+        self.temperature = temperature
+        self.max_rows = max_rows
+        self.exemplars_path = exemplars_path
+        self._lock = threading.Lock()
+        # (vectors, labels, texts, category row bounds), swapped as a whole
+        self._rows: Dict[str, int] = {}
+        self._install(np.zeros((0, encoder.dim), dtype=np.float32), np.zeros(0, dtype=np.int64), [])
+        self.prototypes = 0
+        self.added = 0
+
+    @classmethod
+    def build(cls, encoder, keywords_path: Optional[str] = None, seeds_path: Optional[str] = None,
+              **kwargs) -> "MerchantIndex":
+        """Prototypes, the keyword dictionary, seed merchants, and previously added exemplars"""
+        index = cls(encoder, **kwargs)
+        index._add_prototypes()
+        if keywords_path:
+            with open(keywords_path, encoding='utf-8') as f:
+                spec = json.load(f)
+            # Ambiguous keywords ("credit", "payment") would pull every narration that
+            # mentions them toward one category
+            entries = [e for e in spec.get("keywords", [])
+                       if e["category"] in index.categories and not e.get("ambiguous", False)]
+            index.add([e["keyword"] for e in entries], [e["category"] for e in entries])
+        if seeds_path:
+            with open(seeds_path, encoding='utf-8') as f:
+                seeds = [s for s in json.load(f).get("merchants", []) if s["category"] in index.categories]
+            index.add([s["merchant"] for s in seeds], [s["category"] for s in seeds])
+        if index.exemplars_path and os.path.exists(index.exemplars_path):
+            with open(index.exemplars_path, encoding='utf-8') as f:
+                saved = [json.loads(line) for line in f if line.strip()]
+            rows = len(index._state[2])
+            index.add([s["merchant"] for s in saved], [s["category"] for s in saved])
+            index.added = len(index._state[2]) - rows
+        return index
+
+    def _add_prototypes(self):
+        vectors = []
+        for category in self.categories:
+            phrases = self.encoder.encode(CATEGORY_PROTOTYPES.get(category, [category]))
+            mean = phrases.mean(axis=0)
+            vectors.append(mean / max(float(np.linalg.norm(mean)), 1e-12))
+        self._install(np.vstack(vectors), np.arange(len(self.categories)), [f"<{c}>" for c in self.categories])
+        self.prototypes = len(self.categories)
+
+    def add(self, merchants: Sequence[str], categories: Sequence[str], persist: bool = False) -> int:
+        """Add (or relabel) labeled merchants; returns how many rows changed"""
+        unknown = sorted(set(categories) - set(self.categories))
+        if unknown:
+            raise ValueError(f"unknown categories: {unknown}")
+        keys = [normalize_merchant_key(m) for m in merchants]
+        if not keys:
+            return 0
+        vectors = self.encoder.encode(keys)  # outside the lock, which only guards the swap
+        labels = [self.categories.index(c) for c in categories]
+        with self._lock:
+            # The last label given for a merchant wins, within the call and over the index
+            latest = {key: i for i, key in enumerate(keys)}
+            new_rows, relabel, changed = [], {}, []
+            for key, i in latest.items():
+                row = self._rows.get(key)
+                if row is None:
+                    new_rows.append(i)
+                elif self._state[1][row] != labels[i]:
+                    relabel[row] = labels[i]
+                else:
+                    continue
+                changed.append(i)
+            if len(self._state[2]) + len(new_rows) > self.max_rows:
+                raise ValueError(f"merchant index full ({self.max_rows} rows)")
+            if new_rows or relabel:
+                vectors_, labels_, texts_, _ = self._state
+                labels_ = labels_.copy()
+                for row, label in relabel.items():
+                    labels_[row] = label
+                self._install(np.vstack([vectors_, vectors[new_rows]]),
+                              np.concatenate([labels_, np.asarray([labels[i] for i in new_rows], dtype=np.int64)]),
+                              texts_ + [keys[i] for i in new_rows])
+            if persist:
+                # Merchants already in the index with the same label are not written again
+                if self.exemplars_path and changed:
+                    with open(self.exemplars_path, "a", encoding='utf-8') as f:
+                        for i in changed:
+                            f.write(json.dumps({"merchant": merchants[i], "category": categories[i]}) + "\n")
+                self.added += len(new_rows)
+        return len(changed)
+
+    def _install(self, vectors: np.ndarray, labels: np.ndarray, texts: List[str]):
+        """Publish new arrays, with rows grouped by category so each is one column slice"""
+        order = np.argsort(labels, kind="stable")
+        labels = labels[order]
+        texts = [texts[i] for i in order]
+        bounds = np.searchsorted(labels, np.arange(len(self.categories) + 1))
+        self._rows = {text: row for row, text in enumerate(texts)}
+        self._state = (np.ascontiguousarray(vectors[order], dtype=np.float32), labels, texts, bounds)
+
+    def classify(self, texts: Sequence[str]) -> List[Dict]:
+        """Categorization results (same shape as the zero-shot path) for a batch of texts"""
+        vectors, _, index_texts, bounds = self._state
+        queries = self.encoder.encode([normalize_merchant_key(t) for t in texts])
+        similarity = queries @ vectors.T  # (texts, rows)
+
+        # Best-matching row per category; categories without rows score -1
+        per_category = np.full((len(texts), len(self.categories)), -1.0, dtype=np.float32)
+        for c in range(len(self.categories)):
+            if bounds[c + 1] > bounds[c]:
+                per_category[:, c] = similarity[:, bounds[c]:bounds[c + 1]].max(axis=1)
+        logits = per_category / self.temperature
+        scores = np.exp(logits - logits.max(axis=1, keepdims=True))
+        scores /= scores.sum(axis=1, keepdims=True)
+        nearest = similarity.argmax(axis=1)
+
+        results = []
+        for i in range(len(texts)):
+            top = int(scores[i].argmax())
+            results.append({
+                "category": self.categories[top],
+                "confidence": round(float(scores[i, top]), 3),
+                "method": "Embedding",
+                "all_scores": {c: round(float(s), 4) for c, s in zip(self.categories, scores[i])},
+                "similarity": round(float(per_category[i, top]), 3),
+                "nearest": index_texts[int(nearest[i])]
+            })
+        return results
+
+    def stats(self) -> Dict:
+        vectors, _, _, bounds = self._state
+        return {
+            "encoder": self.encoder.name,
+            "dim": int(vectors.shape[1]),
+            "rows": int(len(vectors)),
+            "prototypes": self.prototypes,
+            "added": self.added,
+            "per_category": {c: int(bounds[i + 1] - bounds[i]) for i, c in enumerate(self.categories)},
+            "bytes": int(vectors.nbytes)
+        }
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+In-process metrics
+Latency histograms, counters and gauges rendered in the Prometheus text format, plus
+optional cProfile dumps of a sample of slow calls. Values are per process; under
+gunicorn each worker reports its own (labelled with its pid).
+"""
+
+import cProfile
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Histogram upper bounds in seconds: sub-millisecond model calls up to Prophet/LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class _Stage:
+    """Context manager timing one stage into <namespace>_stage_seconds"""
+
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe("stage_seconds", time.perf_counter() - self.started, stage=self.name)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+class SlowCallProfiler:
+    """Profiles a sample of calls and keeps the dumps of those slower than slow_s
+
+    Only one call is profiled at a time (cProfile instances cannot overlap in one
+    process), and only the top-level timed call on a thread is sampled.
+    """
+
+    def __init__(self, directory: str, sample_rate: float, slow_s: float, max_files: int = 50):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_s = slow_s
+        self.max_files = max_files
+        self._active = threading.Lock()
+        self.sampled = 0
+        self.written = 0
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if random.random() >= self.sample_rate or not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiler (e.g. a debugger) is active
+            self._active.release()
+            return None
+        self.sampled += 1
+        return profile
+
+    def finish(self, profile: cProfile.Profile, name: str, elapsed: float):
+        profile.disable()
+        self._active.release()
+        if elapsed < self.slow_s:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.directory, f"{name}-{stamp}-{int(elapsed * 1000)}ms-{os.getpid()}.prof")
+        profile.dump_stats(path)
+        self.written += 1
+        self._prune()
+
+    def _prune(self):
+        dumps = sorted((os.path.join(self.directory, f) for f in os.listdir(self.directory)
+                        if f.endswith(".prof")), key=os.path.getmtime)
+        for path in dumps[:max(0, len(dumps) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class Metrics:
+    """Thread-safe registry of labelled histograms, counters and gauge callbacks"""
+
+    def __init__(self, namespace: str = "ai", enabled: bool = True,
+                 profiler: Optional[SlowCallProfiler] = None):
+        self.namespace = namespace
+        self.enabled = enabled
+        self.profiler = profiler
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._gauges: List[Callable[[], Iterable[Tuple[str, Dict, float]]]] = []
+        self._local = threading.local()
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def stage(self, name: str):
+        """with metrics.stage("forest_predict"): ..."""
+        return _Stage(self, name) if self.enabled else _NO_STAGE
+
+    def fallback(self, kind: str, error=None, count: int = 1):
+        """Count a degraded answer; error is the exception (or a short reason string)"""
+        reason = error if isinstance(error, str) else type(error).__name__ if error is not None else "unavailable"
+        self.inc("fallbacks_total", count, fallback=kind, reason=reason)
+
+    def timed(self, name: Optional[str] = None):
+        """Decorator recording call latency and errors; samples slow calls into profiles"""
+        def decorate(fn):
+            method = name or fn.__name__
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                depth = getattr(self._local, "depth", 0)
+                profile = self.profiler.start() if self.profiler is not None and depth == 0 else None
+                self._local.depth = depth + 1
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    self.inc("method_errors_total", method=method)
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - started
+                    self._local.depth = depth
+                    self.observe("method_seconds", elapsed, method=method)
+                    if profile is not None:
+                        self.profiler.finish(profile, method, elapsed)
+            return wrapper
+        return decorate
+
+    def add_gauges(self, collect: Callable[[], Iterable[Tuple[str, Dict, float]]]):
+        """collect() returns (name, labels, value) triples at scrape time"""
+        self._gauges.append(collect)
+
+    def add_stats(self, component: str, stats: Callable[[], Dict]):
+        """Expose the numeric values of a component's stats() dict as gauges"""
+        def collect():
+            for key, value in (stats() or {}).items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    yield f"{component}_{key}", {}, value
+        self.add_gauges(collect)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        ns = self.namespace
+        pid = str(os.getpid())
+        lines = []
+        with self._lock:
+            histograms = {name: {k: (list(h.counts), h.total, h.count, h.buckets) for k, h in series.items()}
+                          for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        for name in sorted(histograms):
+            full = f"{ns}_{name}"
+            lines += self._header(full, name, "histogram")
+            for key, (counts, total, count, buckets) in sorted(histograms[name].items()):
+                labels = dict(key, pid=pid)
+                running = 0
+                for bound, n in zip(list(buckets) + ["+Inf"], counts):
+                    running += n
+                    lines.append(f"{full}_bucket{_labels(dict(labels, le=str(bound)))} {running}")
+                lines.append(f"{full}_sum{_labels(labels)} {total!r}")
+                lines.append(f"{full}_count{_labels(labels)} {count}")
+
+        for name in sorted(counters):
+            full = f"{ns}_{name}"
+            lines += self._header(full, name, "counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{full}{_labels(dict(key, pid=pid))} {_number(value)}")
+
+        gauges: Dict[str, List[str]] = {}
+        for collect in self._gauges:
+            try:
+                for name, labels, value in collect():
+                    gauges.setdefault(name, []).append(
+                        f"{ns}_{name}{_labels(dict(labels, pid=pid))} {_number(value)}")
+            except Exception as e:  # a broken collector must not break the scrape
+                print(f"Metrics collector failed: {e}")
+        for name in sorted(gauges):
+            lines += self._header(f"{ns}_{name}", name, "gauge")
+            lines += gauges[name]
+        return "\n".join(lines) + "\n"
+
+    def _header(self, full: str, name: str, kind: str) -> List[str]:
+        header = [f"# TYPE {full} {kind}"]
+        if name in self._help:
+            header.insert(0, f"# HELP {full} {self._help[name]}")
+        return header
+
+
+def _labels(labels: Dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _escape(value) -> str:
+    """Label value escaping of the text exposition format"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
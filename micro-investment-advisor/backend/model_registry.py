@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Lazy model registry for the AI service
+Heavy libraries and models are loaded on first use, one capability at a time
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+UNLOADED = "unloaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process in bytes, if the platform exposes it"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return None
+
+
+class _ModelEntry:
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.state = UNLOADED
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self.rss_delta_bytes = None
+
+
+class ModelRegistry:
+    """Named loaders that materialize on first access, guarded per model"""
+
+    def __init__(self):
+        self._entries: Dict[str, _ModelEntry] = {}
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register a loader; nothing is loaded until get() is called"""
+        self._entries[name] = _ModelEntry(name, loader)
+
+    def get(self, name: str) -> Any:
+        """Return the loaded model, loading it on first use (None if it failed)"""
+        entry = self._entries[name]
+        if entry.state == READY:
+            return entry.value
+        if entry.state == FAILED:
+            return None
+
+        with entry.lock:
+            # Another thread may have finished loading while we waited
+            if entry.state == READY:
+                return entry.value
+            if entry.state == FAILED:
+                return None
+
+            entry.state = LOADING
+            rss_before = current_rss_bytes()
+            started = time.perf_counter()
+            try:
+                value = entry.loader()
+            except Exception as e:
+                entry.error = str(e)
+                entry.state = FAILED
+                print(f"⚠️ Model '{name}' failed to load: {e}")
+                return None
+            finally:
+                entry.load_seconds = round(time.perf_counter() - started, 3)
+                rss_after = current_rss_bytes()
+                if rss_before is not None and rss_after is not None:
+                    entry.rss_delta_bytes = max(0, rss_after - rss_before)
+
+            entry.value = value
+            entry.state = READY
+            print(f"✅ Loaded model '{name}' in {entry.load_seconds}s")
+            return value
+
+    def state(self, name: str) -> str:
+        """Current load state without triggering a load"""
+        return self._entries[name].state
+
+    def is_ready(self, name: str) -> bool:
+        return self._entries[name].state == READY
+
+    def peek(self, name: str) -> Any:
+        """Return the model only if it is already loaded"""
+        entry = self._entries[name]
+        return entry.value if entry.state == READY else None
+
+    def warm_up(self, names: List[str], background: bool = True):
+        """Load the given models eagerly, optionally in a background thread"""
+        for name in names:
+            if name not in self._entries:
+                print(f"⚠️ Unknown model in warm-up list: {name}")
+        names = [n for n in names if n in self._entries]
+        if not names:
+            return None
+
+        def _load_all():
+            for name in names:
+                self.get(name)
+
+        if not background:
+            _load_all()
+            return None
+        thread = threading.Thread(target=_load_all, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> Dict[str, Dict]:
+        """Per-model state, load time and memory for health reporting"""
+        return {
+            name: {
+                "state": entry.state,
+                "load_seconds": entry.load_seconds,
+                "rss_delta_mb": (round(entry.rss_delta_bytes / 2**20, 1)
+                                 if entry.rss_delta_bytes is not None else None),
+                "error": entry.error
+            }
+            for name, entry in self._entries.items()
+        }
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Versioned model artifact store
+Forests are saved as flat NumPy arrays that are memory-mapped at load time, so every
+worker process shares the same pages. Each version has a manifest with SHA-256
+checksums, and a CURRENT pointer selects the served version; it is swapped atomically
+and picked up by running processes without a restart.
+
+Layout:
+    <root>/<name>/CURRENT                 version id of the served version
+    <root>/<name>/<version>/manifest.json
+    <root>/<name>/<version>/*.npy         flat tree arrays and scaler parameters
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+FLAT_FOREST_FORMAT = "flat-forest-v1"
+
+# Below this many rows all trees are walked together, above it one tree at a time
+# (fewer, larger array operations vs. better cache locality)
+PER_TREE_MIN_ROWS = 512
+
+# Rows per traversal chunk; bounds the temporary index arrays
+PREDICT_CHUNK_ROWS = 16384
+
+_ARRAYS = ("children", "feature", "threshold", "value", "roots", "depths",
+           "scaler_mean", "scaler_scale")
+
+
+class ModelStoreError(Exception):
+    """Missing, corrupt or incompatible model artifact"""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fsync_write(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _forest_trees(model) -> List[Dict[str, np.ndarray]]:
+    """Per-tree node arrays of a forest, or of a single DecisionTreeRegressor"""
+    trees = []
+    for estimator in getattr(model, "estimators_", [model]):
+        tree = estimator.tree_
+        if tree.n_outputs != 1:
+            raise ModelStoreError("only single-output regression forests are supported")
+        trees.append({"left": tree.children_left, "right": tree.children_right,
+                      "feature": tree.feature, "threshold": tree.threshold,
+                      "value": tree.value[:, 0, 0], "is_leaf": tree.children_left < 0,
+                      "depth": tree.max_depth})
+    return trees
+
+
+def _boosted_trees(model) -> List[Dict[str, np.ndarray]]:
+    """Per-tree node arrays of a HistGradientBoostingRegressor (numeric features only)"""
+    trees = []
+    for predictors in model._predictors:
+        nodes = predictors[0].nodes
+        if nodes["is_categorical"].any():
+            raise ModelStoreError("categorical splits are not supported")
+        trees.append({"left": nodes["left"].astype(np.int64), "right": nodes["right"].astype(np.int64),
+                      "feature": nodes["feature_idx"], "threshold": nodes["num_threshold"],
+                      "value": nodes["value"], "is_leaf": nodes["is_leaf"].astype(bool),
+                      "depth": int(nodes["depth"].max())})
+    return trees
+
+
+class FlatForest:
+    """Tree ensemble (with its input scaler) evaluated from flat node arrays
+
+    All trees share one node numbering. children[2 * node + go_left] is the next node;
+    leaves point at themselves with threshold +inf, so a walk of depths[t] steps from
+    roots[t] always ends on a leaf. Random forests average their trees (compared in
+    float32, like sklearn); gradient boosting adds them to a baseline (in float64).
+    Inputs must be finite: learned missing-value directions are not stored.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], manifest: Dict):
+        for key in _ARRAYS:
+            # Plain ndarray views of the memmaps: cheaper to index than np.memmap
+            setattr(self, key, np.asarray(arrays[key]))
+        self.manifest = manifest
+        self.version = manifest["version"]
+        # Manifests written before boosted models were supported are all forests
+        self.aggregate = manifest.get("aggregate", "mean")
+        self.baseline = float(manifest.get("baseline", 0.0))
+        self.compare_dtype = np.dtype(manifest.get("compare_dtype", "float32"))
+        self._unscaled = not np.any(self.scaler_mean) and np.all(self.scaler_scale == 1)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None) -> "FlatForest":
+        """Flatten a fitted tree, forest or HistGradientBoostingRegressor and its StandardScaler
+
+        Without a scaler the model must have been fitted on raw features.
+        """
+        boosted = hasattr(model, "_predictors")
+        trees = _boosted_trees(model) if boosted else _forest_trees(model)
+        offsets = np.cumsum([0] + [len(tree["value"]) for tree in trees])
+        n_nodes = int(offsets[-1])
+
+        children = np.empty((n_nodes, 2), dtype=np.int32)
+        feature = np.empty(n_nodes, dtype=np.int32)
+        threshold = np.empty(n_nodes, dtype=np.float64)
+        value = np.empty(n_nodes, dtype=np.float64)
+        for tree, offset in zip(trees, offsets[:-1]):
+            ids = np.arange(offset, offset + len(tree["value"]), dtype=np.int32)
+            leaf = tree["is_leaf"]
+            children[ids, 0] = np.where(leaf, ids, tree["right"] + offset)
+            children[ids, 1] = np.where(leaf, ids, tree["left"] + offset)
+            feature[ids] = np.where(leaf, 0, tree["feature"])
+            threshold[ids] = np.where(leaf, np.inf, tree["threshold"])
+            value[ids] = tree["value"]
+
+        arrays = {
+            "children": children.ravel(),
+            "feature": feature,
+            "threshold": threshold,
+            "value": value,
+            "roots": offsets[:-1].astype(np.int32),
+            "depths": np.array([tree["depth"] for tree in trees], dtype=np.int32),
+            "scaler_mean": (np.asarray(scaler.mean_, dtype=np.float64) if scaler is not None
+                            else np.zeros(model.n_features_in_)),
+            "scaler_scale": (np.asarray(scaler.scale_, dtype=np.float64) if scaler is not None
+                             else np.ones(model.n_features_in_)),
+        }
+        manifest = {"version": None, "n_features": int(model.n_features_in_),
+                    "n_trees": len(trees), "n_nodes": n_nodes,
+                    "aggregate": "sum" if boosted else "mean",
+                    "baseline": float(np.ravel(model._baseline_prediction)[0]) if boosted else 0.0,
+                    "compare_dtype": "float64" if boosted else "float32"}
+        return cls(arrays, manifest)
+
+    @property
+    def n_features(self) -> int:
+        return int(self.scaler_mean.shape[0])
+
+    def predict(self, features: np.ndarray, n_jobs: int = 1) -> np.ndarray:
+        """Ensemble prediction for raw (unscaled) feature rows
+
+        With n_jobs > 1, row chunks are walked on up to n_jobs threads (the array
+        operations release the GIL); each thread gets at least PER_TREE_MIN_ROWS rows.
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ValueError(f"expected (n, {self.n_features}) features, got {features.shape}")
+        # Scale in float64, then compare in the dtype sklearn's tree code uses
+        scaled = ((features - self.scaler_mean) / self.scaler_scale).astype(self.compare_dtype)
+        n_jobs = max(1, min(n_jobs, len(scaled) // PER_TREE_MIN_ROWS))
+        size = max(1, min(PREDICT_CHUNK_ROWS, -(-len(scaled) // n_jobs)))
+
+        def walk(start: int) -> np.ndarray:
+            chunk = scaled[start:start + size]
+            if len(chunk) >= PER_TREE_MIN_ROWS:
+                return self._walk_per_tree(chunk)
+            return self._walk_all_trees(chunk)
+
+        starts = range(0, len(scaled), size)
+        if n_jobs > 1:
+            with ThreadPoolExecutor(max_workers=n_jobs, thread_name_prefix="forest-predict") as pool:
+                parts = list(pool.map(walk, starts))
+        else:
+            parts = [walk(start) for start in starts]
+        out = np.concatenate(parts) if parts else np.empty(0)
+        if self.aggregate == "mean":
+            return out / len(self.roots)
+        return out + self.baseline
+
+    def predict_one(self, row) -> float:
+        """Single-row prediction walked in plain Python; fastest for one or a few trees"""
+        x = np.asarray(row, dtype=np.float64)
+        if not self._unscaled:
+            x = (x - self.scaler_mean) / self.scaler_scale
+        # Python floats compare exactly like the promoted numpy comparison in predict()
+        x = x.astype(self.compare_dtype).tolist()
+        children, feature, threshold = self.children, self.feature, self.threshold
+        total = 0.0
+        for root, depth in zip(self.roots.tolist(), self.depths.tolist()):
+            node = root
+            for _ in range(depth):
+                node = children[2 * node + (x[feature[node]] <= threshold[node])]
+            total += self.value[node]
+        total = float(total)
+        return total / len(self.roots) if self.aggregate == "mean" else total + self.baseline
+
+    def _walk_all_trees(self, x: np.ndarray) -> np.ndarray:
+        n, n_trees = len(x), len(self.roots)
+        node = np.tile(self.roots, n)
+        x_index = np.repeat(np.arange(n, dtype=np.int64) * x.shape[1], n_trees)
+        x_flat = x.ravel()
+        for _ in range(int(self.depths.max(initial=0))):
+            go_left = np.take(x_flat, x_index + np.take(self.feature, node)) <= np.take(self.threshold, node)
+            node = np.take(self.children, node * 2 + go_left)
+        return np.take(self.value, node).reshape(n, n_trees).sum(axis=1)
+
+    def _walk_per_tree(self, x: np.ndarray) -> np.ndarray:
+        n = len(x)
+        # Column-major, so feature f of every row is the contiguous block f * n
+        x_cols = np.ascontiguousarray(x.T).ravel()
+        rows = np.arange(n, dtype=np.int64)
+        total = np.zeros(n)
+        for root, depth in zip(self.roots.tolist(), self.depths.tolist()):
+            node = np.full(n, root, dtype=np.int64)
+            for _ in range(depth):
+                go_left = np.take(x_cols, np.take(self.feature, node) * n + rows) <= np.take(self.threshold, node)
+                node = np.take(self.children, node * 2 + go_left)
+            total += np.take(self.value, node)
+        return total
+
+
+class ModelStore:
+    """Directory of versioned model artifacts with a CURRENT pointer per model name"""
+
+    def __init__(self, root: str = DEFAULT_MODEL_DIR):
+        self.root = root
+
+    def _model_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def versions(self, name: str) -> List[str]:
+        """Published versions, oldest first"""
+        path = self._model_dir(name)
+        if not os.path.isdir(path):
+            return []
+        return sorted(v for v in os.listdir(path)
+                      if not v.startswith(".") and os.path.isfile(os.path.join(path, v, "manifest.json")))
+
+    def current_version(self, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self._model_dir(name), "CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, name: str, version: str) -> Dict:
+        path = os.path.join(self._model_dir(name), version, "manifest.json")
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise ModelStoreError(f"{name}/{version}: unreadable manifest: {e}")
+
+    def save_forest(self, name: str, forest: FlatForest, metadata: Optional[Dict] = None,
+                    promote: bool = False) -> str:
+        """Publish a new version (written to a temp dir, then renamed into place)"""
+        model_dir = self._model_dir(name)
+        os.makedirs(model_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=model_dir)
+        try:
+            os.chmod(tmp, 0o755)
+            files = {}
+            for key in _ARRAYS:
+                filename = f"{key}.npy"
+                np.save(os.path.join(tmp, filename), np.ascontiguousarray(getattr(forest, key)))
+                files[filename] = _sha256(os.path.join(tmp, filename))
+            content_hash = hashlib.sha256("".join(files[f] for f in sorted(files)).encode()).hexdigest()
+            version = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{content_hash[:8]}"
+            manifest = dict(forest.manifest, **(metadata or {}))
+            manifest.update(version=version, name=name, format=FLAT_FOREST_FORMAT,
+                            created_at=datetime.now(timezone.utc).isoformat(), files=files)
+            _fsync_write(os.path.join(tmp, "manifest.json"), json.dumps(manifest, indent=2).encode())
+            os.rename(tmp, os.path.join(model_dir, version))
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        if promote:
+            self.promote(name, version)
+        return version
+
+    def promote(self, name: str, version: str):
+        """Atomically point CURRENT at version (after verifying it)"""
+        self.verify(name, version)
+        pointer = os.path.join(self._model_dir(name), "CURRENT")
+        tmp = f"{pointer}.{os.getpid()}.tmp"
+        _fsync_write(tmp, f"{version}\n".encode())
+        os.replace(tmp, pointer)
+
+    def verify(self, name: str, version: str) -> Dict:
+        """Check every file against the manifest checksums; returns the manifest"""
+        manifest = self.manifest(name, version)
+        if manifest.get("format") != FLAT_FOREST_FORMAT:
+            raise ModelStoreError(f"{name}/{version}: unsupported format {manifest.get('format')}")
+        version_dir = os.path.join(self._model_dir(name), version)
+        for filename, expected in manifest["files"].items():
+            path = os.path.join(version_dir, filename)
+            if not os.path.isfile(path) or _sha256(path) != expected:
+                raise ModelStoreError(f"{name}/{version}: checksum mismatch for {filename}")
+        return manifest
+
+    def load_forest(self, name: str, version: Optional[str] = None, verify: bool = True) -> FlatForest:
+        """Memory-map a version (default: CURRENT) as a FlatForest"""
+        version = version or self.current_version(name)
+        if version is None:
+            raise ModelStoreError(f"{name}: no current version, run train_models.py")
+        manifest = self.verify(name, version) if verify else self.manifest(name, version)
+        version_dir = os.path.join(self._model_dir(name), version)
+        arrays = {key: np.load(os.path.join(version_dir, f"{key}.npy"), mmap_mode="r") for key in _ARRAYS}
+        return FlatForest(arrays, manifest)
+
+
+class LiveModel:
+    """The CURRENT version of a stored forest, swapped in when the pointer changes
+
+    get() re-reads the pointer at most every poll_s seconds; a new version is loaded
+    and verified before it replaces the old one, so requests never see a partial model.
+    """
+
+    def __init__(self, store: ModelStore, name: str, poll_s: float = 30.0):
+        self.store = store
+        self.name = name
+        self.poll_s = poll_s
+        self._model: Optional[FlatForest] = None
+        self._checked: Optional[float] = None
+        self._lock = threading.Lock()
+        self.swaps = 0
+        self.last_error: Optional[str] = None
+
+    def get(self) -> Optional[FlatForest]:
+        if self._checked is None or time.monotonic() - self._checked >= self.poll_s:
+            self.refresh()
+        return self._model
+
+    def refresh(self):
+        """Load the CURRENT version if it differs from the one being served"""
+        if not self._lock.acquire(blocking=False):
+            return  # another thread is already checking
+        try:
+            self._checked = time.monotonic()
+            version = self.store.current_version(self.name)
+            if version is None or (self._model is not None and self._model.version == version):
+                return
+            try:
+                model = self.store.load_forest(self.name, version)
+            except ModelStoreError as e:
+                # Keep serving the previous version
+                self.last_error = str(e)
+                print(f"⚠️ Could not load {self.name} {version}: {e}")
+                return
+            self._model = model
+            self.swaps += 1
+            self.last_error = None
+            print(f"✅ Serving {self.name} version {version}")
+        finally:
+            self._lock.release()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._model.version if self._model is not None else None
+
+    def status(self) -> Dict:
+        return {"version": self.version, "swaps": self.swaps, "last_error": self.last_error}
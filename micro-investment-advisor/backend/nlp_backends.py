@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Inference backends for the Hugging Face text-classification pipelines
+
+    pytorch      fp32 PyTorch, the transformers default
+    torch_int8   PyTorch with the Linear layers dynamically quantized to int8
+    onnx         ONNX Runtime on an int8-quantized export made ahead of time:
+                 python nlp_backends.py export facebook/bart-large-mnli
+
+Exports are made offline and never while serving. A backend that cannot load (missing
+packages, no export yet) falls back to the plain PyTorch pipeline with a warning. The
+pipeline returned records the backend it actually runs on as .inference_backend.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sys
+
+BACKENDS = ("pytorch", "torch_int8", "onnx")
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "onnx")
+
+# File names written by optimum's exporter and quantizer
+ONNX_FILE = "model.onnx"
+QUANTIZED_FILE = "model_quantized.onnx"
+
+# Instruction sets optimum has dynamic-quantization presets for
+QUANTIZATION_ISAS = ("avx2", "avx512", "avx512_vnni", "arm64")
+
+
+class BackendUnavailable(Exception):
+    """The requested backend cannot serve this model"""
+
+
+def export_dir(onnx_dir: str, model: str) -> str:
+    """Per-model export directory, e.g. models/onnx/facebook--bart-large-mnli"""
+    return os.path.join(onnx_dir, re.sub(r"[^A-Za-z0-9_.-]+", "--", model))
+
+
+def configure_threads(threads: int):
+    """Intra-op threads for PyTorch (0 keeps its default of one per core)"""
+    if threads <= 0:
+        return
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def _load_torch_int8(task: str, model: str, threads: int, onnx_dir: str):
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+    fp32 = AutoModelForSequenceClassification.from_pretrained(model)
+    fp32.eval()
+    # Weights stored as int8, activations quantized on the fly: no calibration data needed
+    int8 = torch.quantization.quantize_dynamic(fp32, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline(task, model=int8, tokenizer=AutoTokenizer.from_pretrained(model))
+
+
+def _load_onnx(task: str, model: str, threads: int, onnx_dir: str):
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer, pipeline
+
+    path = export_dir(onnx_dir, model)
+    file_name = next((f for f in (QUANTIZED_FILE, ONNX_FILE) if os.path.exists(os.path.join(path, f))), None)
+    if file_name is None:
+        raise BackendUnavailable(f"no ONNX export of {model} in {path} "
+                                 f"(run: python nlp_backends.py export {model})")
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    # Request threads already run calls concurrently; one graph at a time per call
+    options.inter_op_num_threads = 1
+    ort_model = ORTModelForSequenceClassification.from_pretrained(
+        path, file_name=file_name, session_options=options, provider="CPUExecutionProvider"
+    )
+    return pipeline(task, model=ort_model, tokenizer=AutoTokenizer.from_pretrained(path))
+
+
+_LOADERS = {"torch_int8": _load_torch_int8, "onnx": _load_onnx}
+
+
+def load_pipeline(task: str, model: str, backend: str = "pytorch", threads: int = 0,
+                  onnx_dir: str = DEFAULT_ONNX_DIR):
+    """A transformers pipeline on the requested backend, or on PyTorch if that fails"""
+    configure_threads(threads)
+    if backend not in BACKENDS:
+        print(f"⚠️ Unknown NLP backend '{backend}', using pytorch")
+    elif backend != "pytorch":
+        try:
+            pipe = _LOADERS[backend](task, model, threads, onnx_dir)
+            pipe.inference_backend = backend
+            return pipe
+        except Exception as e:
+            print(f"⚠️ {backend} backend unavailable for {model}, using pytorch: {e}")
+
+    from transformers import pipeline
+    pipe = pipeline(task, model=model)
+    pipe.inference_backend = "pytorch"
+    return pipe
+
+
+def export_onnx(model: str, onnx_dir: str = DEFAULT_ONNX_DIR, quantize: bool = True,
+                isa: str = "avx2") -> str:
+    """Export a sequence-classification model to ONNX (int8 unless quantize=False)
+
+    Written to a temporary directory and renamed into place, so a loader never sees a
+    half-written export.
+    """
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    path = export_dir(onnx_dir, model)
+    staging = path + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    ort_model = ORTModelForSequenceClassification.from_pretrained(model, export=True)
+    ort_model.save_pretrained(staging)
+    AutoTokenizer.from_pretrained(model).save_pretrained(staging)
+    if quantize:
+        config = getattr(AutoQuantizationConfig, isa)(is_static=False, per_channel=False)
+        ORTQuantizer.from_pretrained(staging, file_name=ONNX_FILE).quantize(
+            save_dir=staging, quantization_config=config
+        )
+        # Serving only needs the quantized graph
+        os.remove(os.path.join(staging, ONNX_FILE))
+
+    old = path + ".old"
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(staging, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--onnx-dir", default=os.getenv("AI_ONNX_DIR", DEFAULT_ONNX_DIR))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="export (and quantize) a model for the onnx backend")
+    export.add_argument("models", nargs="+", help="Hugging Face model ids or local paths")
+    export.add_argument("--no-quantize", action="store_true", help="keep fp32 weights")
+    export.add_argument("--isa", default="avx2", choices=QUANTIZATION_ISAS,
+                        help="instruction set to tune int8 kernels for")
+
+    commands.add_parser("list", help="list exported models")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        if not os.path.isdir(args.onnx_dir):
+            print(f"No exports in {args.onnx_dir}")
+            return
+        for name in sorted(os.listdir(args.onnx_dir)):
+            files = [f for f in (QUANTIZED_FILE, ONNX_FILE) if os.path.exists(os.path.join(args.onnx_dir, name, f))]
+            if files:
+                size = os.path.getsize(os.path.join(args.onnx_dir, name, files[0]))
+                print(f"{name:<50} {files[0]:<22} {size / 2**20:8.1f} MB")
+        return
+
+    for model in args.models:
+        try:
+            path = export_onnx(model, args.onnx_dir, quantize=not args.no_quantize, isa=args.isa)
+        except ImportError as e:
+            sys.exit(f"❌ Export needs optimum[onnxruntime] (pip install -r requirements.txt): {e}")
+        print(f"✅ Exported {model} to {path}" + ("" if args.no_quantize else f" (int8, {args.isa})"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+User profile buckets
+Income and savings-rate bands shared by the tip cache keys and cohort analytics
+"""
+
+import bisect
+from typing import List, Optional, Tuple
+
+# Lower bounds of the buckets; the last bucket is open-ended
+INCOME_BUCKETS = [0, 10000, 15000, 20000, 25000, 35000, 50000, 75000, 100000]
+SAVINGS_RATE_BUCKETS = [0, 5, 10, 15, 20, 30]
+
+
+def bucket(value, edges: List[int]) -> int:
+    """Lower bound of the bucket value falls in; unreadable values count as 0"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        value = 0.0
+    return edges[max(0, bisect.bisect_right(edges, value) - 1)]
+
+
+def bucket_range(lower: int, edges: List[int]) -> Tuple[int, Optional[int]]:
+    """(lower, upper) of the bucket starting at lower; upper is None for the last one"""
+    i = edges.index(lower)
+    return lower, edges[i + 1] if i + 1 < len(edges) else None
@@ -612,11 +612,35 @@ app.post('/ai/categorize-merchant', async (req, res) => {
   }
 });
 
+// AI-powered bulk merchant categorization (e.g. bank statement import)
+app.post('/ai/categorize-merchants', async (req, res) => {
+  try {
+    const { merchants } = req.body;
+    
+    const aiResponse = await axios.post(`${AI_SERVICE_URL}/ai/categorize-merchants`, {
+      merchants: merchants || []
+    });
+    
+    res.json({
+      success: true,
+      categorizations: aiResponse.data.categorizations
+    });
+  } catch (error) {
+    res.status(502).json({ success: false, error: error.message });
+  }
+});
+
 // AI-powered spending pattern analysis
 app.post('/ai/analyze-patterns', async (req, res) => {
   try {
     const aiResponse = await axios.post(`${AI_SERVICE_URL}/ai/analyze-patterns`, {
-      transactions: transactions
+      transactions: transactions,
+      // Ranks spending against households of the same tier, family size and income
+      user_profile: {
+        income: userData.income || 25000,
+        family_size: userData.family_size || 3,
+        location_tier: userData.location_tier || 2
+      }
     });
     
     res.json({
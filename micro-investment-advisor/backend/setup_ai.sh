@@ -31,8 +31,9 @@ pip install -r requirements.txt
 echo "📥 Downloading spaCy English model..."
 python -m spacy download en_core_web_sm
 
-# Create models directory
-mkdir -p models
+# Train and publish the savings model (the service only loads published versions)
+echo "📊 Training savings model..."
+python train_models.py train --promote
 
 echo "✅ AI/ML setup complete!"
 echo ""
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Incremental spending aggregates
+Per-user running sums that are updated with new transactions only
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from columnar_patterns import PatternAccumulator, TransactionColumns, iter_transaction_columns, to_utc_ns
+from transaction_stream import InvalidTransaction
+
+
+class SpendingAggregates:
+    """Running per-weekday, per-hour and per-category expense sums for one user"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.accumulator = PatternAccumulator()
+
+    def update(self, transactions: List[Dict], since=None) -> int:
+        """Fold transactions into the running sums; returns how many were applied
+
+        Raises InvalidTransaction for a transaction (or since) that does not parse.
+        """
+        if not transactions:
+            return 0
+        try:
+            return self.update_columns(iter_transaction_columns(transactions), since=since)
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            raise InvalidTransaction(f"invalid transaction ({e!r})") from e
+
+    def update_columns(self, chunks: Iterable[TransactionColumns], since=None) -> int:
+        """Fold already-parsed column chunks into the running sums
+
+        The chunks go into a copy that replaces the sums only once all of them were
+        folded, so an error part-way through (e.g. a bad date in a later chunk) leaves
+        the sums unchanged.
+        """
+        since_ns = to_utc_ns(since) if since is not None else None
+        accumulator = copy.deepcopy(self.accumulator)
+        applied = 0
+        for cols in chunks:
+            if since_ns is not None:
+                cols = cols.select(cols.utc_ns > since_ns)
+            accumulator.update(cols)
+            applied += len(cols)
+        self.accumulator = accumulator
+        return applied
+
+    def patterns(self) -> Optional[Dict]:
+        """Same patterns as AIService.analyze_spending_patterns, or None before any data"""
+        if not self.accumulator.transaction_count:
+            return None
+        return self.accumulator.patterns()
+
+    def totals(self) -> Dict:
+        """Inputs for AIService._recommendations_from_totals"""
+        return self.accumulator.totals()
+
+    def summary(self) -> Dict:
+        last_utc_ns = self.accumulator.last_utc_ns
+        return {
+            "transaction_count": self.accumulator.transaction_count,
+            "expense_count": self.accumulator.expense_count,
+            "last_transaction_date": (pd.Timestamp(last_utc_ns, unit='ns', tz='UTC').isoformat()
+                                      if last_utc_ns is not None else None)
+        }
+
+
+class AggregateStore:
+    """Thread-safe map of user_id to SpendingAggregates with LRU eviction"""
+
+    def __init__(self, max_users: int = 100000):
+        self.max_users = max_users
+        self._users: "OrderedDict[str, SpendingAggregates]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def apply(self, user_id: str, transactions: List[Dict], since=None, rebuild: bool = False):
+        """Update (or rebuild) a user's aggregates; returns (aggregates, applied count)
+
+        On InvalidTransaction the stored aggregates are left as they were.
+        """
+        with self._lock:
+            aggregates = None if rebuild else self._users.get(user_id)
+            if aggregates is not None:
+                self._users.move_to_end(user_id)
+        if aggregates is None:
+            # Built aside and stored only once every transaction parsed
+            aggregates = SpendingAggregates()
+            applied = aggregates.update(transactions, since=since)
+            self._store(user_id, aggregates)
+            return aggregates, applied
+
+        # Parsing happens outside the store lock so other users are not blocked
+        with aggregates.lock:
+            applied = aggregates.update(transactions, since=since)
+        return aggregates, applied
+
+    def apply_stream(self, user_id: str, chunks: Iterable[TransactionColumns], since=None,
+                     rebuild: bool = False):
+        """Like apply() for streamed chunks, applied to a copy of the user's aggregates
+
+        The copy replaces the stored aggregates only once the whole stream has been read,
+        so a rejected or broken upload changes nothing. Updates for the same user made
+        while the stream was being read are replaced.
+        """
+        with self._lock:
+            current = None if rebuild else self._users.get(user_id)
+        updated = SpendingAggregates()
+        if current is not None:
+            with current.lock:
+                updated.accumulator = copy.deepcopy(current.accumulator)
+        applied = updated.update_columns(chunks, since=since)
+        self._store(user_id, updated)
+        return updated, applied
+
+    def _store(self, user_id: str, aggregates: SpendingAggregates):
+        with self._lock:
+            self._users[user_id] = aggregates
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def get(self, user_id: str) -> Optional[SpendingAggregates]:
+        with self._lock:
+            return self._users.get(user_id)
+
+    def __len__(self):
+        return len(self._users)
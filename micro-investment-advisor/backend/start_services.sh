@@ -16,7 +16,16 @@ echo "🤖 Starting AI/ML Service on port 5000..."
 if check_port 5000; then
     echo "⚠️ Port 5000 already in use"
 else
-    source ai_env/bin/activate && python ai_service.py &
+    # Publish a savings model on first run; the service itself never trains
+    if [ ! -f "${AI_MODEL_DIR:-models}/savings_predictor/CURRENT" ]; then
+        (source ai_env/bin/activate && python train_models.py train --promote)
+    fi
+    # AI_SERVER=gunicorn runs the production multi-worker server
+    if [ "$AI_SERVER" = "gunicorn" ]; then
+        source ai_env/bin/activate && gunicorn -c gunicorn_conf.py ai_service:app &
+    else
+        source ai_env/bin/activate && python ai_service.py &
+    fi
     AI_PID=$!
     echo "✅ AI service started (PID: $AI_PID)"
 fi
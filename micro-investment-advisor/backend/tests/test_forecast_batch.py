@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+/ai/forecast-goal/batch: a malformed job gets a fallback line instead of ending the stream
+"""
+
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import app  # noqa: E402
+
+
+def daily_transactions(days: int = 40):
+    start = date(2024, 1, 1)
+    return [{"date": (start + timedelta(days=d)).isoformat(), "amount": -100.0 - d} for d in range(days)]
+
+
+def test_malformed_job_does_not_cut_the_stream():
+    good = daily_transactions()
+    jobs = [
+        {"user_id": "good-smoothing", "method": "exponential_smoothing", "transactions": good},
+        {"user_id": "bad-date", "method": "exponential_smoothing",
+         "transactions": [{"date": "not a date", "amount": -5.0}] + good},
+        {"user_id": "no-amount", "method": "simple", "transactions": [{"date": "2024-01-01"}] + good},
+        {"user_id": "good-simple", "method": "simple", "transactions": good},
+    ]
+    response = app.test_client().post('/ai/forecast-goal/batch', json={"jobs": jobs})
+    assert response.status_code == 200
+
+    lines = {line["user_id"]: line for line in map(json.loads, response.get_data(as_text=True).splitlines())}
+    assert set(lines) == {job["user_id"] for job in jobs}
+    assert lines["good-smoothing"]["method"] == "ExponentialSmoothing"
+    assert "fallback_reason" not in lines["good-smoothing"]
+    assert lines["good-simple"]["method"] == "Simple"
+    assert "fallback_reason" not in lines["good-simple"]
+    for user_id in ("bad-date", "no-amount"):
+        assert lines[user_id]["method"] == "Simple"
+        assert lines[user_id]["fallback_reason"] == "invalid_transactions"
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+The shipped keyword dictionary returns what the original hard-coded rules returned
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyword_matcher import KeywordMatcher  # noqa: E402
+
+
+def original_rules(merchant_name: str):
+    """(category, confidence) from the if/elif keyword scans the dictionary replaced"""
+    merchant_lower = merchant_name.lower()
+    if any(word in merchant_lower for word in ['bazaar', 'kirana', 'grocery', 'medical', 'pharmacy', 'gas', 'petrol', 'electricity', 'water', 'milk', 'dairy']):
+        return "Essential", 0.8
+    elif any(word in merchant_lower for word in ['swiggy', 'zomato', 'restaurant', 'movie', 'shopping', 'amazon', 'flipkart', 'myntra', 'entertainment']):
+        return "Discretionary", 0.8
+    elif any(word in merchant_lower for word in ['emi', 'loan', 'credit', 'bank', 'lic', 'insurance', 'premium']):
+        return "Debt", 0.8
+    elif any(word in merchant_lower for word in ['salary', 'freelance', 'payment', 'income', 'credit']):
+        return "Income", 0.8
+    return "Essential", 0.5
+
+
+MERCHANTS = [
+    "HDFC Bank", "Indane Gas", "Vegas Casino", "Public Library", "LIC Premium", "Bank Payment",
+    "Credit Card Payment", "Salary Credit", "Freelance Payment", "Amazon Pay Loan EMI",
+    "Big Bazaar", "Swiggy Instamart Grocery", "Zomato", "Netflix", "Home Loan EMI",
+    "Water Bill Payment", "Movie Tickets", "Income Tax Refund", "Apollo Pharmacy", "",
+]
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return KeywordMatcher.from_file()
+
+
+@pytest.mark.parametrize("merchant", MERCHANTS)
+def test_matches_original_rules(matcher, merchant):
+    result = matcher.categorize(merchant)
+    assert (result["category"], result["confidence"]) == original_rules(merchant)
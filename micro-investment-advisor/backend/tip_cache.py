@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+LLM tip cache
+Generated tips per (language, income bucket, savings-rate bucket) with a TTL, refreshed by
+a background worker so requests do not wait on the LLM, with coalesced and rate-limited
+upstream calls
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from profile_buckets import INCOME_BUCKETS, SAVINGS_RATE_BUCKETS, bucket
+
+TipKey = Tuple[str, Optional[int], Optional[int]]
+
+
+def tip_key(language: str, income=None, savings_rate=None) -> TipKey:
+    """Cache key; income and savings rate are reduced to their bucket's lower bound,
+    both are None for requests without a user context"""
+    if income is None and savings_rate is None:
+        return (language, None, None)
+    return (language, bucket(income, INCOME_BUCKETS), bucket(savings_rate, SAVINGS_RATE_BUCKETS))
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: rate tokens per second, bursts of up to capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill_locked()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a token; False if none became available within timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill_locked()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else 1.0
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class TipCache:
+    """TTL cache of generated tips with stale-while-revalidate and background refresh workers
+
+    get() never calls the LLM itself. An entry past refresh_ratio of its TTL is still
+    served while a refresh is scheduled; a miss or an expired entry schedules one and
+    returns None. Concurrent misses for one key share one refresh and can wait up to
+    wait_s for it.
+    """
+
+    def __init__(self, generate: Callable[[TipKey], List[Dict]], ttl_s: float = 21600,
+                 max_entries: int = 1000, limiter: Optional[TokenBucket] = None,
+                 refresh_ratio: float = 0.8, popular_keys: int = 20, workers: int = 2,
+                 name: str = "tip-refresh"):
+        self.generate = generate
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.limiter = limiter
+        self.refresh_ratio = refresh_ratio
+        self.popular_keys = popular_keys
+        self.workers = max(1, workers)
+        self.name = name
+        # How often the worker looks for popular entries that are due a refresh
+        self.check_interval_s = max(1.0, min(60.0, ttl_s * (1 - refresh_ratio) / 2))
+        self._entries: "OrderedDict[TipKey, Tuple[List[Dict], float]]" = OrderedDict()
+        self._requests: Dict[TipKey, int] = {}
+        self._pending: Dict[TipKey, Future] = {}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    def get(self, key: TipKey, wait_s: float = 0.0) -> Optional[List[Dict]]:
+        """Cached tips for key, or None; schedules a refresh when missing or ageing"""
+        now = time.monotonic()
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] >= self.ttl_s:
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if now - entry[1] < self.ttl_s * self.refresh_ratio:
+                    self.hits += 1
+                    return entry[0]
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+            future = self._schedule_locked(key)
+
+        if entry is not None:
+            # Ageing entries are served until the refresh replaces them
+            return entry[0]
+        if wait_s > 0:
+            try:
+                return future.result(timeout=wait_s)
+            except Exception:
+                return None
+        return None
+
+    def prewarm(self, keys: List[TipKey]):
+        """Queue generation for keys that are not cached yet"""
+        with self._lock:
+            for key in keys:
+                if key not in self._entries:
+                    self._requests.setdefault(key, 0)
+                    self._schedule_locked(key)
+
+    def fill(self, keys: List[TipKey], timeout_s: float) -> int:
+        """Generate the missing keys before returning; returns how many were filled
+
+        For a pre-fork server's master: the generating threads finish within the call, so
+        workers forked afterwards inherit the entries instead of each generating them.
+        Keys that get no rate-limit token within timeout_s are left for on-demand refresh.
+        """
+        deadline = time.monotonic() + timeout_s
+        with self._lock:
+            missing = [key for key in keys if key not in self._entries]
+            for key in missing:
+                self._requests.setdefault(key, 0)
+        if not missing:
+            return 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-fill") as pool:
+            filled = list(pool.map(lambda key: self._generate(key, max(0.0, deadline - time.monotonic())),
+                                   missing))
+        return sum(1 for tips in filled if tips)
+
+    def _schedule_locked(self, key: TipKey) -> Future:
+        # One pending refresh per key: concurrent misses coalesce onto it
+        self._ensure_worker()
+        future = self._pending.get(key)
+        if future is None:
+            future = Future()
+            self._pending[key] = future
+            self._queue.put(key)
+        return future
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so pre-forked workers start their own
+        if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+            return
+        if self._pid != os.getpid():
+            self._queue = queue.Queue()
+            for key in self._pending:
+                self._queue.put(key)
+            self._threads = []
+        self._pid = os.getpid()
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            try:
+                key = self._queue.get(timeout=self.check_interval_s)
+            except queue.Empty:
+                self._schedule_popular()
+                continue
+            self._refresh(key)
+            if self._queue.empty():
+                self._schedule_popular()
+
+    def _schedule_popular(self):
+        """Refresh the most requested keys before they go stale"""
+        now = time.monotonic()
+        with self._lock:
+            popular = sorted(self._requests, key=self._requests.get, reverse=True)[:self.popular_keys]
+            for key in popular:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[1] >= self.ttl_s * self.refresh_ratio:
+                    self._schedule_locked(key)
+
+    def _refresh(self, key: TipKey):
+        with self._lock:
+            future = self._pending.get(key)
+        tips = self._generate(key, timeout_s=self.ttl_s)
+        with self._lock:
+            self._pending.pop(key, None)
+        if future is not None:
+            future.set_result(tips)
+
+    def _generate(self, key: TipKey, timeout_s: float) -> Optional[List[Dict]]:
+        """One rate-limited upstream call, stored on success"""
+        tips = None
+        try:
+            if self.limiter is None or self.limiter.acquire(timeout=timeout_s):
+                with self._lock:
+                    self.upstream_calls += 1
+                tips = self.generate(key)
+        except Exception as e:
+            with self._lock:
+                self.upstream_errors += 1
+            print(f"Tip generation for {key} failed: {e}")
+        if tips:
+            with self._lock:
+                self._entries[key] = (tips, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._requests.pop(evicted, None)
+        return tips
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "pending": len(self._pending),
+                "upstream_calls": self.upstream_calls,
+                "upstream_errors": self.upstream_errors
+            }
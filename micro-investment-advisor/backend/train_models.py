@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Offline training and model store management
+The AI service only loads published versions; it never trains.
+
+Usage:
+    python train_models.py train --promote
+    python train_models.py import-pickle --model old/savings_predictor.pkl --scaler old/scaler.pkl --promote
+    python train_models.py list
+    python train_models.py promote 20240101T000000Z-1a2b3c4d
+    python train_models.py verify
+    python train_models.py distill --promote
+
+--model-dir (default AI_MODEL_DIR, or models/ next to this file) selects the store.
+"""
+
+import argparse
+import os
+import pickle
+import sys
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+from model_store import DEFAULT_MODEL_DIR, FlatForest, ModelStore, ModelStoreError
+
+SAVINGS_MODEL = "savings_predictor"
+COMPACT_MODEL = "savings_compact"
+
+# Distilled model must give a rounded amount within ±1 rupee of its forest on at least
+# this share of held-out rows
+COMPACT_MIN_WITHIN_1 = 0.95
+
+# Feature order shared with AIService (SAVINGS_FEATURES)
+FEATURE_NAMES = ["income", "rent", "emi", "age", "family_size", "location_tier"]
+
+
+def synthetic_savings_data(n_samples: int = 1000, seed: int = 42):
+    """Synthetic training data based on Indian spending patterns"""
+    np.random.seed(seed)
+
+    # Features: income, rent, emi, age, family_size, location_tier
+    income = np.random.normal(25000, 10000, n_samples)  # Monthly income in INR
+    rent = np.random.normal(8000, 3000, n_samples)
+    emi = np.random.normal(3000, 2000, n_samples)
+    age = np.random.randint(22, 65, n_samples)
+    family_size = np.random.randint(1, 6, n_samples)
+    location_tier = np.random.randint(1, 4, n_samples)  # 1=Metro, 2=Tier-1, 3=Tier-2
+
+    # Create feature matrix
+    X = np.column_stack([income, rent, emi, age, family_size, location_tier])
+
+    # Target: Daily safe savings amount (₹10-₹50)
+    # Formula based on Indian financial behavior
+    daily_savings = np.maximum(10,
+        np.minimum(50,
+            (income - rent - emi) * 0.1 / 30 +
+            np.random.normal(0, 5, n_samples)
+        )
+    )
+    return X, daily_savings
+
+
+def train_savings_model(n_samples: int = 1000, seed: int = 42, n_estimators: int = 100):
+    """Fit the scaler and RandomForest; returns (model, scaler, metrics, X_test)"""
+    X, y = synthetic_savings_data(n_samples, seed)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=42)
+    model.fit(X_train_scaled, y_train)
+
+    metrics = {"r2": round(float(model.score(X_test_scaled, y_test)), 4),
+               "n_train": len(X_train), "n_test": len(X_test)}
+    return model, scaler, metrics, X_test
+
+
+def publish(store: ModelStore, model, scaler, X_check: np.ndarray, metadata: dict, promote: bool) -> str:
+    """Flatten, check parity against sklearn on X_check, and save a new version"""
+    forest = FlatForest.from_sklearn(model, scaler)
+    expected = model.predict(scaler.transform(X_check))
+    max_diff = float(np.max(np.abs(forest.predict(X_check) - expected))) if len(X_check) else 0.0
+    if max_diff > 1e-9:
+        raise ModelStoreError(f"flattened forest differs from sklearn by {max_diff}")
+    metadata = dict(metadata, features=FEATURE_NAMES, parity_max_abs_diff=max_diff)
+    return store.save_forest(SAVINGS_MODEL, forest, metadata, promote=promote)
+
+
+def rounded_amounts(predictions: np.ndarray) -> np.ndarray:
+    """What the service returns: rounded and clamped to ₹10-₹50"""
+    return np.clip(np.round(predictions), 10, 50)
+
+
+def compact_parity(teacher, compact, X: np.ndarray) -> dict:
+    diff = np.abs(rounded_amounts(teacher.predict(X)) - rounded_amounts(compact.predict(X)))
+    return {"rows": len(X), "exact": round(float(np.mean(diff == 0)), 4),
+            "within_1": round(float(np.mean(diff <= 1)), 4), "max_abs_diff": float(diff.max())}
+
+
+def distill_savings_model(teacher, X: np.ndarray, max_leaf_nodes: int = 8192, seed: int = 42) -> FlatForest:
+    """One tree fitted on raw features to the teacher's clamped predictions
+
+    Fitting on raw features folds the scaler into the split thresholds, and clamping to
+    ₹10-₹50 spends no leaves on differences the service rounds away.
+    """
+    target = np.clip(teacher.predict(X), 10, 50)
+    tree = DecisionTreeRegressor(max_leaf_nodes=max_leaf_nodes, random_state=seed).fit(X, target)
+    return FlatForest.from_sklearn(tree)
+
+
+def cmd_train(store: ModelStore, args):
+    model, scaler, metrics, X_test = train_savings_model(args.samples, args.seed, args.trees)
+    version = publish(store, model, scaler, X_test,
+                      {"model_type": "RandomForestRegressor", "source": "synthetic",
+                       "seed": args.seed, "metrics": metrics},
+                      promote=args.promote)
+    print(f"📊 Model trained with R² score: {metrics['r2']:.3f}")
+    print(f"✅ Saved {SAVINGS_MODEL} version {version}" + (" (promoted)" if args.promote else ""))
+
+
+def cmd_import_pickle(store: ModelStore, args):
+    with open(args.model, "rb") as f:
+        model = pickle.load(f)
+    with open(args.scaler, "rb") as f:
+        scaler = pickle.load(f)
+    X_check, _ = synthetic_savings_data(200, seed=7)
+    version = publish(store, model, scaler, X_check,
+                      {"model_type": type(model).__name__, "source": os.path.abspath(args.model)},
+                      promote=args.promote)
+    print(f"✅ Imported {args.model} as {SAVINGS_MODEL} version {version}"
+          + (" (promoted)" if args.promote else ""))
+
+
+def cmd_distill(store: ModelStore, args):
+    teacher_version = args.version or store.current_version(SAVINGS_MODEL)
+    if teacher_version is None:
+        raise ModelStoreError(f"{SAVINGS_MODEL}: no current version to distill")
+    teacher = store.load_forest(SAVINGS_MODEL, teacher_version)
+    if args.data:
+        from training_pipeline import load_training_data
+        X, _, _ = load_training_data(args.data, max_rows=args.samples, seed=args.seed)
+    else:
+        X, _ = synthetic_savings_data(args.samples, seed=args.seed)
+    X_fit, X_holdout = train_test_split(X, test_size=0.1, random_state=42)
+
+    compact = distill_savings_model(teacher, X_fit, args.max_leaf_nodes, args.seed)
+    parity = compact_parity(teacher, compact, X_holdout)
+    # Two decimals: parity is rounded to 4 places, and 94.99% must not print as 95.0%
+    print(f"📊 Rounded amounts vs {teacher_version}: {parity['exact']:.2%} exact, "
+          f"{parity['within_1']:.2%} within ±1, max diff {parity['max_abs_diff']:.0f}")
+    if parity["within_1"] < COMPACT_MIN_WITHIN_1:
+        raise ModelStoreError(f"only {parity['within_1']:.2%} of held-out rows within ±1 "
+                              f"(need {COMPACT_MIN_WITHIN_1:.2%}); try more --samples or --max-leaf-nodes")
+    version = store.save_forest(COMPACT_MODEL, compact, {
+        "model_type": "CompactTree", "teacher_version": teacher_version, "features": FEATURE_NAMES,
+        "max_leaf_nodes": args.max_leaf_nodes, "parity": parity
+    }, promote=args.promote)
+    print(f"✅ Saved {COMPACT_MODEL} version {version}" + (" (promoted)" if args.promote else ""))
+
+
+def cmd_list(store: ModelStore, args):
+    current = store.current_version(args.name)
+    versions = store.versions(args.name)
+    if not versions:
+        print(f"No {args.name} versions in {store.root}")
+    for version in versions:
+        manifest = store.manifest(args.name, version)
+        marker = "*" if version == current else " "
+        print(f"{marker} {version}  {manifest.get('model_type', '?')}  trees={manifest.get('n_trees')}  "
+              f"metrics={manifest.get('metrics', manifest.get('parity', {}))}")
+
+
+def cmd_promote(store: ModelStore, args):
+    store.promote(args.name, args.version)
+    print(f"✅ {args.name} CURRENT -> {args.version}")
+
+
+def cmd_verify(store: ModelStore, args):
+    version = args.version or store.current_version(args.name)
+    if version is None:
+        raise ModelStoreError(f"{args.name}: no current version")
+    store.verify(args.name, version)
+    print(f"✅ {args.name} {version}: checksums OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=os.getenv("AI_MODEL_DIR", DEFAULT_MODEL_DIR))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train", help="train on synthetic data and publish a version")
+    train.add_argument("--samples", type=int, default=1000)
+    train.add_argument("--seed", type=int, default=42)
+    train.add_argument("--trees", type=int, default=100)
+    train.add_argument("--promote", action="store_true", help="make it the served version")
+    train.set_defaults(handler=cmd_train)
+
+    legacy = commands.add_parser("import-pickle", help="publish a legacy pickled model and scaler")
+    legacy.add_argument("--model", default="models/savings_predictor.pkl")
+    legacy.add_argument("--scaler", default="models/scaler.pkl")
+    legacy.add_argument("--promote", action="store_true")
+    legacy.set_defaults(handler=cmd_import_pickle)
+
+    distill = commands.add_parser("distill", help="publish a compact single-tree model of a forest version")
+    distill.add_argument("version", nargs="?", help=f"{SAVINGS_MODEL} version (default: CURRENT)")
+    distill.add_argument("--samples", type=int, default=400_000, help="rows labelled by the forest")
+    distill.add_argument("--data", nargs="+", help="CSV/Parquet rows to label instead of synthetic ones")
+    distill.add_argument("--max-leaf-nodes", type=int, default=8192)
+    distill.add_argument("--seed", type=int, default=11)
+    distill.add_argument("--promote", action="store_true")
+    distill.set_defaults(handler=cmd_distill)
+
+    names = [SAVINGS_MODEL, COMPACT_MODEL]
+    listing = commands.add_parser("list", help="list versions (* = CURRENT)")
+    listing.add_argument("--name", default=SAVINGS_MODEL, choices=names)
+    listing.set_defaults(handler=cmd_list)
+
+    promote = commands.add_parser("promote", help="atomically switch the served version")
+    promote.add_argument("version")
+    promote.add_argument("--name", default=SAVINGS_MODEL, choices=names)
+    promote.set_defaults(handler=cmd_promote)
+
+    verify = commands.add_parser("verify", help="check a version's checksums (default: CURRENT)")
+    verify.add_argument("version", nargs="?")
+    verify.add_argument("--name", default=SAVINGS_MODEL, choices=names)
+    verify.set_defaults(handler=cmd_verify)
+
+    args = parser.parse_args()
+    try:
+        args.handler(ModelStore(args.model_dir), args)
+    except (ModelStoreError, OSError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
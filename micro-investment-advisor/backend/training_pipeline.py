@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Offline training pipeline for the savings model
+Streams training rows from CSV/Parquet files in chunks, runs a parallel hyperparameter
+search for a RandomForest and a HistGradientBoosting model, compares the two on accuracy
+and serving latency, publishes both to the model store and promotes the chosen one.
+
+Usage:
+    python training_pipeline.py --data exports/savings-*.parquet --promote
+    python training_pipeline.py --data rows.csv --max-rows 5000000 --report report.json
+    python training_pipeline.py --synthetic 1000000 --search-rows 100000
+
+Input columns: income, rent, emi, age, family_size, location_tier and the target
+(--target, default daily_savings). Rows with missing or non-numeric values are dropped.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import RandomizedSearchCV, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from model_store import DEFAULT_MODEL_DIR, ModelStore, ModelStoreError
+from train_models import FEATURE_NAMES, SAVINGS_MODEL, publish, synthetic_savings_data
+
+DEFAULT_TARGET = "daily_savings"
+
+# Rows per chunk read from disk
+CHUNK_ROWS = 250_000
+
+# Candidate models and the hyperparameters searched for each
+CANDIDATES = {
+    "RandomForestRegressor": (
+        lambda seed: RandomForestRegressor(random_state=seed, n_jobs=1),
+        {"n_estimators": [50, 100, 200],
+         "max_depth": [None, 8, 12, 16],
+         "max_features": [1.0, 0.66, 0.33]}
+    ),
+    "HistGradientBoostingRegressor": (
+        lambda seed: HistGradientBoostingRegressor(random_state=seed),
+        {"max_iter": [100, 200, 400],
+         "max_depth": [None, 6, 10],
+         "max_leaf_nodes": [15, 31, 63],
+         "learning_rate": [0.05, 0.1, 0.2]}
+    ),
+}
+
+
+def iter_chunks(path: str, columns: List[str], chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Read a CSV or Parquet file chunk by chunk, only the needed columns"""
+    if path.endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("reading Parquet needs pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+
+
+def load_training_data(paths: List[str], target: str = DEFAULT_TARGET, max_rows: Optional[int] = None,
+                       seed: int = 42, chunk_rows: int = CHUNK_ROWS) -> Tuple[np.ndarray, np.ndarray, Dict]:
+    """Stream rows into (X, y); with max_rows keeps a uniform random sample of that size
+
+    Sampling keeps the max_rows rows with the smallest random keys seen so far, so memory
+    stays bounded by about 2 * max_rows rows however large the input is.
+    """
+    rng = np.random.default_rng(seed)
+    columns = FEATURE_NAMES + [target]
+    kept: List[np.ndarray] = []
+    keys: List[np.ndarray] = []
+    kept_rows = seen = dropped = 0
+    for path in paths:
+        for chunk in iter_chunks(path, columns, chunk_rows):
+            block = chunk[columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+            valid = np.isfinite(block).all(axis=1)
+            dropped += int((~valid).sum())
+            block = block[valid]
+            seen += len(block)
+            kept.append(block)
+            kept_rows += len(block)
+            if max_rows is not None:
+                keys.append(rng.random(len(block)))
+                if kept_rows >= 2 * max_rows:
+                    kept, keys = _sample(kept, keys, max_rows)
+                    kept_rows = len(kept[0])
+    if max_rows is not None and kept_rows > max_rows:
+        kept, keys = _sample(kept, keys, max_rows)
+    data = np.concatenate(kept) if kept else np.empty((0, len(columns)))
+    return data[:, :-1], data[:, -1], {"rows_read": seen + dropped, "rows_dropped": dropped,
+                                       "rows_used": len(data)}
+
+
+def _sample(blocks: List[np.ndarray], keys: List[np.ndarray], n: int):
+    block, key = np.concatenate(blocks), np.concatenate(keys)
+    keep = np.argpartition(key, n - 1)[:n] if len(key) > n else slice(None)
+    return [block[keep]], [key[keep]]
+
+
+def search(name: str, X: np.ndarray, y: np.ndarray, n_iter: int, n_jobs: int, seed: int) -> Dict:
+    """Randomized cross-validated search; candidates are fitted in parallel"""
+    build, grid = CANDIDATES[name]
+    searcher = RandomizedSearchCV(build(seed), grid, n_iter=n_iter, cv=3, scoring="r2",
+                                  n_jobs=n_jobs, random_state=seed)
+    started = time.perf_counter()
+    searcher.fit(X, y)
+    return {"best_params": searcher.best_params_,
+            "cv_r2": round(float(searcher.best_score_), 4),
+            "search_seconds": round(time.perf_counter() - started, 1)}
+
+
+def fit(name: str, params: Dict, X: np.ndarray, y: np.ndarray, n_jobs: int, seed: int):
+    model = CANDIDATES[name][0](seed).set_params(**params)
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=n_jobs)
+    started = time.perf_counter()
+    model.fit(X, y)
+    return model, round(time.perf_counter() - started, 1)
+
+
+def latency(forest, X: np.ndarray, batch_rows: int, repeat: int = 200) -> Dict:
+    """p50/p99 of the served (flat forest) predict path, single row and batch"""
+    def percentiles(fn, n):
+        times = []
+        for i in range(n):
+            started = time.perf_counter()
+            fn(i)
+            times.append(time.perf_counter() - started)
+        return (round(float(np.percentile(times, 50)) * 1000, 3),
+                round(float(np.percentile(times, 99)) * 1000, 3))
+
+    single = percentiles(lambda i: forest.predict(X[i % len(X):i % len(X) + 1]), repeat)
+    batch = X[:batch_rows]
+    batched = percentiles(lambda i: forest.predict(batch), max(5, repeat // 20))
+    return {"single_p50_ms": single[0], "single_p99_ms": single[1],
+            "batch_rows": len(batch), "batch_p50_ms": batched[0], "batch_p99_ms": batched[1]}
+
+
+def artifact_bytes(store: ModelStore, version: str) -> int:
+    version_dir = os.path.join(store.root, SAVINGS_MODEL, version)
+    return sum(os.path.getsize(os.path.join(version_dir, f)) for f in os.listdir(version_dir))
+
+
+def choose(results: List[Dict], r2_tolerance: float) -> Dict:
+    """Most accurate candidate, unless one within r2_tolerance is faster per row"""
+    best_r2 = max(r["test_r2"] for r in results)
+    close = [r for r in results if r["test_r2"] >= best_r2 - r2_tolerance]
+    return min(close, key=lambda r: r["latency"]["single_p99_ms"])
+
+
+def run(args) -> Dict:
+    started = time.perf_counter()
+    if args.synthetic:
+        X, y = synthetic_savings_data(args.synthetic, args.seed)
+        data = {"source": "synthetic", "rows_used": len(X)}
+    else:
+        X, y, data = load_training_data(args.data, args.target, args.max_rows, args.seed)
+        data["source"] = [os.path.abspath(p) for p in args.data]
+    if len(X) < 100:
+        raise ModelStoreError(f"only {len(X)} usable training rows")
+    print(f"📥 {data['rows_used']} rows loaded in {time.perf_counter() - started:.1f}s")
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.test_size,
+                                                        random_state=args.seed)
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    rng = np.random.default_rng(args.seed)
+    search_idx = rng.choice(len(X_train), min(args.search_rows, len(X_train)), replace=False)
+
+    store = ModelStore(args.model_dir)
+    results = []
+    for name in args.models:
+        result = {"model_type": name}
+        print(f"🔎 Searching {name} ({args.search_iter} candidates on {len(search_idx)} rows)...")
+        result.update(search(name, X_train_scaled[search_idx], y_train[search_idx],
+                             args.search_iter, args.jobs, args.seed))
+        model, result["fit_seconds"] = fit(name, result["best_params"], X_train_scaled, y_train,
+                                           args.jobs, args.seed)
+        result["test_r2"] = round(float(r2_score(y_test, model.predict(scaler.transform(X_test)))), 4)
+        result["version"] = publish(store, model, scaler, X_test[:2000], {
+            "model_type": name, "source": data["source"], "params": result["best_params"],
+            "metrics": {"r2": result["test_r2"], "cv_r2": result["cv_r2"],
+                        "n_train": len(X_train), "n_test": len(X_test)}
+        }, promote=False)
+        result["size_bytes"] = artifact_bytes(store, result["version"])
+        result["latency"] = latency(store.load_forest(SAVINGS_MODEL, result["version"]), X_test,
+                                    args.batch_rows)
+        results.append(result)
+        print(f"   R² {result['test_r2']}, single p99 {result['latency']['single_p99_ms']} ms, "
+              f"{result['size_bytes'] / 2**20:.1f} MB -> {result['version']}")
+
+    chosen = choose(results, args.r2_tolerance)
+    if args.promote:
+        store.promote(SAVINGS_MODEL, chosen["version"])
+    return {"data": data, "candidates": results, "chosen": chosen["version"],
+            "promoted": args.promote, "total_seconds": round(time.perf_counter() - started, 1)}
+
+
+def print_report(report: Dict):
+    print(f"{'model':<30} {'R²':>7} {'p50 1':>8} {'p99 1':>8} {'p50 batch':>10} "
+          f"{'p99 batch':>10} {'MB':>7}")
+    for r in report["candidates"]:
+        lat = r["latency"]
+        marker = "*" if r["version"] == report["chosen"] else " "
+        print(f"{marker}{r['model_type']:<29} {r['test_r2']:>7} {lat['single_p50_ms']:>8} "
+              f"{lat['single_p99_ms']:>8} {lat['batch_p50_ms']:>10} {lat['batch_p99_ms']:>10} "
+              f"{r['size_bytes'] / 2**20:>7.2f}")
+    print(f"(latencies in ms; batch = {report['candidates'][0]['latency']['batch_rows']} rows; "
+          f"* = chosen{', promoted' if report['promoted'] else ''})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--data", nargs="+", help="CSV or Parquet files")
+    source.add_argument("--synthetic", type=int, help="train on N synthetic rows instead")
+    parser.add_argument("--target", default=DEFAULT_TARGET)
+    parser.add_argument("--max-rows", type=int, help="uniformly sample at most this many rows")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--search-rows", type=int, default=200_000,
+                        help="training rows used for the hyperparameter search")
+    parser.add_argument("--search-iter", type=int, default=12, help="candidates per model type")
+    parser.add_argument("--models", nargs="+", default=list(CANDIDATES), choices=list(CANDIDATES))
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel search/fit jobs (-1 = all cores)")
+    parser.add_argument("--batch-rows", type=int, default=1000)
+    parser.add_argument("--r2-tolerance", type=float, default=0.005,
+                        help="prefer a faster model whose R² is within this of the best")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--promote", action="store_true", help="serve the chosen model")
+    parser.add_argument("--report", help="write the JSON report here")
+    parser.add_argument("--model-dir", default=os.getenv("AI_MODEL_DIR", DEFAULT_MODEL_DIR))
+    args = parser.parse_args()
+
+    try:
+        report = run(args)
+    except (ModelStoreError, RuntimeError, OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
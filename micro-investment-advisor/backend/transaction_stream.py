@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Streaming NDJSON transaction ingestion
+Parses one transaction per line straight into fixed-size typed column chunks, so a
+request's memory is bounded by the chunk size instead of the length of the statement
+"""
+
+import json
+from typing import Callable, Iterator
+
+import numpy as np
+
+from columnar_patterns import DEFAULT_CHUNK_SIZE, TransactionColumns, build_transaction_columns
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Rough working memory per buffered transaction: date and category strings, the parsed
+# columns and pandas' temporaries while converting dates
+STREAM_ROW_BYTES = 256
+
+# Longest accepted line; a transaction is a few hundred bytes
+MAX_LINE_BYTES = 64 * 1024
+
+# Body bytes per read; line splitting is done here because readline() on WSGI input
+# streams is often implemented one byte at a time
+READ_BLOCK_BYTES = 256 * 1024
+
+
+class PayloadTooLarge(Exception):
+    """Request body or working memory above the configured limit (HTTP 413)"""
+
+
+class InvalidTransaction(ValueError):
+    """A streamed line that is not a transaction object (HTTP 400)"""
+
+
+class TransactionStream:
+    """NDJSON transactions read from a file-like body as TransactionColumns chunks
+
+    Half of max_memory_bytes goes to the chunk buffer (which sets the chunk size), the
+    rest to whatever the consumer keeps between chunks, reported by retained_bytes.
+    """
+
+    def __init__(self, stream, max_memory_bytes: int, max_body_bytes: int,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, max_line_bytes: int = MAX_LINE_BYTES):
+        self.stream = stream
+        self.max_memory_bytes = max_memory_bytes
+        self.max_body_bytes = max_body_bytes
+        self.max_line_bytes = max_line_bytes
+        self.chunk_size = max(1, min(chunk_size, max_memory_bytes // 2 // STREAM_ROW_BYTES))
+        self.lines = 0
+        self.bytes_read = 0
+
+    def chunks(self, retained_bytes: Callable[[], int] = lambda: 0) -> Iterator[TransactionColumns]:
+        """Yield parsed chunks; raises PayloadTooLarge or InvalidTransaction"""
+        dates = [None] * self.chunk_size
+        categories = [None] * self.chunk_size
+        amount = np.empty(self.chunk_size, dtype=np.float64)
+        n = 0
+        for line in self._lines():
+            line = line.strip()
+            if not line:
+                continue
+            self.lines += 1
+            try:
+                transaction = json.loads(line)
+                dates[n] = transaction['date']
+                amount[n] = transaction['amount']
+                categories[n] = transaction.get('category')
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise InvalidTransaction(f"line {self.lines}: invalid transaction ({e!r})")
+            n += 1
+            if n == self.chunk_size:
+                yield self._flush(dates, amount, categories, n, retained_bytes)
+                n = 0
+        if n:
+            yield self._flush(dates, amount, categories, n, retained_bytes)
+        self._check_memory(0, retained_bytes)
+
+    def _lines(self) -> Iterator[bytes]:
+        pending = b""
+        while True:
+            block = self.stream.read(READ_BLOCK_BYTES)
+            if not block:
+                break
+            self.bytes_read += len(block)
+            if self.bytes_read > self.max_body_bytes:
+                raise PayloadTooLarge(f"body exceeds {self.max_body_bytes / 2**20:g} MB")
+            lines = (pending + block).split(b"\n")
+            pending = lines.pop()
+            if len(pending) > self.max_line_bytes or max(map(len, lines), default=0) > self.max_line_bytes:
+                raise PayloadTooLarge(f"a line after line {self.lines} exceeds {self.max_line_bytes} bytes")
+            yield from lines
+        if pending:
+            yield pending
+
+    def _flush(self, dates, amount, categories, n, retained_bytes) -> TransactionColumns:
+        self._check_memory(self.chunk_size * STREAM_ROW_BYTES, retained_bytes)
+        try:
+            # The buffers are reused for the next chunk, so the columns get copies
+            return build_transaction_columns(dates[:n], amount[:n].copy(), categories[:n])
+        except (ValueError, TypeError) as e:
+            raise InvalidTransaction(f"lines {self.lines - n + 1}-{self.lines}: {e}")
+
+    def _check_memory(self, buffer_bytes: int, retained_bytes):
+        used = buffer_bytes + retained_bytes()
+        if used > self.max_memory_bytes:
+            raise PayloadTooLarge(f"request needs more than {self.max_memory_bytes / 2**20:g} MB "
+                                  f"of working memory (after {self.lines} transactions)")